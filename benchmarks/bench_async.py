@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Side-by-side throughput of the sync (WSGI) and async (ASGI) request paths
+
+Starts gunicorn twice with the same number of workers, once with sync
+workers serving credit_approval_system.wsgi and once with uvicorn workers
+serving credit_approval_system.asgi, and drives both with the same
+keep-alive load: check-eligibility, view-loan and a view-loans page, each
+from --concurrency concurrent connections for --duration seconds. The sync
+server is hit on the standard paths and the async server on async/.
+
+The database and cache settings come from the environment, as for
+manage.py; run it against a populated database, e.g. one filled with
+`python manage.py generate_dataset --database`.
+
+Usage: python benchmarks/bench_async.py [--workers 4] [--concurrency 64] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = {
+    'sync': ['credit_approval_system.wsgi:application'],
+    'async': ['credit_approval_system.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, workers):
+    command = [
+        sys.executable, '-m', 'gunicorn', *SERVERS[kind],
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning',
+    ]
+    env = dict(os.environ, DEBUG='False')
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=30)
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get('connection') != 'close'
+
+
+async def client(port, request, deadline, latencies, errors):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            started = time.monotonic()
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.monotonic() - started)
+            if status != 200:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append('connection')
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+def build_request(method, path, body=None):
+    lines = [f'{method} {path} HTTP/1.1', 'Host: 127.0.0.1', 'Connection: keep-alive']
+    payload = b''
+    if body is not None:
+        payload = json.dumps(body).encode()
+        lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+
+async def drive(port, request, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client(port, request, deadline, latencies, errors) for _ in range(concurrency)))
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests_per_second': count / duration,
+        'p50_ms': latencies[count // 2] * 1000 if count else 0.0,
+        'p99_ms': latencies[min(count - 1, int(count * 0.99))] * 1000 if count else 0.0,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--customer-id', type=int, default=1)
+    parser.add_argument('--loan-id', type=int, default=1)
+    options = parser.parse_args()
+
+    endpoints = {
+        'check-eligibility': ('POST', 'check-eligibility', {
+            'customer_id': options.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+        }),
+        'view-loan': ('GET', f'view-loan/{options.loan_id}', None),
+        'view-loans': ('GET', f'view-loans/{options.customer_id}?page_size=10', None),
+    }
+    print(f"{options.workers} workers, {options.concurrency} connections, {options.duration:g}s per endpoint")
+    print(f"{'endpoint':<20}{'server':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for kind in ('sync', 'async'):
+        port = free_port()
+        process = start_server(kind, port, options.workers)
+        try:
+            for name, (method, path, body) in endpoints.items():
+                prefix = '/async/' if kind == 'async' else '/'
+                request = build_request(method, prefix + path, body)
+                asyncio.run(drive(port, request, 4, 1))  # warm up
+                result = asyncio.run(drive(port, request, options.concurrency, options.duration))
+                print(
+                    f"{name:<20}{kind:<8}{result['requests_per_second']:>10.1f}"
+                    f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['errors']:>8}"
+                )
+        finally:
+            stop_server(process)
+
+
+if __name__ == '__main__':
+    main()
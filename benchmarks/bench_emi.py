@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the shared EMI engine
+
+Usage: python benchmarks/bench_emi.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loans import emi  # noqa: E402
+
+
+def legacy_installment(loan_amount, interest_rate, tenure):
+    """The float formula previously duplicated in the model and the services"""
+    if interest_rate <= 0 or tenure <= 0:
+        return 0
+    monthly_rate = float(interest_rate) / 100 / 12
+    principal = float(loan_amount)
+    emi_value = principal * (monthly_rate * (1 + monthly_rate) ** tenure) / ((1 + monthly_rate) ** tenure - 1)
+    return round(emi_value, 2)
+
+
+def report(name, seconds, calls):
+    print(f"{name:<40} {seconds / calls * 1e6:>10.3f} us/loan")
+
+
+def main():
+    rng = random.Random(0)
+    count = 100000
+    principals = [rng.randint(10000, 5000000) for _ in range(count)]
+    rates = [rng.choice([8, 10.5, 12, 14.25, 16, 18.5]) for _ in range(count)]
+    tenures = [rng.randint(1, 60) for _ in range(count)]
+    loans = list(zip(principals, rates, tenures))
+
+    print(f"Benchmarking {count} installments")
+
+    seconds = timeit.timeit(lambda: [legacy_installment(*loan) for loan in loans], number=1)
+    report('legacy float formula', seconds, count)
+
+    emi._factor_row.cache_clear()
+    seconds = timeit.timeit(lambda: [emi.monthly_installment(*loan) for loan in loans], number=1)
+    report('engine scalar (cold factor table)', seconds, count)
+
+    seconds = timeit.timeit(lambda: [emi.monthly_installment(*loan) for loan in loans], number=1)
+    report('engine scalar (warm factor table)', seconds, count)
+
+    seconds = timeit.timeit(lambda: emi.installments(principals, rates, tenures), number=5) / 5
+    report('engine NumPy batch', seconds, count)
+
+    print(f"Factor table: {emi._factor_row.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the loan read path: DRF serializers and JSONRenderer
+against values() rows through RowSerializer and the orjson renderer
+
+Both paths are fed in-memory data, so the numbers exclude the database.
+The detail path also skips the nested customer query the model serializer
+would otherwise issue per loan.
+
+Usage: python benchmarks/bench_serialization.py
+"""
+
+import os
+import random
+import sys
+import timeit
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'credit_approval_system.settings')
+os.environ.setdefault('USE_SQLITE', '1')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from loans.models import Customer, Loan  # noqa: E402
+from loans.renderers import dumps  # noqa: E402
+from loans.serializers import CustomerLoanSerializer, LoanDetailSerializer, RowSerializer  # noqa: E402
+
+
+def report(name, seconds, count):
+    print(f"{name:<44} {seconds / count * 1e6:>10.3f} us/loan")
+
+
+def main():
+    rng = random.Random(0)
+    count = 20000
+    customer = Customer(
+        customer_id=1, first_name='Aaron', last_name='Garcia', age=42, phone_number=9629317944,
+        monthly_salary=Decimal('50000.00'), approved_limit=Decimal('1800000.00'),
+    )
+    loans = []
+    for loan_id in range(1, count + 1):
+        tenure = rng.randint(1, 60)
+        loans.append(Loan(
+            loan_id=loan_id, customer=customer,
+            loan_amount=Decimal(rng.randint(1, 10) * 100000).quantize(Decimal('0.01')),
+            interest_rate=Decimal(rng.randint(800, 1800)).scaleb(-2),
+            monthly_repayment=Decimal(rng.randint(1000000, 9000000)).scaleb(-2),
+            tenure=tenure, emis_paid_on_time=rng.randint(0, tenure),
+            start_date=date(2020, 1, 1), end_date=date(2025, 1, 1),
+        ))
+
+    list_rows = RowSerializer(CustomerLoanSerializer)
+    detail_rows = RowSerializer(LoanDetailSerializer)
+    list_values = [
+        {
+            'loan_id': loan.loan_id, 'loan_amount': loan.loan_amount, 'interest_rate': loan.interest_rate,
+            'monthly_repayment': loan.monthly_repayment, 'repayments_left': loan.repayments_left,
+        }
+        for loan in loans
+    ]
+    detail_values = [
+        {
+            'loan_id': loan.loan_id, 'customer__customer_id': customer.customer_id,
+            'customer__first_name': customer.first_name, 'customer__last_name': customer.last_name,
+            'customer__phone_number': customer.phone_number, 'customer__age': customer.age,
+            'loan_amount': loan.loan_amount, 'interest_rate': loan.interest_rate,
+            'monthly_repayment': loan.monthly_repayment, 'tenure': loan.tenure,
+        }
+        for loan in loans
+    ]
+
+    renderer = JSONRenderer()
+    legacy = renderer.render(CustomerLoanSerializer(loans, many=True).data)
+    fast = dumps(list_rows.to_list(list_values))
+    assert legacy == fast, 'list output differs'
+    for loan, row in zip(loans[:1000], detail_values):
+        assert renderer.render(LoanDetailSerializer(loan).data) == dumps(detail_rows.to_dict(row)), 'detail differs'
+
+    print(f"Benchmarking {count} loans ({len(fast)} bytes as a list)")
+
+    seconds = timeit.timeit(lambda: renderer.render(CustomerLoanSerializer(loans, many=True).data), number=3) / 3
+    report('list: ModelSerializer + JSONRenderer', seconds, count)
+    seconds = timeit.timeit(lambda: dumps(list_rows.to_list(list_values)), number=3) / 3
+    report('list: RowSerializer + orjson', seconds, count)
+
+    seconds = timeit.timeit(lambda: [renderer.render(LoanDetailSerializer(loan).data) for loan in loans], number=1)
+    report('detail: ModelSerializer + JSONRenderer', seconds, count)
+    seconds = timeit.timeit(lambda: [dumps(detail_rows.to_dict(row)) for row in detail_values], number=1)
+    report('detail: RowSerializer + orjson', seconds, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN ANALYZE plans of the hot loan queries before and after the
+0009_query_indexes migration
+
+Needs a PostgreSQL database configured as for manage.py and filled with a
+large synthetic dataset, e.g.
+
+    python manage.py generate_dataset --customers 200000 --loans 2000000 --database --copy
+
+With --migrate the loans app is migrated back to 0008, the plans captured,
+migrated forward to 0009 and the plans captured again; the full plans are
+printed followed by a table of execution times. Without it only the plans
+of the current schema are shown.
+
+Usage: python benchmarks/explain_indexes.py [--migrate] [--customer-id N] [--date YYYY-MM-DD]
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'credit_approval_system.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Count, Sum  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from loans.models import CustomerCreditProfile, Loan  # noqa: E402
+from loans.scoring import started_in_year  # noqa: E402
+from loans.services import CreditScoreService  # noqa: E402
+from loans.views import _customer_loan_rows, _customer_loans_aggregates  # noqa: E402
+
+BEFORE, AFTER = '0008_idempotency_keys', '0009_query_indexes'
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+# First Buffers line of a plan, i.e. the totals of its top node
+BUFFERS = re.compile(r'Buffers: shared((?: \w+=\d+)+)')
+
+
+def hot_queries(customer_id, today):
+    """The queries the indexes were chosen for, built the way the app builds them"""
+    loans = Loan.objects.filter(customer_id=customer_id).order_by()
+    middle = loans.order_by('loan_id').values_list('loan_id', flat=True)[loans.count() // 2]
+    return {
+        # view-loans: a page deep into the keyset pagination
+        'listing page': _customer_loan_rows(customer_id).filter(loan_id__gt=middle).order_by('loan_id')[:10],
+        # view-loans ETag validators
+        'listing validators': loans.values('customer_id').annotate(**_customer_loans_aggregates()),
+        # current_debt / current_emi_total recomputation after a loan write
+        'active totals': loans.filter(end_date__gte=today).values('customer_id').annotate(
+            current_debt=Sum('loan_amount'), current_emi_total=Sum('monthly_repayment')
+        ),
+        # credit profile refresh of one customer
+        'customer history': loans.values('customer_id').annotate(
+            **CreditScoreService.history_aggregates(today)
+        ),
+        # loans started this year, across the book
+        'current-year loans': Loan.objects.filter(started_in_year(today.year)).order_by().values(
+            'customer_id'
+        ).annotate(loans=Count('loan_id')),
+        # admin: loans started in the past week
+        'admin start date filter': Loan.objects.filter(start_date__gte=today - timedelta(days=7)).order_by(
+            '-loan_id'
+        )[:100],
+        # nightly settle_matured_loans scan
+        'matured profiles': CustomerCreditProfile.objects.filter(next_expiry_date__lt=today).order_by(
+            'customer_id'
+        ).values_list('customer_id', flat=True),
+    }
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        for table in ('loans', 'customer_credit_profiles'):
+            # VACUUM sets the visibility map index-only scans depend on
+            cursor.execute(f'VACUUM ANALYZE {table}')
+
+
+def capture(label, customer_id, today):
+    analyze()
+    plans = {}
+    for name, queryset in hot_queries(customer_id, today).items():
+        queryset.explain(analyze=True)  # warm the cache
+        plans[name] = queryset.explain(analyze=True, buffers=True)
+        print(f'--- {label}: {name}\n{plans[name]}\n')
+    return plans
+
+
+def execution_ms(plan):
+    match = EXECUTION_TIME.search(plan)
+    return float(match.group(1)) if match else float('nan')
+
+
+def buffers(plan):
+    """Shared buffers hit or read by the whole plan"""
+    match = BUFFERS.search(plan)
+    if not match:
+        return 0
+    return sum(int(value) for name, value in re.findall(r'(\w+)=(\d+)', match.group(1)) if name in ('hit', 'read'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--migrate', action='store_true',
+                        help=f'Capture plans at {BEFORE} and {AFTER}, migrating the loans app between them')
+    parser.add_argument('--customer-id', type=int,
+                        help='Customer whose loans are queried (default: the one with the most loans)')
+    parser.add_argument('--date', type=date.fromisoformat, default=timezone.now().date(),
+                        help='Date the queries treat as today (YYYY-MM-DD); synthetic data may end before the real one')
+    options = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        parser.error('EXPLAIN plans need the PostgreSQL database')
+    customer_id = options.customer_id or (
+        Loan.objects.values('customer_id').annotate(loans=Count('loan_id')).order_by('-loans')
+        .values_list('customer_id', flat=True).first()
+    )
+    print(f'{Loan.objects.count()} loans; customer {customer_id} has '
+          f'{Loan.objects.filter(customer_id=customer_id).count()}\n')
+
+    if not options.migrate:
+        capture('current schema', customer_id, options.date)
+        return
+
+    call_command('migrate', 'loans', BEFORE, verbosity=0)
+    before = capture('before', customer_id, options.date)
+    call_command('migrate', 'loans', AFTER, verbosity=0)
+    after = capture('after', customer_id, options.date)
+
+    print(f"{'query':<28}{'before ms':>12}{'after ms':>12}{'before buffers':>16}{'after buffers':>16}")
+    for name in before:
+        print(
+            f'{name:<28}{execution_ms(before[name]):>12.3f}{execution_ms(after[name]):>12.3f}'
+            f'{buffers(before[name]):>16}{buffers(after[name]):>16}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from celery.schedules import crontab
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -70,6 +71,44 @@ DATABASES = {
     }
 }
 
+# Cache (credit scores and other shared data)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default=config('REDIS_URL', default='redis://localhost:6379/0')),
+    }
+}
+
+# Bounded in-process tier in front of the shared credit score cache
+CREDIT_SCORE_CACHE_LRU_SIZE = config('CREDIT_SCORE_CACHE_LRU_SIZE', default=1024, cast=int)
+# Seconds a local score is served without rechecking its version in the shared cache,
+# i.e. how long another worker's invalidation can go unseen; 0 checks on every read
+CREDIT_SCORE_CACHE_VERSION_TTL = config('CREDIT_SCORE_CACHE_VERSION_TTL', default=0, cast=float)
+
+# Seconds rendered view-loan / view-loans responses stay in the shared cache; 0 disables it
+LOAN_RESPONSE_CACHE_TIMEOUT = config('LOAN_RESPONSE_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds an Idempotency-Key and its stored response are kept
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+# Seconds after which a key whose first request never finished can be claimed again
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=60, cast=int)
+
+# Local development and the test suite can run against SQLite and locmem
+if config('USE_SQLITE', default=False, cast=bool):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    # SQLite builds the covering loan indexes without their INCLUDE columns
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,7 +142,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'loans.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -112,6 +151,28 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# JSON credit policy (score bands, rate floors, EMI ratio); empty uses the built-in v1 policy
+CREDIT_POLICY_PATH = config('CREDIT_POLICY_PATH', default='')
+
+# Serve check-eligibility, view-loan and view-loans with their async views (under ASGI)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Maximum number of customers accepted by /api/register/batch
+REGISTRATION_BATCH_MAX_SIZE = config('REGISTRATION_BATCH_MAX_SIZE', default=1000, cast=int)
+
+# Maximum number of applications accepted by /api/check-eligibility/batch
+ELIGIBILITY_BATCH_MAX_SIZE = config('ELIGIBILITY_BATCH_MAX_SIZE', default=1000, cast=int)
+
+# Rows upserted per transaction by the ingestion tasks
+INGESTION_CHUNK_SIZE = config('INGESTION_CHUNK_SIZE', default=5000, cast=int)
+# Rows per Celery task when ingest_all_data_parallel fans a file out
+INGESTION_RANGE_SIZE = config('INGESTION_RANGE_SIZE', default=50000, cast=int)
+# Default source files for the ingestion tasks (.xlsx or .csv)
+CUSTOMER_DATA_PATH = config('CUSTOMER_DATA_PATH', default=str(BASE_DIR / 'customer_data.xlsx'))
+LOAN_DATA_PATH = config('LOAN_DATA_PATH', default=str(BASE_DIR / 'loan_data.xlsx'))
+# Sidecar CSVs listing the rows each ingestion run rejected, with reasons
+INGESTION_ERROR_DIR = config('INGESTION_ERROR_DIR', default=str(BASE_DIR / 'ingestion_errors'))
+
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
@@ -119,6 +180,16 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'settle-matured-loans': {
+        'task': 'loans.tasks.settle_matured_loans',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'purge-idempotency-keys': {
+        'task': 'loans.tasks.purge_idempotency_keys',
+        'schedule': crontab(minute=15),
+    },
+}
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
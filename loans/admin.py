@@ -1,20 +1,20 @@
 from django.contrib import admin
-from .models import Customer, Loan
+from .models import Customer, CustomerCreditProfile, IdempotencyKey, IngestionCheckpoint, IngestionRun, Loan
 
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-    list_display = ['customer_id', 'first_name', 'last_name', 'age', 'phone_number', 'monthly_salary', 'approved_limit', 'current_debt']
+    list_display = ['customer_id', 'first_name', 'last_name', 'age', 'phone_number', 'monthly_salary', 'approved_limit', 'current_debt', 'current_emi_total', 'credit_score']
     list_filter = ['age']
     search_fields = ['first_name', 'last_name', 'phone_number']
-    readonly_fields = ['customer_id', 'approved_limit']
+    readonly_fields = ['customer_id', 'approved_limit', 'current_debt', 'current_emi_total', 'credit_score', 'credit_score_updated_at']
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('customer_id', 'first_name', 'last_name', 'age', 'phone_number')
         }),
         ('Financial Information', {
-            'fields': ('monthly_salary', 'approved_limit', 'current_debt')
+            'fields': ('monthly_salary', 'approved_limit', 'current_debt', 'current_emi_total', 'credit_score', 'credit_score_updated_at')
         }),
     )
 
@@ -36,4 +36,33 @@ class LoanAdmin(admin.ModelAdmin):
         ('Date Information', {
             'fields': ('start_date', 'end_date', 'is_active')
         }),
-    ) 
\ No newline at end of file
+    )
+
+
+@admin.register(CustomerCreditProfile)
+class CustomerCreditProfileAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'loan_count', 'total_volume', 'next_expiry_date', 'last_loan_start_date', 'updated_at']
+    search_fields = ['customer__customer_id', 'customer__first_name', 'customer__last_name']
+    readonly_fields = ['customer', 'total_tenure', 'emis_paid_on_time', 'loan_count', 'total_volume', 'last_loan_start_date', 'current_year_loans', 'current_year', 'next_expiry_date', 'updated_at']
+
+
+@admin.register(IngestionCheckpoint)
+class IngestionCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['source', 'file_hash', 'ingested_at']
+    readonly_fields = ['source', 'file_hash', 'ingested_at']
+
+
+@admin.register(IngestionRun)
+class IngestionRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'source', 'status', 'rows_committed', 'created', 'updated', 'skipped', 'rejected', 'rows_per_second', 'started_at', 'finished_at']
+    list_filter = ['source', 'status']
+    readonly_fields = ['source', 'source_file', 'file_hash', 'status', 'rows_committed', 'created', 'updated', 'skipped', 'rejected', 'rejection_reasons', 'error_file', 'phase_seconds', 'elapsed_seconds', 'rows_per_second', 'message', 'started_at', 'finished_at']
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['endpoint', 'key', 'status_code', 'locked_at', 'expires_at']
+    list_filter = ['endpoint', 'status_code']
+    search_fields = ['key']
+    readonly_fields = ['endpoint', 'key', 'request_hash', 'status_code', 'content_type', 'locked_at', 'expires_at']
+    exclude = ['content']
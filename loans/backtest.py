@@ -0,0 +1,190 @@
+import time
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from .models import Customer, Loan
+from .scoring import score_totals, to_paise
+
+
+LOAN_COLUMNS = [
+    'loan_id', 'customer_id', 'amount_paise', 'emi_paise', 'tenure',
+    'emis_paid_on_time', 'interest_rate', 'start_date', 'end_date',
+]
+# Event kinds, in the order they apply on the same day; a loan closes the
+# day after its end date
+CLOSE, APPLICATION, OPEN = 0, 1, 2
+RUNNING_COLUMNS = ['loan_count', 'total_tenure', 'emis_paid_on_time', 'total_volume_paise',
+                   'active_debt_paise', 'active_emi_paise']
+
+
+class PolicyBacktest:
+    """
+    Replay every historical loan application through credit policies
+
+    Each loan is treated as an application made on its start date. The
+    applicant's history is rebuilt point-in-time from the loans that started
+    before it: a single sorted event stream per customer (loan closes, then
+    applications, then loan opens on any given day) is cumulatively summed,
+    so the whole book is scored with array operations instead of per-loan
+    queries.
+    """
+
+    def __init__(self, read_chunk_size=100000):
+        self.read_chunk_size = read_chunk_size
+
+    def load_loans(self, loans=None):
+        """Loan columns for the whole book, streamed in chunks"""
+        loans = Loan.objects.all() if loans is None else loans
+        rows = loans.order_by().annotate(
+            amount_paise=to_paise('loan_amount'),
+            emi_paise=to_paise('monthly_repayment'),
+        ).values_list(*LOAN_COLUMNS).iterator(chunk_size=self.read_chunk_size)
+
+        frames = []
+        while True:
+            chunk = list(islice(rows, self.read_chunk_size))
+            if not chunk:
+                break
+            frame = pd.DataFrame.from_records(chunk, columns=LOAN_COLUMNS)
+            frame['interest_rate'] = frame['interest_rate'].astype(np.float64)
+            frame['start_date'] = np.array(frame['start_date'].tolist(), dtype='datetime64[D]')
+            frame['end_date'] = np.array(frame['end_date'].tolist(), dtype='datetime64[D]')
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=LOAN_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def load_customers(self):
+        """Approved limits (paise) and monthly salaries indexed by customer_id"""
+        records = Customer.objects.order_by().annotate(
+            approved_limit_paise=to_paise('approved_limit'),
+            salary_paise=to_paise('monthly_salary'),
+        ).values_list('customer_id', 'approved_limit_paise', 'salary_paise')
+        return pd.DataFrame.from_records(
+            list(records), columns=['customer_id', 'approved_limit_paise', 'salary_paise']
+        ).set_index('customer_id')
+
+    def build_applications(self, loans, customers):
+        """Point-in-time applicant state and credit score for every loan"""
+        count = len(loans)
+        customer_ids = loans['customer_id'].to_numpy(dtype=np.int64)
+        start = loans['start_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        end = loans['end_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        amount = loans['amount_paise'].to_numpy(dtype=np.int64)
+        emi_paise = loans['emi_paise'].to_numpy(dtype=np.int64)
+
+        # Running-total deltas for each event, one column per event
+        deltas = np.zeros((len(RUNNING_COLUMNS), 3 * count), dtype=np.int64)
+        opens = slice(2 * count, 3 * count)
+        deltas[4, :count] = -amount
+        deltas[5, :count] = -emi_paise
+        deltas[0, opens] = 1
+        deltas[1, opens] = loans['tenure'].to_numpy(dtype=np.int64)
+        deltas[2, opens] = loans['emis_paid_on_time'].to_numpy(dtype=np.int64)
+        deltas[3, opens] = amount
+        deltas[4, opens] = amount
+        deltas[5, opens] = emi_paise
+
+        event_customers = np.tile(customer_ids, 3)
+        event_dates = np.concatenate([end + 1, start, start])
+        event_kinds = np.repeat(np.array([CLOSE, APPLICATION, OPEN]), count)
+        # Sort by (customer, date, kind) through one packed int64 key
+        first_day = event_dates.min() if count else 0
+        day_span = (event_dates.max() - first_day + 1) if count else 1
+        sort_key = (event_customers * day_span + (event_dates - first_day)) * 3 + event_kinds
+        order = np.argsort(sort_key)
+        event_customers = event_customers[order]
+        event_dates = event_dates[order]
+        event_kinds = event_kinds[order]
+
+        # Cumulative sums restarted at each customer boundary
+        running = np.cumsum(deltas[:, order], axis=1)
+        boundaries = np.flatnonzero(np.diff(event_customers)) + 1
+        group = np.zeros(len(order), dtype=np.int64)
+        group[boundaries] = 1
+        group = np.cumsum(group)
+        offsets = np.hstack([np.zeros((running.shape[0], 1), dtype=np.int64), running[:, boundaries - 1]])
+
+        # Most recent loan opened by the same customer before each event
+        last_open = np.where(event_kinds == OPEN, np.arange(len(order)), -1)
+        last_open = np.maximum.accumulate(last_open)
+        has_open = (last_open >= 0) & (event_customers[np.maximum(last_open, 0)] == event_customers)
+
+        # Scatter application events back into loan order
+        applications = np.flatnonzero(event_kinds == APPLICATION)
+        rows = order[applications] - count
+        application_groups = group[applications]
+        state = {}
+        for position, column in enumerate(RUNNING_COLUMNS):
+            values = np.empty(count, dtype=np.int64)
+            values[rows] = running[position, applications] - offsets[position, application_groups]
+            state[column] = values
+        last_opened = np.empty(count, dtype=np.int64)
+        last_opened[rows] = np.where(has_open, event_dates[np.maximum(last_open, 0)], -1)[applications]
+
+        years = start.astype('datetime64[D]').astype('datetime64[Y]')
+        state['current_year_loans'] = (
+            (last_opened >= 0) & (last_opened.astype('datetime64[D]').astype('datetime64[Y]') == years)
+        ).astype(np.int64)
+        state = pd.DataFrame(state)
+        state['customer_id'] = customer_ids
+        state = state.join(customers, on='customer_id')
+        state['credit_score'] = score_totals(state.fillna({'approved_limit_paise': 0}))
+        state['interest_rate'] = loans['interest_rate'].to_numpy()
+        state['amount_paise'] = amount
+        return state
+
+    @staticmethod
+    def evaluate(policy, applications):
+        """Decisions and summary metrics for one policy"""
+        salary_paise = applications['salary_paise'].fillna(0).to_numpy(dtype=np.float64)
+        emi_exceeded = applications['active_emi_paise'].to_numpy() > salary_paise * policy.max_emi_ratio
+        band_approved, corrected = policy.decide_arrays(
+            applications['credit_score'].to_numpy(), applications['interest_rate'].to_numpy()
+        )
+        approved = band_approved & ~emi_exceeded
+        uplift = corrected - applications['interest_rate'].to_numpy()
+        exposure = applications['amount_paise'].to_numpy()[approved].sum() / 100
+        return {
+            'version': policy.version,
+            'approved': approved,
+            'corrected_interest_rate': corrected,
+            'applications': int(len(approved)),
+            'approved_count': int(approved.sum()),
+            'approval_rate': float(approved.mean()) if len(approved) else 0.0,
+            'mean_rate_uplift': float(uplift[approved].mean()) if approved.any() else 0.0,
+            'uplifted_count': int((approved & (uplift > 0)).sum()),
+            'exposure': float(exposure),
+        }
+
+    def run(self, candidate, baseline):
+        """Compare a candidate policy against a baseline over the whole book"""
+        started = time.monotonic()
+        loans = self.load_loans()
+        customers = self.load_customers()
+        loaded = time.monotonic()
+        applications = self.build_applications(loans, customers)
+        base = self.evaluate(baseline, applications)
+        cand = self.evaluate(candidate, applications)
+        finished = time.monotonic()
+
+        summary = {}
+        for key in ('approval_rate', 'mean_rate_uplift', 'exposure', 'approved_count'):
+            summary[key] = {
+                'baseline': base[key],
+                'candidate': cand[key],
+                'change': cand[key] - base[key],
+            }
+        return {
+            'status': 'success',
+            'baseline_version': baseline.version,
+            'candidate_version': candidate.version,
+            'applications': base['applications'],
+            'newly_approved': int((cand['approved'] & ~base['approved']).sum()),
+            'newly_rejected': int((base['approved'] & ~cand['approved']).sum()),
+            'summary': summary,
+            'load_seconds': round(loaded - started, 3),
+            'replay_seconds': round(finished - loaded, 3),
+        }
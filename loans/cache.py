@@ -0,0 +1,367 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+
+class CreditScoreCache:
+    """
+    Two-tier cache for credit scores
+
+    Scores live in the Django cache (Redis in production, locmem in tests)
+    behind a bounded in-process LRU. Keys carry a per-customer version token
+    held in the shared cache, so invalidating a customer in one process is
+    seen by every other process on its next lookup. An LRU entry remembers
+    when its version was last confirmed; with a positive version_ttl it is
+    served without any shared-cache call for that many seconds, and an
+    invalidation in another process is then only seen within version_ttl
+    (immediately in the invalidating process, and always with fresh=True).
+    A score computed while the customer was invalidated in this process is
+    returned but not kept locally. Keys also carry the current date
+    and expire at midnight, because active loans and current-year activity
+    depend on the day the score is computed.
+    """
+
+    KEY_PREFIX = 'credit_score'
+
+    def __init__(self, alias='default', lru_size=None, version_ttl=None):
+        self.alias = alias
+        self._lru_size = lru_size
+        self._version_ttl = version_ttl
+        self._lru = OrderedDict()
+        # customer_id -> [lookups in flight, invalidations since the first began]
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._counters = self._empty_counters()
+
+    @property
+    def lru_size(self):
+        if self._lru_size is None:
+            return getattr(settings, 'CREDIT_SCORE_CACHE_LRU_SIZE', 1024)
+        return self._lru_size
+
+    @property
+    def version_ttl(self):
+        if self._version_ttl is None:
+            return getattr(settings, 'CREDIT_SCORE_CACHE_VERSION_TTL', 0)
+        return self._version_ttl
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_or_compute(self, customer_id, compute, fresh=False):
+        """
+        Return the cached score for a customer, computing it on a miss
+        fresh=True confirms the version against the shared cache even when
+        the local entry was confirmed recently, for decisions that write
+        """
+        today = timezone.now().date().isoformat()
+        with self._lock:
+            if not fresh:
+                entry = self._lru.get(customer_id)
+                if entry is not None and entry[1] == today and monotonic() - entry[3] < self.version_ttl:
+                    self._lru.move_to_end(customer_id)
+                    self._counters['local_hits'] += 1
+                    return entry[2]
+            pending = self._pending.setdefault(customer_id, [0, 0])
+            pending[0] += 1
+            generation = pending[1]
+        try:
+            return self._lookup(customer_id, compute, today, generation)
+        finally:
+            with self._lock:
+                pending[0] -= 1
+                if not pending[0]:
+                    del self._pending[customer_id]
+
+    def _lookup(self, customer_id, compute, today, generation):
+        try:
+            version = self._get_version(customer_id)
+        except Exception:
+            self._count('errors')
+            return compute()
+
+        key = f'{self.KEY_PREFIX}:{customer_id}:{version}:{today}'
+        with self._lock:
+            entry = self._lru.get(customer_id)
+            if entry is not None and entry[0] == key:
+                self._lru[customer_id] = (key, today, entry[2], monotonic())
+                self._lru.move_to_end(customer_id)
+                self._counters['local_hits'] += 1
+                return entry[2]
+
+        try:
+            score = self.shared.get(key)
+        except Exception:
+            self._count('errors')
+            score = None
+        if score is not None:
+            self._count('shared_hits')
+            self._remember(customer_id, key, today, score, generation)
+            return score
+
+        self._count('misses')
+        score = compute()
+        try:
+            self.shared.set(key, score, timeout=self._seconds_until_midnight())
+        except Exception:
+            self._count('errors')
+        self._remember(customer_id, key, today, score, generation)
+        return score
+
+    async def aget_or_compute(self, customer_id, compute):
+        """
+        Async get_or_compute; the shared-cache round trips run in a worker
+        thread outside the thread-sensitive ORM executor
+        """
+        return await sync_to_async(self.get_or_compute, thread_sensitive=False)(customer_id, compute)
+
+    def invalidate(self, customer_id):
+        """Drop a customer's score in every process by rotating its version"""
+        with self._lock:
+            self._evict(customer_id)
+            self._counters['invalidations'] += 1
+        try:
+            self.shared.set(self._version_key(customer_id), uuid.uuid4().hex, timeout=None)
+        except Exception:
+            self._count('errors')
+
+    def invalidate_on_commit(self, customer_id):
+        """Invalidate now and again once the surrounding transaction commits"""
+        self.invalidate(customer_id)
+        transaction.on_commit(lambda: self.invalidate(customer_id))
+
+    def invalidate_many(self, customer_ids):
+        """Rotate the versions of many customers in one shared-cache round trip"""
+        customer_ids = list(customer_ids)
+        with self._lock:
+            for customer_id in customer_ids:
+                self._evict(customer_id)
+            self._counters['invalidations'] += len(customer_ids)
+        try:
+            self.shared.set_many(
+                {self._version_key(customer_id): uuid.uuid4().hex for customer_id in customer_ids},
+                timeout=None,
+            )
+        except Exception:
+            self._count('errors')
+
+    def invalidate_many_on_commit(self, customer_ids):
+        """Bulk variant of invalidate_on_commit"""
+        customer_ids = list(customer_ids)
+        self.invalidate_many(customer_ids)
+        transaction.on_commit(lambda: self.invalidate_many(customer_ids))
+
+    def stats(self):
+        """Hit, miss and eviction counters for this process"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['local_entries'] = len(self._lru)
+        stats['lru_size'] = self.lru_size
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear_local(self):
+        """Empty the in-process tier and reset the counters"""
+        with self._lock:
+            self._lru.clear()
+            self._counters = self._empty_counters()
+
+    def _get_version(self, customer_id):
+        version_key = self._version_key(customer_id)
+        version = self.shared.get(version_key)
+        if version is None:
+            self.shared.add(version_key, uuid.uuid4().hex, timeout=None)
+            version = self.shared.get(version_key)
+        return version
+
+    def _version_key(self, customer_id):
+        return f'{self.KEY_PREFIX}:version:{customer_id}'
+
+    def _evict(self, customer_id):
+        """Drop the local entry and void lookups in flight; call with _lock held"""
+        if self._lru.pop(customer_id, None) is not None:
+            self._counters['evictions'] += 1
+        pending = self._pending.get(customer_id)
+        if pending is not None:
+            pending[1] += 1
+
+    def _remember(self, customer_id, key, day, score, generation):
+        with self._lock:
+            if self._pending[customer_id][1] != generation:
+                # Invalidated while the score was looked up or computed
+                return
+            self._lru[customer_id] = (key, day, score, monotonic())
+            self._lru.move_to_end(customer_id)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _seconds_until_midnight():
+        now = timezone.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo)
+        return max(1, int((midnight - now).total_seconds()))
+
+    @staticmethod
+    def _empty_counters():
+        return {
+            'local_hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'errors': 0,
+        }
+
+
+credit_score_cache = CreditScoreCache()
+
+
+class LoanResponseCache:
+    """
+    Shared cache of rendered loan read responses
+
+    Entries hold the response body with its ETag and Last-Modified and are
+    stored under the request URL together with the customer's version token
+    as read before the response was rendered. Loan and customer writes rotate the token, so every
+    cached response for that customer goes stale in every process at once.
+    Disabled unless LOAN_RESPONSE_CACHE_TIMEOUT is positive.
+    """
+
+    KEY_PREFIX = 'loan_response'
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'LOAN_RESPONSE_CACHE_TIMEOUT', 0)
+
+    def get(self, url, customer_id=None):
+        """
+        (entry, version) for a URL: the current entry, or None on a miss, and
+        the (customer_id, token) version a fresh render is to be stored
+        under. Pass customer_id when it is known so the entry and the token
+        are read in one round trip; without it the token comes from the
+        customer of a stale entry, or is None
+        """
+        if self.timeout <= 0:
+            return None, None
+        entry_key = self._entry_key(url)
+        try:
+            if customer_id is None:
+                entry = self.shared.get(entry_key)
+                if entry is None:
+                    return None, None
+                customer_id = entry['customer_id']
+                token = self.shared.get(self._version_key(customer_id))
+            else:
+                version_key = self._version_key(customer_id)
+                values = self.shared.get_many([entry_key, version_key])
+                entry, token = values.get(entry_key), values.get(version_key)
+        except Exception:
+            return None, None
+        if entry is not None and token is not None and entry['version'] == token:
+            return entry, None
+        if token is None:
+            return None, self.version(customer_id)
+        return None, (customer_id, token)
+
+    async def aget(self, url, customer_id=None):
+        """Async get; the cache round trips run in a worker thread"""
+        if self.timeout <= 0:
+            return None, None
+        return await sync_to_async(self.get, thread_sensitive=False)(url, customer_id)
+
+    def version(self, customer_id):
+        """The customer's (customer_id, token) version, creating the token if needed"""
+        if self.timeout <= 0:
+            return None
+        version_key = self._version_key(customer_id)
+        token = uuid.uuid4().hex
+        try:
+            if not self.shared.add(version_key, token, timeout=None):
+                token = self.shared.get(version_key)
+        except Exception:
+            return None
+        return None if token is None else (customer_id, token)
+
+    async def aversion(self, customer_id):
+        if self.timeout <= 0:
+            return None
+        return await sync_to_async(self.version, thread_sensitive=False)(customer_id)
+
+    def set(self, url, version, customer_id, etag, last_modified, content):
+        """
+        Store a rendered response under a version read before the queries
+        it was rendered from, so a write committed since leaves it stale
+        """
+        if self.timeout <= 0 or version is None or version[0] != customer_id:
+            return
+        try:
+            self.shared.set(self._entry_key(url), {
+                'customer_id': customer_id,
+                'version': version[1],
+                'etag': etag,
+                'last_modified': last_modified,
+                'content': content,
+            }, timeout=self.timeout)
+        except Exception:
+            pass
+
+    async def aset(self, url, version, customer_id, etag, last_modified, content):
+        if self.timeout <= 0:
+            return
+        await sync_to_async(self.set, thread_sensitive=False)(
+            url, version, customer_id, etag, last_modified, content
+        )
+
+    def invalidate_many(self, customer_ids):
+        """Make every cached response of these customers stale"""
+        customer_ids = list(customer_ids)
+        if self.timeout <= 0 or not customer_ids:
+            return
+        try:
+            self.shared.set_many(
+                {self._version_key(customer_id): uuid.uuid4().hex for customer_id in customer_ids},
+                timeout=None,
+            )
+        except Exception:
+            pass
+
+    def invalidate_on_commit(self, customer_id):
+        """Invalidate now and again once the surrounding transaction commits"""
+        self.invalidate_many_on_commit([customer_id])
+
+    def invalidate_many_on_commit(self, customer_ids):
+        customer_ids = list(customer_ids)
+        self.invalidate_many(customer_ids)
+        transaction.on_commit(lambda: self.invalidate_many(customer_ids))
+
+    def _entry_key(self, url):
+        return f'{self.KEY_PREFIX}:{hashlib.md5(url.encode()).hexdigest()}'
+
+    def _version_key(self, customer_id):
+        return f'{self.KEY_PREFIX}:version:{customer_id}'
+
+
+loan_response_cache = LoanResponseCache()
@@ -0,0 +1,177 @@
+"""
+Seeded synthetic customer and loan data at any scale
+
+Rows are generated in fixed-size blocks, each drawn from its own RNG seeded
+by (seed, table, block number), so a dataset is reproducible for a given
+seed and block size and only one block is ever held in memory. Columns and
+value ranges follow customer_data.xlsx and loan_data.xlsx:
+
+- ages 20-70, salaries of 30k-300k in thousands, approved limits of
+  8-50 lakh in lakh steps, unique 10-digit phone numbers
+- loan amounts of 1-10 lakh, tenures of 3-180 months in steps of 3,
+  interest rates of 8-18% and approval dates from 2010 to 2023, with the
+  end date tenure months after approval and 50-100% of EMIs paid on time
+
+Loans pick their customer uniformly, so customers average loans / customers
+loans each. Frames use the spreadsheet headers, so they can be written out
+for the ingest_data command or fed straight into the ingestors.
+"""
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.db import connection
+
+from .ingestion import CustomerIngestor, LoanIngestor
+
+
+BLOCK_ROWS = 100000
+# openpyxl sheets hold 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1048575
+CUSTOMERS, LOANS = 0, 1
+PHONE_BASE = 9000000000
+PHONE_SPAN = 1000000000
+# Odd and not a multiple of 5, so id * PHONE_STEP is a permutation modulo PHONE_SPAN
+PHONE_STEP = 387420489
+PHONE_OFFSET = 104729
+FIRST_APPROVAL = np.datetime64('2010-01', 'M')
+LAST_APPROVAL = np.datetime64('2023-12', 'M')
+FIRST_NAMES = np.array([
+    'Aaron', 'Abigail', 'Adam', 'Adrian', 'Alexa', 'Amelia', 'Andrew', 'Anna', 'Austin', 'Bella',
+    'Brandon', 'Brian', 'Caleb', 'Carter', 'Chloe', 'Claire', 'Daniel', 'David', 'Dylan', 'Elena',
+    'Eli', 'Emily', 'Ethan', 'Eva', 'Gabriel', 'Grace', 'Hannah', 'Henry', 'Isaac', 'Isabella',
+    'Jack', 'Jacob', 'James', 'Julia', 'Kevin', 'Layla', 'Leah', 'Liam', 'Lucas', 'Lucy',
+    'Mason', 'Maya', 'Mia', 'Nathan', 'Noah', 'Nora', 'Olivia', 'Owen', 'Riley', 'Ryan',
+    'Samuel', 'Sarah', 'Sofia', 'Thomas', 'Victoria', 'William', 'Wyatt', 'Zoe',
+])
+LAST_NAMES = np.array([
+    'Adams', 'Allen', 'Baker', 'Brown', 'Campbell', 'Carter', 'Clark', 'Collins', 'Davis', 'Edwards',
+    'Evans', 'Garcia', 'Gonzalez', 'Green', 'Hall', 'Harris', 'Hernandez', 'Hill', 'Jackson', 'Johnson',
+    'Jones', 'King', 'Lee', 'Lewis', 'Lopez', 'Martin', 'Martinez', 'Miller', 'Mitchell', 'Moore',
+    'Nelson', 'Parker', 'Perez', 'Phillips', 'Roberts', 'Robinson', 'Rodriguez', 'Scott', 'Smith', 'Taylor',
+    'Thomas', 'Thompson', 'Turner', 'Walker', 'White', 'Williams', 'Wilson', 'Wright', 'Young',
+])
+
+
+class DatasetGenerator:
+    """Stream reproducible customer and loan frames in blocks"""
+
+    def __init__(self, customers, loans, seed=0, block_rows=BLOCK_ROWS):
+        if customers < 0 or loans < 0:
+            raise ValueError('Row counts must not be negative')
+        if customers > PHONE_SPAN:
+            raise ValueError(f'At most {PHONE_SPAN} customers have unique phone numbers')
+        if loans and not customers:
+            raise ValueError('Loans need at least one customer')
+        if block_rows < 1:
+            raise ValueError('block_rows must be positive')
+        self.customers = customers
+        self.loans = loans
+        self.seed = seed
+        self.block_rows = block_rows
+
+    def blocks(self, table, total):
+        """(rng, first id, row count) for each block of a table"""
+        for number, start in enumerate(range(0, total, self.block_rows)):
+            rng = np.random.default_rng([self.seed, table, number])
+            yield rng, start + 1, min(self.block_rows, total - start)
+
+    def customer_frames(self):
+        """customer_data frames, one per block"""
+        for rng, first_id, rows in self.blocks(CUSTOMERS, self.customers):
+            ids = np.arange(first_id, first_id + rows, dtype=np.int64)
+            yield pd.DataFrame({
+                'Customer ID': ids,
+                'First Name': rng.choice(FIRST_NAMES, rows),
+                'Last Name': rng.choice(LAST_NAMES, rows),
+                'Age': rng.integers(20, 71, rows),
+                'Phone Number': PHONE_BASE + (ids * PHONE_STEP + PHONE_OFFSET) % PHONE_SPAN,
+                'Monthly Salary': rng.integers(30, 301, rows) * 1000,
+                'Approved Limit': rng.integers(8, 51, rows) * 100000,
+            })
+
+    def loan_frames(self):
+        """loan_data frames, one per block"""
+        months = int((LAST_APPROVAL - FIRST_APPROVAL).astype(np.int64)) + 1
+        for rng, first_id, rows in self.blocks(LOANS, self.loans):
+            amount = rng.integers(1, 11, rows) * 100000
+            tenure = rng.integers(1, 61, rows) * 3
+            interest_rate = np.round(rng.uniform(8, 18, rows), 2)
+            monthly_rate = interest_rate / 1200
+            growth = (1 + monthly_rate) ** tenure
+            installment = np.round(amount * monthly_rate * growth / (growth - 1))
+            # Days 1-28 keep the end date on the same day of the month
+            approval_month = FIRST_APPROVAL + rng.integers(0, months, rows)
+            day = rng.integers(0, 28, rows).astype('timedelta64[D]')
+            start = approval_month.astype('datetime64[D]') + day
+            end = (approval_month + tenure).astype('datetime64[D]') + day
+            yield pd.DataFrame({
+                'Customer ID': rng.integers(1, self.customers + 1, rows),
+                'Loan ID': np.arange(first_id, first_id + rows, dtype=np.int64),
+                'Loan Amount': amount,
+                'Tenure': tenure,
+                'Interest Rate': interest_rate,
+                'Monthly payment': installment.astype(np.int64),
+                'EMIs paid on Time': np.round(tenure * rng.uniform(0.5, 1, rows)).astype(np.int64),
+                'Date of Approval': start,
+                'End Date': end,
+            })
+
+    def write(self, customer_path, loan_path, file_format='csv'):
+        """Write both tables to files; returns (customer rows, loan rows)"""
+        if file_format == 'xlsx':
+            if max(self.customers, self.loans) > XLSX_MAX_ROWS:
+                raise ValueError(f'An xlsx sheet holds at most {XLSX_MAX_ROWS} rows; use csv')
+            writer = write_xlsx
+        elif file_format == 'csv':
+            writer = write_csv
+        else:
+            raise ValueError(f'Unknown file format: {file_format}')
+        return (
+            writer(self.customer_frames(), customer_path, list(CustomerIngestor.columns)),
+            writer(self.loan_frames(), loan_path, list(LoanIngestor.columns)),
+        )
+
+    def load(self, chunk_size=None, use_copy=False):
+        """
+        Feed both tables through the ingestors; use_copy takes the COPY path
+        on PostgreSQL. Returns the customer and loan counts
+        """
+        customer_ingestor = CustomerIngestor(chunk_size)
+        loan_ingestor = LoanIngestor(chunk_size)
+        if use_copy and connection.vendor == 'postgresql':
+            return (
+                customer_ingestor.copy(self.customer_frames()),
+                loan_ingestor.copy(self.loan_frames()),
+            )
+        return (
+            customer_ingestor.ingest(self.customer_frames()),
+            loan_ingestor.ingest(self.loan_frames()),
+        )
+
+
+def write_csv(frames, path, columns):
+    """Append frames to a CSV file under one header; returns the row count"""
+    rows = 0
+    with open(path, 'w', newline='') as csv_file:
+        csv_file.write(','.join(columns) + '\n')
+        for frame in frames:
+            frame.to_csv(csv_file, header=False, index=False, date_format='%Y-%m-%d')
+            rows += len(frame)
+    return rows
+
+
+def write_xlsx(frames, path, columns):
+    """Stream frames into a write-only workbook; returns the row count"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    rows = 0
+    for frame in frames:
+        frame = frame.copy()
+        for column in frame.select_dtypes('datetime').columns:
+            frame[column] = frame[column].dt.date
+        for row in frame.itertuples(index=False, name=None):
+            sheet.append([value.item() if isinstance(value, np.generic) else value for value in row])
+        rows += len(frame)
+    workbook.save(path)
+    return rows
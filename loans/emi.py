@@ -0,0 +1,141 @@
+"""
+Shared EMI engine
+
+Installments are computed from annuity factors
+    factor = r * (1 + r) ** n / ((1 + r) ** n - 1),  r = annual_rate / 12
+held in a memoized table keyed by (rate in basis points, tenure). Each row
+of the table covers every tenure up to MAX_TENURE for one rate and is
+computed once with Decimal arithmetic, so scalar installments are
+Decimal-exact and rounded half-up to the paise, matching how amounts are
+stored. Longer tenures, which only historic loans have, get their factor
+computed on its own.
+"""
+from decimal import ROUND_FLOOR, ROUND_HALF_UP, Context, Decimal, localcontext
+from functools import lru_cache
+
+import numpy as np
+
+
+# Longest tenure offered to new applications, and the width of the factor table
+MAX_TENURE = 60
+PAISE = Decimal('0.01')
+FACTOR_PRECISION = 34
+FACTOR_CONTEXT = Context(prec=FACTOR_PRECISION)
+# Decimals of a basis point float rates are rounded to before rounding half-up
+# to whole basis points, which undoes the float error of rate * 100
+BPS_DECIMALS = 6
+
+
+@lru_cache(maxsize=4096)
+def rate_to_bps(interest_rate):
+    """Convert an annual percentage rate to whole basis points"""
+    return int(Decimal(str(interest_rate)).scaleb(2).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+@lru_cache(maxsize=4096)
+def _factor_row(rate_bps):
+    """Annuity factors for every tenure at one rate; index 0 is unused"""
+    with localcontext() as context:
+        context.prec = FACTOR_PRECISION
+        monthly_rate = Decimal(rate_bps) / Decimal(120000)
+        row = [Decimal(0)]
+        growth = Decimal(1)
+        for _ in range(MAX_TENURE):
+            growth *= 1 + monthly_rate
+            row.append(monthly_rate * growth / (growth - 1))
+    return tuple(row)
+
+
+@lru_cache(maxsize=4096)
+def _long_factor(rate_bps, tenure):
+    """Annuity factor for a tenure past the table"""
+    with localcontext() as context:
+        context.prec = FACTOR_PRECISION
+        monthly_rate = Decimal(rate_bps) / Decimal(120000)
+        growth = (1 + monthly_rate) ** tenure
+        return monthly_rate * growth / (growth - 1)
+
+
+def _factor(rate_bps, tenure):
+    if tenure <= MAX_TENURE:
+        return _factor_row(rate_bps)[tenure]
+    return _long_factor(rate_bps, tenure)
+
+
+@lru_cache(maxsize=4096)
+def _float_factor_row(rate_bps):
+    return np.array([float(factor) for factor in _factor_row(rate_bps)])
+
+
+def annuity_factor(interest_rate, tenure):
+    """Decimal annuity factor for an annual rate and a tenure in months"""
+    rate_bps = rate_to_bps(interest_rate)
+    tenure = int(tenure)
+    if rate_bps <= 0 or tenure < 1:
+        raise ValueError(f'No annuity factor for rate {interest_rate}% over {tenure} months')
+    return _factor(rate_bps, tenure)
+
+
+def monthly_installment(principal, interest_rate, tenure):
+    """
+    EMI for a loan, rounded half-up to the paise
+    Returns Decimal('0.00') when the rate or tenure is not positive
+    """
+    rate_bps = rate_to_bps(interest_rate)
+    tenure = int(tenure)
+    if rate_bps <= 0 or tenure <= 0:
+        return Decimal('0.00')
+    installment = FACTOR_CONTEXT.multiply(Decimal(str(principal)), _factor(rate_bps, tenure))
+    return installment.quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+def max_principal(installment, interest_rate, tenure):
+    """Largest principal, rounded down to the paise, whose EMI is at most ``installment``"""
+    installment = Decimal(str(installment))
+    if rate_to_bps(interest_rate) <= 0:
+        return (installment * int(tenure)).quantize(PAISE, rounding=ROUND_FLOOR)
+    with localcontext() as context:
+        context.prec = FACTOR_PRECISION
+        principal = installment / annuity_factor(interest_rate, tenure)
+    return principal.quantize(PAISE, rounding=ROUND_FLOOR)
+
+
+def annuity_factors(interest_rates, tenures):
+    """Float64 annuity factors for arrays of rates and tenures (0 where undefined)"""
+    # Half-up like rate_to_bps; np.rint would round half-bps rates to even
+    scaled = np.round(np.asarray(interest_rates, dtype=np.float64) * 100, BPS_DECIMALS)
+    rates_bps = np.floor(scaled + 0.5).astype(np.int64)
+    tenures = np.asarray(tenures, dtype=np.int64)
+    rates_bps, tenures = np.broadcast_arrays(rates_bps, tenures)
+    factors = np.zeros(rates_bps.shape, dtype=np.float64)
+    valid = (rates_bps > 0) & (tenures >= 1)
+    tabled = valid & (tenures <= MAX_TENURE)
+    for rate_bps in np.unique(rates_bps[tabled]):
+        cells = tabled & (rates_bps == rate_bps)
+        factors[cells] = _float_factor_row(int(rate_bps))[tenures[cells]]
+    long = valid & (tenures > MAX_TENURE)
+    if long.any():
+        pairs, inverse = np.unique(np.stack([rates_bps[long], tenures[long]], axis=1), axis=0, return_inverse=True)
+        pair_factors = np.array([float(_long_factor(int(rate_bps), int(tenure))) for rate_bps, tenure in pairs])
+        factors[long] = pair_factors[inverse.reshape(-1)]
+    return factors
+
+
+def installments(principals, interest_rates, tenures):
+    """
+    Vectorized monthly_installment over arrays of loans
+    Principals, rates and tenures broadcast against each other; the result
+    is a float64 array rounded half-up to the paise
+    """
+    principal_paise = np.rint(np.asarray(principals, dtype=np.float64) * 100)
+    factors = annuity_factors(interest_rates, tenures)
+    return np.floor(principal_paise * factors + 0.5) / 100
+
+
+def max_principals(installment, interest_rates, tenures):
+    """Vectorized max_principal over arrays of rates and tenures"""
+    factors = annuity_factors(interest_rates, tenures)
+    tenures = np.broadcast_to(np.asarray(tenures, dtype=np.float64), factors.shape)
+    with np.errstate(divide='ignore'):
+        principals = np.where(factors > 0, float(installment) / factors, float(installment) * tenures)
+    return np.floor(principals * 100) / 100
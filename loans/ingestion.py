@@ -0,0 +1,920 @@
+import csv
+import hashlib
+import io
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import emi
+from .cache import credit_score_cache, loan_response_cache
+from .models import Customer, IngestionCheckpoint, IngestionRun, Loan
+from .services import CreditProfileService
+from .validation import FrameValidation, coerce_column
+
+
+def read_batches(path, batch_size, start=0, stop=None):
+    """
+    Stream an .xlsx or .csv file as DataFrames of at most batch_size rows
+    Only one batch is held in memory at a time. start and stop select a
+    range of data rows (0-based, header excluded, stop exclusive)
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        nrows = None if stop is None else max(stop - start, 0)
+        if nrows == 0:
+            return
+        yield from pd.read_csv(
+            path, chunksize=batch_size, skiprows=range(1, start + 1), nrows=nrows
+        )
+    elif suffix in ('.xlsx', '.xlsm'):
+        yield from _read_workbook_batches(path, batch_size, start, stop)
+    else:
+        raise ValueError(f'Unsupported ingestion file type: {path}')
+
+
+def _read_workbook_batches(path, batch_size, start=0, stop=None):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    sheet_rows = workbook.active.iter_rows(values_only=True)
+    try:
+        header = next(sheet_rows, None)
+        if header is None or (stop is not None and stop <= start):
+            return
+        columns = ['' if name is None else str(name).strip() for name in header]
+        # Ranges count non-empty data rows; read-only sheets parse every
+        # earlier row either way
+        rows = (row for row in sheet_rows if any(value is not None for value in row))
+        rows = islice(rows, start, stop)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        sheet_rows.close()
+        workbook.close()
+
+
+def read_column(path, column):
+    """
+    One column of an .xlsx or .csv file as a Series indexed by data-row
+    number, numbered as read_batches numbers rows; empty when the header
+    lacks the column
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        header = pd.read_csv(path, nrows=0).columns
+        if column not in header:
+            return pd.Series(dtype=object)
+        return pd.read_csv(path, usecols=[column])[column]
+    if suffix in ('.xlsx', '.xlsm'):
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        sheet_rows = workbook.active.iter_rows(values_only=True)
+        try:
+            header = ['' if name is None else str(name).strip() for name in next(sheet_rows, None) or ()]
+            if column not in header:
+                return pd.Series(dtype=object)
+            position = header.index(column)
+            return pd.Series([
+                row[position] if position < len(row) else None
+                for row in sheet_rows if any(value is not None for value in row)
+            ], dtype=object)
+        finally:
+            sheet_rows.close()
+            workbook.close()
+    raise ValueError(f'Unsupported ingestion file type: {path}')
+
+
+def count_rows(path):
+    """Number of data rows in an .xlsx or .csv file, header excluded"""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        lines = 0
+        last = b'\n'
+        with open(path, 'rb') as data_file:
+            for block in iter(lambda: data_file.read(1 << 20), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        if last != b'\n':
+            lines += 1
+        return max(lines - 1, 0)
+    if suffix in ('.xlsx', '.xlsm'):
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            # max_row comes from the sheet's dimension record when it has one
+            rows = sheet.max_row
+            if rows is None:
+                rows = sum(1 for _ in sheet.iter_rows(values_only=True))
+            return max(rows - 1, 0)
+        finally:
+            workbook.close()
+    raise ValueError(f'Unsupported ingestion file type: {path}')
+
+
+def hash_file(path):
+    """SHA-256 of a file's contents, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as data_file:
+        for block in iter(lambda: data_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_ranges(total_rows, range_size):
+    """
+    Split total_rows into consecutive (start, stop) ranges of range_size rows
+    The last range is open-ended (stop is None) so rows past a stale count
+    are still read
+    """
+    starts = range(0, max(total_rows, 1), range_size)
+    return [
+        (start, start + range_size if start + range_size < total_rows else None)
+        for start in starts
+    ]
+
+
+class IngestionProgress:
+    """Rows done, throughput and ETA for one ingestion run"""
+
+    def __init__(self, rows_total, report=None):
+        self.rows_total = rows_total
+        self.rows_done = 0
+        self.report = report
+        self.started = time.monotonic()
+
+    def advance(self, rows):
+        self.rows_done += rows
+        if self.report is not None:
+            self.report(self.snapshot())
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.rows_done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.rows_total - self.rows_done, 0)
+        return {
+            'rows_done': self.rows_done,
+            'rows_total': self.rows_total,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rate, 1),
+            'eta_seconds': round(remaining / rate, 1) if rate else None,
+        }
+
+
+class RunLedger:
+    """
+    Keeps an IngestionRun up to date while a file is ingested
+
+    commit() is called inside each chunk's transaction, so the committed
+    offset and counts never run ahead of the data. Rejected rows are
+    appended to a sidecar CSV once their chunk has committed.
+    """
+
+    def __init__(self, run, fields):
+        self.run = run
+        self.fields = fields
+        self.pending = []
+        self.started = time.monotonic()
+
+    def reject(self, row, reason, detail, record):
+        self.pending.append((row, reason, detail, record))
+
+    def commit(self, counts, rows):
+        """Fold one committed chunk into the run"""
+        run = self.run
+        run.rows_committed += rows
+        for key in ('created', 'updated', 'skipped', 'rejected'):
+            setattr(run, key, getattr(run, key) + counts[key])
+        rejections, self.pending = self.pending, []
+        for _, reason, _, _ in rejections:
+            run.rejection_reasons[reason] = run.rejection_reasons.get(reason, 0) + 1
+        if rejections and not run.error_file:
+            run.error_file = str(Path(settings.INGESTION_ERROR_DIR) / f'{run.source}-run-{run.pk}-rejected.csv')
+        IngestionRun.objects.filter(pk=run.pk).update(
+            rows_committed=run.rows_committed,
+            created=run.created,
+            updated=run.updated,
+            skipped=run.skipped,
+            rejected=run.rejected,
+            rejection_reasons=run.rejection_reasons,
+            error_file=run.error_file,
+        )
+        if rejections:
+            transaction.on_commit(lambda: self.write_rejections(rejections))
+
+    def write_rejections(self, rejections):
+        path = Path(self.run.error_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not path.exists()
+        with open(path, 'a', newline='') as error_file:
+            writer = csv.writer(error_file)
+            if new_file:
+                writer.writerow(['row', 'reason', 'detail'] + self.fields)
+            for row, reason, detail, record in rejections:
+                writer.writerow([row, reason, detail] + [record.get(field, '') for field in self.fields])
+
+    def finish(self, status, timings, message=''):
+        """Close the run with its timings; elapsed time adds up across resumes"""
+        run = self.run
+        run.status = status
+        run.message = message
+        run.elapsed_seconds += time.monotonic() - self.started
+        phase_seconds = dict(run.phase_seconds)
+        for phase, seconds in timings.items():
+            phase_seconds[phase] = round(phase_seconds.get(phase, 0) + seconds, 3)
+        run.phase_seconds = phase_seconds
+        run.rows_per_second = (
+            round(run.rows_committed / run.elapsed_seconds, 1) if run.elapsed_seconds else None
+        )
+        run.finished_at = timezone.now()
+        run.save(update_fields=[
+            'status', 'message', 'elapsed_seconds', 'phase_seconds', 'rows_per_second', 'finished_at',
+        ])
+        return run
+
+
+class BulkIngestor:
+    """
+    Chunked bulk upsert of a spreadsheet frame into one model
+
+    Each chunk is first validated column by column (see validate): values
+    are coerced and checked with whole-column operations and the chunk is
+    split into valid and rejected rows. Valid rows are written in one
+    transaction with a single bulk_create(update_conflicts=True) statement;
+    created and updated counts come from one primary-key lookup per chunk.
+
+    On PostgreSQL, copy_file offers a fast-load path: rows are streamed into
+    an unlogged staging table with COPY FROM STDIN and merged with a single
+    INSERT ... ON CONFLICT DO UPDATE.
+
+    A key repeated anywhere in a file keeps its last row; the earlier rows
+    are rejected, whichever chunk or range they fall in, because the key
+    column of the whole file is scanned before ingesting it.
+
+    Every row carries a hash of its ingested fields; rows whose hash matches
+    the stored one are counted as skipped and not written. load() also skips
+    a whole file identical to the last one fully ingested from the source,
+    and records each run in an IngestionRun ledger that --resume picks up.
+    """
+
+    model = None
+    # Name of the IngestionCheckpoint and IngestionRun source for this ingestor
+    source = None
+    key_field = None
+    columns = {}
+    update_fields = []
+    # Coercion applied to each ingested field: 'int', 'decimal', 'date' or 'str'
+    field_types = {}
+    # Fields that may be empty in the file; complete() fills them in
+    optional_fields = set()
+    # Inclusive (low, high) bounds checked after coercion
+    field_bounds = {}
+    # Reason recorded for rows the COPY merge filters out
+    merge_rejection_reason = 'rejected'
+    # Rejections that depend on other data and may pass on a later run; a
+    # file with any of them is not checkpointed. Every other reason is a
+    # fault of the file itself
+    retryable_reasons = frozenset()
+
+    # Column holding the customer each row belongs to
+    customer_column = 'customer_id'
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or settings.INGESTION_CHUNK_SIZE
+        self.ledger = None
+        self.timings = defaultdict(float)
+        # Row numbers whose key appears again later in the input
+        self.superseded = pd.Index([], dtype='int64')
+
+    def load(self, path, use_copy=False, force=False, resume=False):
+        """
+        Ingest a whole file unless it is identical to the last file fully
+        ingested from this source. The file is checkpointed unless a row was
+        rejected for one of retryable_reasons, so only those are retried on
+        the next run; rows rejected for faults of the file stay rejected
+
+        With resume, the latest unfinished run of the same file continues
+        from its last committed chunk. Returns the run's counts plus
+        file_skipped, run_id, rows_per_second and error_file
+        """
+        file_hash = hash_file(path)
+        checkpoint = IngestionCheckpoint.objects.filter(source=self.source).first()
+        if not force and checkpoint is not None and checkpoint.file_hash == file_hash:
+            return {
+                'created': 0, 'updated': 0, 'skipped': 0, 'rejected': 0,
+                'file_skipped': True, 'run_id': None, 'rows_per_second': None, 'error_file': '',
+            }
+
+        run = None
+        if resume:
+            run = IngestionRun.objects.filter(
+                source=self.source, file_hash=file_hash,
+                status__in=[IngestionRun.RUNNING, IngestionRun.FAILED],
+            ).order_by('-pk').first()
+        if run is None:
+            run = IngestionRun.objects.create(source=self.source, source_file=str(path), file_hash=file_hash)
+        elif run.status != IngestionRun.RUNNING:
+            run.status = IngestionRun.RUNNING
+            run.save(update_fields=['status'])
+
+        self.ledger = RunLedger(run, list(self.columns.values()))
+        self.timings.clear()
+        try:
+            if use_copy:
+                self.copy_file(path, start=run.rows_committed)
+            else:
+                self.ingest_file(path, start=run.rows_committed)
+        except Exception as e:
+            self.ledger.finish(IngestionRun.FAILED, self.timings, str(e))
+            raise
+        finally:
+            ledger, self.ledger = self.ledger, None
+        run = ledger.finish(IngestionRun.COMPLETED, self.timings)
+
+        if not self.retryable_reasons & set(run.rejection_reasons):
+            IngestionCheckpoint.objects.update_or_create(
+                source=self.source, defaults={'file_hash': file_hash}
+            )
+        return {
+            'created': run.created,
+            'updated': run.updated,
+            'skipped': run.skipped,
+            'rejected': run.rejected,
+            'file_skipped': False,
+            'run_id': run.pk,
+            'rows_per_second': run.rows_per_second,
+            'error_file': run.error_file,
+        }
+
+    def ingest_file(self, path, start=0, stop=None, progress=None):
+        """Stream a spreadsheet or CSV file, or a range of its rows, into the table"""
+        with self.repeated_keys(read_column(path, self.key_column)):
+            return self.ingest(read_batches(path, self.chunk_size, start, stop), progress, start)
+
+    def ingest(self, batches, progress=None, start=0):
+        """
+        Upsert every row of a DataFrame or an iterable of DataFrames
+        progress, when given, is an IngestionProgress advanced after each
+        chunk; start is the file row number of the first row
+        Returns created/updated/skipped/rejected counts
+        """
+        if isinstance(batches, pd.DataFrame) and self.superseded.empty:
+            # A single frame is the whole input, so its repeated keys are known up front
+            keys = batches.get(self.key_column, pd.Series(dtype=object))
+            with self.repeated_keys(keys.set_axis(pd.RangeIndex(start, start + len(keys)))):
+                return self.ingest([batches], progress, start)
+
+        counts = {'created': 0, 'updated': 0, 'skipped': 0, 'rejected': 0}
+        for frame in self.numbered_batches(batches, start):
+            for offset in range(0, len(frame), self.chunk_size):
+                chunk = frame.iloc[offset:offset + self.chunk_size]
+                chunk_counts = self.write_chunk(chunk)
+                for key, value in chunk_counts.items():
+                    counts[key] += value
+                if progress is not None:
+                    progress.advance(len(chunk))
+        if counts['created']:
+            self.reset_sequence()
+        return counts
+
+    @property
+    def key_column(self):
+        """File column holding key_field"""
+        return next(column for column, field in self.columns.items() if field == self.key_field)
+
+    @contextmanager
+    def repeated_keys(self, keys):
+        """
+        Reject, while the block runs, the rows whose key appears again later
+        in keys, the raw key column of the whole input numbered by data row
+        """
+        keys = coerce_column(keys, 'int').dropna()
+        previous, self.superseded = self.superseded, keys.index[keys.duplicated(keep='last')]
+        try:
+            yield
+        finally:
+            self.superseded = previous
+
+    def numbered_batches(self, batches, start=0):
+        """
+        Index each frame by data-row number (0-based, header excluded) and
+        time how long reading takes
+        """
+        if isinstance(batches, pd.DataFrame):
+            batches = [batches]
+        batches = iter(batches)
+        row_number = start
+        while True:
+            with self.phase('read'):
+                frame = next(batches, None)
+            if frame is None:
+                return
+            yield frame.set_axis(pd.RangeIndex(row_number, row_number + len(frame)))
+            row_number += len(frame)
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to one phase of the run's timings"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.monotonic() - started
+
+    def write_chunk(self, chunk):
+        with self.phase('build'):
+            valid, rejected = self.validate(chunk)
+            self.reject(rejected)
+
+        with transaction.atomic():
+            with self.phase('write'):
+                existing = self.existing_hashes(valid[self.key_field].tolist())
+                stored = valid[self.key_field].map(existing)
+                changed = self.instances(valid[stored != valid['row_hash']])
+                if changed:
+                    self.model.objects.bulk_create(
+                        changed,
+                        update_conflicts=True,
+                        unique_fields=[self.key_field],
+                        update_fields=self.update_fields,
+                    )
+            if changed:
+                with self.phase('refresh'):
+                    self.after_write(self.touched_customers(changed))
+
+            created = int(stored.isna().sum())
+            counts = {
+                'created': created,
+                'updated': len(changed) - created,
+                'skipped': len(valid) - len(changed),
+                'rejected': len(rejected),
+            }
+            if self.ledger is not None:
+                self.ledger.commit(counts, len(chunk))
+        return counts
+
+    def existing_hashes(self, keys):
+        """Stored row hash of each key of the chunk already present in the table"""
+        return dict(self.model.objects.filter(pk__in=keys).values_list('pk', 'row_hash'))
+
+    def validate(self, frame):
+        """
+        Coerce and check a numbered raw frame with whole-column operations
+        Returns (valid, rejected): valid holds the typed fields plus row_hash,
+        rejected the renamed raw rows plus reason and detail columns
+        """
+        raw = frame.rename(columns=self.columns)
+        validation = FrameValidation(raw.index)
+        typed = pd.DataFrame(index=raw.index)
+        for field, kind in self.field_types.items():
+            if field not in raw:
+                validation.reject(
+                    pd.Series(True, index=raw.index), 'missing column', f'Missing column {field!r}'
+                )
+                typed[field] = np.nan
+                continue
+            column = raw[field]
+            typed[field] = coerce_column(column, kind)
+            if field not in self.optional_fields:
+                validation.reject(column.isna(), 'missing value', f'{field} is empty')
+            validation.reject(
+                typed[field].isna() & column.notna(), 'invalid value', f'{field} is not a valid {kind}'
+            )
+        validation.check_bounds(typed, self.field_bounds)
+        self.check(typed, validation)
+
+        accepted = validation.accepted
+        rejected = raw[~accepted].assign(
+            reason=validation.reasons[~accepted], detail=validation.details[~accepted]
+        )
+        valid = self.complete(typed[accepted].copy())
+        for field, kind in self.field_types.items():
+            if kind == 'int':
+                valid[field] = valid[field].astype('int64')
+            elif kind == 'decimal':
+                valid[field] = valid[field].round(self.model._meta.get_field(field).decimal_places)
+        valid['row_hash'] = self.row_hashes(valid)
+        return valid, rejected
+
+    def check(self, frame, validation):
+        """Cross-row checks on the coerced frame; a repeated key keeps its last row"""
+        accepted = frame[validation.accepted]
+        superseded = pd.Series(accepted.index.isin(self.superseded), index=accepted.index)
+        validation.reject(
+            superseded | accepted[self.key_field].duplicated(keep='last'),
+            'duplicate id', f'{self.key_field} appears again later in the file'
+        )
+
+    def complete(self, frame):
+        """Fill in optional fields of the valid rows"""
+        return frame
+
+    def row_hashes(self, frame):
+        """
+        Hash of each row's ingested values; decimals are hashed as whole
+        units of their scale so formatting differences do not register
+        """
+        values = {}
+        for field, kind in self.field_types.items():
+            column = frame[field]
+            if kind == 'decimal':
+                scale = 10 ** self.model._meta.get_field(field).decimal_places
+                column = (column * scale).round().astype('int64')
+            values[field] = column
+        hashes = pd.util.hash_pandas_object(pd.DataFrame(values, index=frame.index), index=False)
+        return hashes.astype(str)
+
+    def instances(self, frame):
+        """Model instances for valid rows"""
+        frame = frame.copy()
+        for field, kind in self.field_types.items():
+            if kind == 'date':
+                frame[field] = frame[field].dt.date
+        return [self.model(**record) for record in frame.to_dict('records')]
+
+    def reject(self, rejected):
+        """Record rejected rows with their reasons; the sheet row counts the header as row 1"""
+        if self.ledger is None:
+            return
+        for row_number, record in zip(rejected.index, rejected.to_dict('records')):
+            reason = record.pop('reason')
+            detail = record.pop('detail')
+            self.ledger.reject(row_number + 2, reason, detail, record)
+
+    def touched_customers(self, instances):
+        """Customer ids whose derived data depends on the written rows"""
+        return {getattr(instance, self.customer_column) for instance in instances}
+
+    def after_write(self, customer_ids):
+        """Hook run inside the write transaction; bulk writes skip model signals"""
+
+    def copy_file(self, path, start=0, stop=None, progress=None):
+        """
+        Fast-load a file. On PostgreSQL rows are COPYed into an unlogged
+        staging table and merged in one statement; other databases fall back
+        to chunked bulk upserts
+        """
+        if connection.vendor != 'postgresql':
+            return self.ingest_file(path, start, stop, progress)
+        with self.repeated_keys(read_column(path, self.key_column)):
+            return self.copy(read_batches(path, self.chunk_size, start, stop), progress, start)
+
+    def copy(self, batches, progress=None, start=0):
+        """
+        COPY every row into a staging table, then merge it into the model's
+        table. Returns created/updated/skipped/rejected counts taken from
+        the merge
+        """
+        fields = [self.model._meta.get_field(name) for name in self.stage_fields()]
+        stage = connection.ops.quote_name(f'{self.model._meta.db_table}_stage_{uuid.uuid4().hex[:12]}')
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        build_rejected = 0
+        rows = 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE UNLOGGED TABLE {stage} (stage_row bigint, '
+                + ', '.join(
+                    f'{connection.ops.quote_name(field.column)} {field.db_type(connection)}'
+                    for field in fields
+                )
+                + ')'
+            )
+            try:
+                for frame in self.numbered_batches(batches, start):
+                    buffer = io.StringIO()
+                    with self.phase('build'):
+                        valid, rejected = self.validate(frame)
+                        self.reject(rejected)
+                        build_rejected += len(rejected)
+                        valid.to_csv(
+                            buffer, header=False, columns=[field.attname for field in fields],
+                            date_format='%Y-%m-%d'
+                        )
+                    buffer.seek(0)
+                    with self.phase('write'):
+                        cursor.copy_expert(
+                            f'COPY {stage} (stage_row, {columns}) FROM STDIN WITH (FORMAT csv)', buffer
+                        )
+                    rows += len(frame)
+                    if progress is not None:
+                        progress.advance(len(frame))
+
+                with transaction.atomic():
+                    with self.phase('write'):
+                        counts, customer_ids = self.merge(cursor, stage, fields)
+                    with self.phase('refresh'):
+                        self.after_write(customer_ids)
+                    counts['rejected'] += build_rejected
+                    if self.ledger is not None:
+                        if counts['rejected'] > build_rejected:
+                            self.reject_merged_out(cursor, stage)
+                        self.ledger.commit(counts, rows)
+            finally:
+                cursor.execute(f'DROP TABLE IF EXISTS {stage}')
+
+        if counts['created']:
+            self.reset_sequence()
+        return counts
+
+    def reject_merged_out(self, cursor, stage):
+        """Record the staged rows the merge filtered out"""
+        quote = connection.ops.quote_name
+        key = quote(self.model._meta.get_field(self.key_field).column)
+        customer = quote(self.customer_column)
+        cursor.execute(
+            f'SELECT stage.stage_row, stage.{key}, stage.{customer} FROM {stage} stage '
+            f'WHERE NOT ({self.merge_filter(stage)}) ORDER BY stage.stage_row'
+        )
+        for row_number, key_value, customer_id in cursor.fetchall():
+            self.ledger.reject(
+                row_number + 2,
+                self.merge_rejection_reason,
+                self.merge_rejection_reason,
+                {self.key_field: key_value, self.customer_column: customer_id},
+            )
+
+    def stage_fields(self):
+        """Model fields carried through the staging table; timestamps are set by the merge"""
+        return [self.key_field] + [
+            name for name in self.update_fields
+            if not getattr(self.model._meta.get_field(name), 'auto_now', False)
+        ]
+
+    def merge_filter(self, stage):
+        """SQL condition a staged row must meet to be merged"""
+        return 'TRUE'
+
+    def merge(self, cursor, stage, fields):
+        """
+        Merge the staging table with one INSERT ... ON CONFLICT DO UPDATE
+        Repeated keys are rejected before staging; any that reach the stage
+        collapse to their last occurrence and count as updates. Rows failing
+        merge_filter are rejected and rows whose hash is unchanged are skipped
+        """
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        key = quote(self.model._meta.get_field(self.key_field).column)
+        customer = quote(self.customer_column)
+        columns = [quote(field.column) for field in fields]
+        timestamps = [
+            field for field in self.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        ]
+        # Model defaults are applied by Django, not the database
+        defaults = [
+            field for field in self.model._meta.concrete_fields
+            if field not in fields and field not in timestamps and field.has_default()
+        ]
+        insert_columns = columns + [quote(field.column) for field in timestamps + defaults]
+        select_columns = (
+            [f'source.{column}' for column in columns]
+            + ['now()'] * len(timestamps)
+            + ['%s'] * len(defaults)
+        )
+        assignments = [f'{column} = EXCLUDED.{column}' for column in columns if column != key]
+        assignments += [
+            f'{quote(field.column)} = EXCLUDED.{quote(field.column)}'
+            for field in timestamps if field.auto_now
+        ]
+        accepted = self.merge_filter(stage)
+        row_hash = quote(self.model._meta.get_field('row_hash').column)
+
+        # Customers whose rows are about to change or move away from them
+        cursor.execute(
+            f'SELECT DISTINCT target.{customer} FROM {table} target '
+            f'JOIN {stage} stage ON stage.{key} = target.{key} '
+            f'WHERE stage.{row_hash} IS DISTINCT FROM target.{row_hash}'
+        )
+        customer_ids = {row[0] for row in cursor.fetchall()}
+
+        cursor.execute(
+            f"""
+            WITH source AS (
+                SELECT DISTINCT ON (stage.{key}) {', '.join(f'stage.{column}' for column in columns)}
+                FROM {stage} stage
+                WHERE {accepted}
+                ORDER BY stage.{key}, stage.stage_row DESC
+            ), merged AS (
+                INSERT INTO {table} ({', '.join(insert_columns)})
+                SELECT {', '.join(select_columns)} FROM source
+                ON CONFLICT ({key}) DO UPDATE SET {', '.join(assignments)}
+                WHERE {table}.{row_hash} IS DISTINCT FROM EXCLUDED.{row_hash}
+                RETURNING (xmax = 0) AS inserted, {customer}
+            )
+            SELECT
+                (SELECT count(*) FROM merged WHERE inserted),
+                (SELECT count(*) FROM merged WHERE NOT inserted),
+                (SELECT count(*) FROM source),
+                (SELECT count(*) FROM {stage} stage WHERE {accepted}),
+                (SELECT count(*) FROM {stage}),
+                (SELECT array_agg(DISTINCT {customer}) FROM merged)
+            """,
+            [field.get_db_prep_save(field.get_default(), connection) for field in defaults]
+        )
+        inserted, updated, distinct_rows, accepted_rows, staged_rows, merged_customers = cursor.fetchone()
+        customer_ids.update(merged_customers or [])
+        return {
+            'created': inserted,
+            'updated': updated + (accepted_rows - distinct_rows),
+            'skipped': distinct_rows - inserted - updated,
+            'rejected': staged_rows - accepted_rows,
+        }, customer_ids
+
+    def reset_sequence(self):
+        """Move the primary-key sequence past ids inserted explicitly"""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [self.model]):
+                cursor.execute(sql)
+
+
+class CustomerIngestor(BulkIngestor):
+    """
+    Bulk upsert of customer_data rows
+    Phone numbers must be unique within a batch and must not belong to
+    another stored customer
+    """
+
+    model = Customer
+    source = 'customers'
+    key_field = 'customer_id'
+    columns = {
+        'Customer ID': 'customer_id',
+        'First Name': 'first_name',
+        'Last Name': 'last_name',
+        'Age': 'age',
+        'Phone Number': 'phone_number',
+        'Monthly Salary': 'monthly_salary',
+        'Approved Limit': 'approved_limit',
+    }
+    # current_debt and current_emi_total are maintained from the loans table
+    update_fields = [
+        'first_name', 'last_name', 'age', 'phone_number', 'monthly_salary', 'approved_limit', 'row_hash',
+        'updated_at',
+    ]
+    field_types = {
+        'customer_id': 'int',
+        'first_name': 'str',
+        'last_name': 'str',
+        'age': 'int',
+        'phone_number': 'int',
+        'monthly_salary': 'decimal',
+        'approved_limit': 'decimal',
+    }
+    optional_fields = {'approved_limit'}
+    # The other customer's phone number may change before the next run
+    retryable_reasons = frozenset({'phone in use'})
+    field_bounds = {
+        'age': (18, 100),
+        'phone_number': (0, None),
+        'monthly_salary': (0, None),
+        'approved_limit': (0, None),
+    }
+
+    def check(self, frame, validation):
+        super().check(frame, validation)
+        accepted = frame[validation.accepted]
+        validation.reject(
+            accepted['phone_number'].duplicated(keep='last'),
+            'duplicate phone', 'phone_number appears again later in the batch'
+        )
+        accepted = frame[validation.accepted]
+        owners = dict(
+            Customer.objects.filter(phone_number__in=accepted['phone_number'].astype('int64').tolist())
+            .values_list('phone_number', 'customer_id')
+        )
+        owner = accepted['phone_number'].map(owners)
+        validation.reject(
+            owner.notna() & (owner != accepted['customer_id']),
+            'phone in use', 'phone_number belongs to another customer'
+        )
+
+    def complete(self, frame):
+        # 36 * monthly_salary rounded to the nearest lakh, as Customer.calculate_approved_limit
+        missing = frame['approved_limit'].isna()
+        frame.loc[missing, 'approved_limit'] = (
+            np.round(frame.loc[missing, 'monthly_salary'] * 36 / 100000) * 100000
+        )
+        return frame
+
+    def after_write(self, customer_ids):
+        credit_score_cache.invalidate_many_on_commit(customer_ids)
+        loan_response_cache.invalidate_many_on_commit(customer_ids)
+
+
+class LoanIngestor(BulkIngestor):
+    """
+    Bulk upsert of loan_data rows
+    Customer ids are resolved against an index loaded up front; loans for
+    unknown customers are rejected
+    """
+
+    model = Loan
+    source = 'loans'
+    key_field = 'loan_id'
+    merge_rejection_reason = 'unknown customer'
+    # The customer may be ingested before the next run
+    retryable_reasons = frozenset({'unknown customer'})
+    columns = {
+        'Customer ID': 'customer_id',
+        'Loan ID': 'loan_id',
+        'Loan Amount': 'loan_amount',
+        'Tenure': 'tenure',
+        'Interest Rate': 'interest_rate',
+        'Monthly payment': 'monthly_repayment',
+        'EMIs paid on Time': 'emis_paid_on_time',
+        'Date of Approval': 'start_date',
+        'End Date': 'end_date',
+    }
+    update_fields = [
+        'customer', 'loan_amount', 'tenure', 'interest_rate', 'monthly_repayment',
+        'emis_paid_on_time', 'start_date', 'end_date', 'row_hash', 'updated_at',
+    ]
+    field_types = {
+        'loan_id': 'int',
+        'customer_id': 'int',
+        'loan_amount': 'decimal',
+        'tenure': 'int',
+        'interest_rate': 'decimal',
+        'monthly_repayment': 'decimal',
+        'emis_paid_on_time': 'int',
+        'start_date': 'date',
+        'end_date': 'date',
+    }
+    optional_fields = {'monthly_repayment'}
+    field_bounds = {
+        'loan_amount': (0, None),
+        # Historic loans run past the 60 months allowed for new applications
+        'tenure': (1, None),
+        'interest_rate': (0, None),
+        'monthly_repayment': (0, None),
+        'emis_paid_on_time': (0, None),
+    }
+
+    def __init__(self, chunk_size=None):
+        super().__init__(chunk_size)
+        self.customer_index = None
+        self.previous_customers = {}
+
+    def ingest(self, batches, progress=None, start=0):
+        self.customer_index = pd.Index(Customer.objects.values_list('customer_id', flat=True))
+        return super().ingest(batches, progress, start)
+
+    def existing_hashes(self, keys):
+        existing = list(Loan.objects.filter(pk__in=keys).values_list('pk', 'customer_id', 'row_hash'))
+        self.previous_customers = {loan_id: customer_id for loan_id, customer_id, _ in existing}
+        return {loan_id: row_hash for loan_id, _, row_hash in existing}
+
+    def check(self, frame, validation):
+        super().check(frame, validation)
+        customer_ids = frame.loc[validation.accepted, 'customer_id']
+        # The COPY path looks customers up per batch; its merge re-checks them
+        known = self.customer_index
+        if known is None:
+            known = pd.Index(
+                Customer.objects.filter(customer_id__in=customer_ids.astype('int64').unique().tolist())
+                .values_list('customer_id', flat=True)
+            )
+        validation.reject(
+            pd.Series(known.get_indexer(customer_ids) == -1, index=customer_ids.index),
+            self.merge_rejection_reason, 'Customer does not exist'
+        )
+
+    def complete(self, frame):
+        missing = frame['monthly_repayment'].isna()
+        if missing.any():
+            frame.loc[missing, 'monthly_repayment'] = emi.installments(
+                frame.loc[missing, 'loan_amount'],
+                frame.loc[missing, 'interest_rate'],
+                frame.loc[missing, 'tenure'],
+            )
+        return frame
+
+    def touched_customers(self, instances):
+        # A reassigned loan must also leave its previous customer's totals
+        previous = {
+            self.previous_customers[instance.loan_id] for instance in instances
+            if instance.loan_id in self.previous_customers
+        }
+        return super().touched_customers(instances) | previous
+
+    def merge_filter(self, stage):
+        customers = connection.ops.quote_name(Customer._meta.db_table)
+        return f'EXISTS (SELECT 1 FROM {customers} customer WHERE customer.customer_id = stage.customer_id)'
+
+    def after_write(self, customer_ids):
+        customer_ids = sorted(customer_ids)
+        for start in range(0, len(customer_ids), self.chunk_size):
+            CreditProfileService.refresh_many(customer_ids[start:start + self.chunk_size])
+        credit_score_cache.invalidate_many_on_commit(customer_ids)
+        loan_response_cache.invalidate_many_on_commit(customer_ids)
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from loans.backtest import PolicyBacktest
+from loans.policy import CreditPolicy, get_active_policy
+
+
+class Command(BaseCommand):
+    help = 'Replay every historical loan through a candidate credit policy and compare it to a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('policy', help='Path to the candidate policy JSON file')
+        parser.add_argument(
+            '--baseline',
+            help='Path to the baseline policy JSON file (defaults to the active policy)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Loan rows fetched per database round trip',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the report as JSON',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            candidate = CreditPolicy.from_file(options['policy'])
+            baseline = (
+                CreditPolicy.from_file(options['baseline'])
+                if options['baseline'] else get_active_policy()
+            )
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not load policy: {e}')
+        
+        report = PolicyBacktest(read_chunk_size=options['chunk_size']).run(candidate, baseline)
+        
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        
+        self.stdout.write(
+            f"Policy {report['candidate_version']} vs {report['baseline_version']} "
+            f"over {report['applications']} historical applications"
+        )
+        self.stdout.write(f"{'metric':<20}{'baseline':>18}{'candidate':>18}{'change':>18}")
+        for metric, values in report['summary'].items():
+            self.stdout.write(
+                f"{metric:<20}{values['baseline']:>18.4f}{values['candidate']:>18.4f}{values['change']:>+18.4f}"
+            )
+        self.stdout.write(f"Newly approved: {report['newly_approved']}, newly rejected: {report['newly_rejected']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded in {report['load_seconds']}s, replayed in {report['replay_seconds']}s"
+        ))
@@ -1,15 +1,73 @@
 from django.core.management.base import BaseCommand
-from loans.tasks import ingest_all_data
+from loans.tasks import ingest_all_data, ingest_all_data_parallel
 
 
 class Command(BaseCommand):
-    help = 'Ingest customer and loan data from Excel files'
+    help = 'Ingest customer and loan data from Excel or CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--customer-file',
+            default=None,
+            help='Customer data file (defaults to CUSTOMER_DATA_PATH)',
+        )
+        parser.add_argument(
+            '--loan-file',
+            default=None,
+            help='Loan data file (defaults to LOAN_DATA_PATH)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Rows upserted per transaction (defaults to INGESTION_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            dest='use_copy',
+            help='On PostgreSQL, COPY rows into a staging table and merge them in one statement',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Ingest files even when they match the last ingested file',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the last unfinished run of each file from its last committed chunk',
+        )
+        parser.add_argument(
+            '--parallel',
+            action='store_true',
+            help='Queue the ingestion as row-range tasks spread across Celery workers',
+        )
+        parser.add_argument(
+            '--range-size',
+            type=int,
+            default=None,
+            help='Rows per task with --parallel (defaults to INGESTION_RANGE_SIZE)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write('Starting data ingestion...')
         
+        if options['parallel']:
+            task = ingest_all_data_parallel.delay(
+                options['customer_file'], options['loan_file'], options['range_size'],
+                options['chunk_size'], options['use_copy']
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'Parallel ingestion queued as task {task.id}')
+            )
+            return
+        
         try:
-            result = ingest_all_data()  # Synchronous call, not .delay()
+            result = ingest_all_data(
+                options['customer_file'], options['loan_file'], options['chunk_size'],
+                options['use_copy'], options['force'], options['resume']
+            )  # Synchronous call, not .delay()
             
             
             if result['status'] == 'success':
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from loans.services import CreditProfileService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild customer credit profiles from the loans table and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing the rebuilt profiles',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling credit profiles...')
+        
+        try:
+            drift = CreditProfileService.rebuild(apply=not options['dry_run'])
+            
+            for customer_id, changes in drift:
+                details = ', '.join(
+                    f'{field}: {stored} -> {expected}'
+                    for field, (stored, expected) in changes.items()
+                )
+                self.stdout.write(f'Customer {customer_id}: {details}')
+            
+            if drift:
+                action = 'found' if options['dry_run'] else 'repaired'
+                self.stdout.write(
+                    self.style.WARNING(f'Drift {action} in {len(drift)} credit profiles')
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS('All credit profiles are in sync'))
+                
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error during reconciliation: {str(e)}')
+            )
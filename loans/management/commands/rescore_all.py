@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from loans.tasks import rescore_all_customers
+
+
+class Command(BaseCommand):
+    help = 'Recompute the credit score of every customer with the vectorized engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--read-chunk-size',
+            type=int,
+            default=50000,
+            help='Loan rows fetched per database round trip',
+        )
+        parser.add_argument(
+            '--write-chunk-size',
+            type=int,
+            default=1000,
+            help='Customer rows written per bulk update',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            help='Queue the rescoring on a Celery worker instead of running it here',
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'read_chunk_size': options['read_chunk_size'],
+            'write_chunk_size': options['write_chunk_size'],
+        }
+        
+        if options['run_async']:
+            task = rescore_all_customers.delay(**kwargs)
+            self.stdout.write(self.style.SUCCESS(f'Rescoring queued as task {task.id}'))
+            return
+        
+        self.stdout.write('Rescoring all customers...')
+        result = rescore_all_customers(**kwargs)
+        
+        if result['status'] == 'success':
+            self.stdout.write(self.style.SUCCESS(result['message']))
+            self.stdout.write(
+                f"Scoring took {result['score_seconds']}s, writing took {result['write_seconds']}s"
+            )
+        else:
+            self.stdout.write(self.style.ERROR(f'Rescoring failed: {result["message"]}'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_customer_credit_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='credit_score',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='credit_score_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
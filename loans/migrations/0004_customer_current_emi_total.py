@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:12
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def populate_active_totals(apps, schema_editor):
+    """Fill current_debt and current_emi_total from the active loans"""
+    Customer = apps.get_model('loans', 'Customer')
+    Loan = apps.get_model('loans', 'Loan')
+    active_loans = Loan.objects.filter(
+        customer_id=OuterRef('customer_id'), end_date__gte=timezone.now().date()
+    ).order_by().values('customer_id')
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    zero = Value(Decimal('0.00'), output_field=money)
+    Customer.objects.update(
+        current_debt=Coalesce(
+            Subquery(active_loans.annotate(total=Sum('loan_amount')).values('total'), output_field=money), zero
+        ),
+        current_emi_total=Coalesce(
+            Subquery(active_loans.annotate(total=Sum('monthly_repayment')).values('total'), output_field=money), zero
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_customer_credit_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='current_debt',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='current_emi_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RemoveField(
+            model_name='customercreditprofile',
+            name='active_debt',
+        ),
+        migrations.RemoveField(
+            model_name='customercreditprofile',
+            name='active_emi_sum',
+        ),
+        migrations.RunPython(populate_active_totals, migrations.RunPython.noop),
+    ]
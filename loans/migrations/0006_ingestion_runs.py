@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_ingestion_row_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('source_file', models.CharField(max_length=500)),
+                ('file_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('rows_committed', models.IntegerField(default=0)),
+                ('created', models.IntegerField(default=0)),
+                ('updated', models.IntegerField(default=0)),
+                ('skipped', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('rejection_reasons', models.JSONField(blank=True, default=dict)),
+                ('error_file', models.CharField(blank=True, max_length=500)),
+                ('phase_seconds', models.JSONField(blank=True, default=dict)),
+                ('elapsed_seconds', models.FloatField(default=0)),
+                ('rows_per_second', models.FloatField(blank=True, null=True)),
+                ('message', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ingestion_runs',
+                'indexes': [models.Index(fields=['source', 'file_hash', 'status'], name='ingestion_r_source_cfa06c_idx')],
+            },
+        ),
+    ]
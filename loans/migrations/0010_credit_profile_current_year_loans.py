@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0009_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customercreditprofile',
+            name='current_year',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customercreditprofile',
+            name='current_year_loans',
+            field=models.IntegerField(default=0),
+        ),
+    ]
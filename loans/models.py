@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
-import math
+
+from . import emi
 
 
 class Customer(models.Model):
@@ -12,7 +13,13 @@ class Customer(models.Model):
     phone_number = models.BigIntegerField(unique=True)
     monthly_salary = models.DecimalField(max_digits=12, decimal_places=2)
     approved_limit = models.DecimalField(max_digits=12, decimal_places=2)
-    current_debt = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    current_debt = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    current_emi_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit_score = models.IntegerField(null=True, blank=True)
+    credit_score_updated_at = models.DateTimeField(null=True, blank=True)
+    # Content hash of the source row this customer was last ingested from
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'customers'
@@ -40,7 +47,8 @@ class Customer(models.Model):
 class Loan(models.Model):
     """Loan model for storing loan information"""
     loan_id = models.AutoField(primary_key=True)
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans')
+    # Indexed by the composite indexes below, which lead with customer_id
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans', db_index=False)
     loan_amount = models.DecimalField(max_digits=12, decimal_places=2)
     tenure = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(60)])
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
@@ -50,33 +58,50 @@ class Loan(models.Model):
     end_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Content hash of the source row this loan was last ingested from
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
 
     class Meta:
         db_table = 'loans'
+        indexes = [
+            # Customer loan listing, keyset-paginated on loan_id
+            models.Index(fields=['customer', 'loan_id'], name='loans_customer_loan_id_idx'),
+            # Active loans of a customer; covers the current_debt / current_emi_total sums
+            models.Index(
+                fields=['customer', 'end_date'], include=['loan_amount', 'monthly_repayment'],
+                name='loans_customer_end_date_idx',
+            ),
+            # Start date ranges: current-year counts and the admin date filter
+            models.Index(fields=['start_date'], name='loans_start_date_idx'),
+        ]
 
     def __str__(self):
         return f"Loan {self.loan_id} - {self.customer.full_name}"
 
     def calculate_monthly_repayment(self):
         """Calculate monthly repayment using compound interest formula"""
-        if self.interest_rate <= 0 or self.tenure <= 0:
-            return 0
-        
-        # Convert annual interest rate to monthly
-        monthly_rate = float(self.interest_rate) / 100 / 12
-        
-        # Calculate EMI using compound interest formula
-        principal = float(self.loan_amount)
-        if monthly_rate == 0:
-            return principal / self.tenure
-        
-        emi = principal * (monthly_rate * (1 + monthly_rate) ** self.tenure) / ((1 + monthly_rate) ** self.tenure - 1)
-        return round(emi, 2)
+        return emi.monthly_installment(self.loan_amount, self.interest_rate, self.tenure)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        loan = super().from_db(db, field_names, values)
+        # Customer the row belongs to in the database, so a reassignment can
+        # refresh the customer the loan is taken from
+        loan._stored_customer_id = loan.__dict__.get('customer_id')
+        return loan
+
+    @property
+    def stored_customer_id(self):
+        """Customer the loan was loaded with or last saved under; None for a new loan"""
+        return getattr(self, '_stored_customer_id', None)
 
     def save(self, *args, **kwargs):
         if not self.monthly_repayment:
             self.monthly_repayment = self.calculate_monthly_repayment()
-        super().save(*args, **kwargs)
+        # Keep the row and its credit profile update in one transaction
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+        self._stored_customer_id = self.customer_id
 
     @property
     def repayments_left(self):
@@ -87,4 +112,132 @@ class Loan(models.Model):
     def is_active(self):
         """Check if loan is still active"""
         from django.utils import timezone
-        return timezone.now().date() <= self.end_date 
\ No newline at end of file
+        return timezone.now().date() <= self.end_date
+
+
+class CustomerCreditProfile(models.Model):
+    """
+    Running loan totals used to score a customer without rescanning loans
+    Active debt and EMIs are kept on the customer row itself
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_profile'
+    )
+    total_tenure = models.IntegerField(default=0)
+    emis_paid_on_time = models.IntegerField(default=0)
+    loan_count = models.IntegerField(default=0)
+    total_volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_loan_start_date = models.DateField(null=True, blank=True)
+    # Loans started in current_year; the profile is rebuilt once the year changes
+    current_year_loans = models.IntegerField(default=0)
+    current_year = models.IntegerField(null=True, blank=True)
+    # Indexed for the nightly settle_matured_loans scan
+    next_expiry_date = models.DateField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'customer_credit_profiles'
+
+    def __str__(self):
+        return f"Credit profile for customer {self.customer_id}"
+
+    def is_stale(self, current_date):
+        """
+        Active totals (here and on the customer row) are stale once a loan
+        counted as active has ended, and the current-year count once the
+        year it was counted for is over
+        """
+        if self.current_year != current_date.year:
+            return True
+        return self.next_expiry_date is not None and self.next_expiry_date < current_date
+
+    def as_history(self, current_date, customer=None):
+        """Return the totals in the shape used by CreditScoreService.score_from_history"""
+        customer = customer or self.customer
+        return {
+            'loan_count': self.loan_count,
+            'total_tenure': self.total_tenure,
+            'emis_paid_on_time': self.emis_paid_on_time,
+            'total_volume': self.total_volume,
+            'active_debt': customer.current_debt,
+            'active_emi_sum': customer.current_emi_total,
+            'current_year_loans': self.current_year_loans,
+        }
+
+
+class IngestionCheckpoint(models.Model):
+    """Hash of the last file fully ingested from each ingestion source"""
+    source = models.CharField(max_length=50, unique=True)
+    file_hash = models.CharField(max_length=64)
+    ingested_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ingestion_checkpoints'
+
+    def __str__(self):
+        return f"{self.source} checkpoint {self.file_hash[:12]}"
+
+
+class IngestionRun(models.Model):
+    """
+    Ledger of one ingestion of a source file
+    Offset and counts are saved in the same transaction as each chunk, so a
+    resumed run starts exactly after the last committed chunk
+    """
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    source = models.CharField(max_length=50)
+    source_file = models.CharField(max_length=500)
+    file_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    # Data rows (header excluded) covered by committed chunks
+    rows_committed = models.IntegerField(default=0)
+    created = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    rejection_reasons = models.JSONField(default=dict, blank=True)
+    error_file = models.CharField(max_length=500, blank=True)
+    phase_seconds = models.JSONField(default=dict, blank=True)
+    elapsed_seconds = models.FloatField(default=0)
+    rows_per_second = models.FloatField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ingestion_runs'
+        indexes = [models.Index(fields=['source', 'file_hash', 'status'])]
+
+    def __str__(self):
+        return f"{self.source} run {self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for an Idempotency-Key sent to a POST endpoint
+    The row is claimed before the request runs and holds the response once
+    it finishes; status_code stays null while the first request is running
+    """
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.IntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    content = models.BinaryField(null=True, blank=True)
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [models.UniqueConstraint(fields=['endpoint', 'key'], name='idempotency_key_unique')]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key}"
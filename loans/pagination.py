@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LoanCursorPagination(CursorPagination):
+    """
+    Keyset pagination over loan_id
+    Each page filters on the last loan_id seen instead of counting or
+    offsetting, so deep pages cost the same as the first
+    """
+
+    ordering = 'loan_id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,99 @@
+import json
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+
+DEFAULT_POLICY = {
+    'version': 'v1',
+    'max_emi_ratio': 0.5,
+    # Scores above min_score are approved; the rate is raised to rate_floor when set
+    'bands': [
+        {'min_score': 50, 'rate_floor': None},
+        {'min_score': 30, 'rate_floor': 12},
+        {'min_score': 10, 'rate_floor': 16},
+    ],
+}
+
+
+class CreditPolicy:
+    """Versioned approval policy: score bands, rate floors and the EMI ratio limit"""
+
+    def __init__(self, version, bands, max_emi_ratio=0.5):
+        self.version = str(version)
+        self.max_emi_ratio = float(max_emi_ratio)
+        self.bands = sorted(
+            ((float(band['min_score']), band.get('rate_floor')) for band in bands),
+            key=lambda band: band[0],
+            reverse=True,
+        )
+        if not self.bands:
+            raise ValueError('A credit policy needs at least one score band')
+        if not 0 < self.max_emi_ratio <= 1:
+            raise ValueError('max_emi_ratio must be between 0 and 1')
+
+    def __repr__(self):
+        return f'CreditPolicy(version={self.version!r})'
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['version'], data['bands'], data.get('max_emi_ratio', 0.5))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as policy_file:
+            return cls.from_dict(json.load(policy_file))
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'max_emi_ratio': self.max_emi_ratio,
+            'bands': [
+                {'min_score': min_score, 'rate_floor': rate_floor}
+                for min_score, rate_floor in self.bands
+            ],
+        }
+
+    def decide(self, credit_score, requested_interest_rate):
+        """
+        Return (approval, corrected_interest_rate) for one application
+        """
+        for min_score, rate_floor in self.bands:
+            if credit_score > min_score:
+                if rate_floor is None or requested_interest_rate > rate_floor:
+                    return True, requested_interest_rate
+                return True, float(rate_floor)
+        return False, requested_interest_rate
+
+    def decide_arrays(self, credit_scores, requested_interest_rates):
+        """
+        Vectorized decide: returns (approved, corrected_interest_rates) arrays
+        """
+        scores = np.asarray(credit_scores, dtype=np.float64)
+        requested = np.asarray(requested_interest_rates, dtype=np.float64)
+        approved = np.zeros(scores.shape, dtype=bool)
+        corrected = requested.copy()
+        undecided = np.ones(scores.shape, dtype=bool)
+        for min_score, rate_floor in self.bands:
+            in_band = undecided & (scores > min_score)
+            approved |= in_band
+            if rate_floor is not None:
+                corrected = np.where(in_band, np.maximum(requested, float(rate_floor)), corrected)
+            undecided &= ~in_band
+        return approved, corrected
+
+    def emi_limit_exceeded(self, current_emis, monthly_salary):
+        return float(current_emis) > float(monthly_salary) * self.max_emi_ratio
+
+
+@lru_cache(maxsize=8)
+def _load_policy(path):
+    if path:
+        return CreditPolicy.from_file(path)
+    return CreditPolicy.from_dict(DEFAULT_POLICY)
+
+
+def get_active_policy():
+    """The policy configured by CREDIT_POLICY_PATH, or the built-in default"""
+    return _load_policy(getattr(settings, 'CREDIT_POLICY_PATH', ''))
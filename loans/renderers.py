@@ -0,0 +1,32 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+_encoder = JSONEncoder()
+# orjson leaves these raw; JSONRenderer escapes them for JavaScript
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def dumps(data):
+    """
+    Compact UTF-8 JSON byte-for-byte equal to JSONRenderer's output
+    Types orjson does not handle itself (Decimal, and datetimes so they keep
+    DRF's format) go through DRF's JSONEncoder
+    """
+    content = orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    if LINE_SEPARATOR in content or PARAGRAPH_SEPARATOR in content:
+        content = content.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer encoded with orjson; indented output falls back to the standard library"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -1,4 +1,7 @@
+import decimal
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import Customer, Loan
 
 
@@ -66,6 +69,38 @@ class LoanEligibilityResponseSerializer(serializers.Serializer):
     monthly_installment = serializers.DecimalField(max_digits=12, decimal_places=2)
 
 
+class LoanOfferRequestSerializer(serializers.Serializer):
+    """Serializer for loan offer grid requests"""
+    customer_id = serializers.IntegerField()
+    loan_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class LoanOfferSerializer(serializers.Serializer):
+    """Serializer for one tenure in a loan offer grid"""
+    tenure = serializers.IntegerField()
+    approval = serializers.BooleanField()
+    corrected_interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+    monthly_installment = serializers.DecimalField(max_digits=12, decimal_places=2)
+    within_emi_headroom = serializers.BooleanField()
+    max_loan_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class LoanOfferResponseSerializer(serializers.Serializer):
+    """Serializer for loan offer grid responses"""
+    customer_id = serializers.IntegerField()
+    credit_score = serializers.IntegerField()
+    approval = serializers.BooleanField()
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+    corrected_interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
+    loan_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    current_emis = serializers.DecimalField(max_digits=14, decimal_places=2)
+    emi_headroom = serializers.DecimalField(max_digits=14, decimal_places=2)
+    available_limit = serializers.DecimalField(max_digits=14, decimal_places=2)
+    message = serializers.CharField()
+    offers = LoanOfferSerializer(many=True)
+
+
 class LoanCreateSerializer(serializers.Serializer):
     """Serializer for loan creation"""
     customer_id = serializers.IntegerField()
@@ -119,4 +154,62 @@ class CustomerLoanSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Loan
-        fields = ['loan_id', 'loan_amount', 'interest_rate', 'monthly_installment', 'repayments_left'] 
\ No newline at end of file
+        fields = ['loan_id', 'loan_amount', 'interest_rate', 'monthly_installment', 'repayments_left']
+
+
+class RowSerializer:
+    """
+    Build a read serializer's output from values() rows without DRF's
+    per-field machinery. The serializer's fields are compiled once into
+    (key, column, convert) entries; a nested serializer becomes a nested
+    dict read from related__ columns. Output matches serializer.data
+    """
+
+    def __init__(self, serializer_class, prefix=''):
+        self.entries = []
+        self.columns = []
+        for key, field in serializer_class().fields.items():
+            column = prefix + field.source.replace('.', '__')
+            if isinstance(field, serializers.BaseSerializer):
+                nested = RowSerializer(type(field), column + '__')
+                self.entries.append((key, None, nested.to_dict))
+                self.columns.extend(nested.columns)
+            else:
+                self.entries.append((key, column, self.converter(field)))
+                self.columns.append(column)
+
+    @staticmethod
+    def converter(field):
+        """Function turning a stored value into the field's representation"""
+        if type(field) is serializers.IntegerField:
+            return int
+        if type(field) is serializers.CharField:
+            return str
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if (type(field) is not serializers.DecimalField or field.decimal_places is None
+                or not coerce_to_string or field.localize):
+            return field.to_representation
+        # DecimalField.to_representation with its quantize context built once
+        quantum = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+
+        def to_string(value):
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value).strip())
+            return '{:f}'.format(value.quantize(quantum, rounding=field.rounding, context=context))
+        return to_string
+
+    def to_dict(self, row):
+        data = {}
+        for key, column, convert in self.entries:
+            if column is None:
+                data[key] = convert(row)
+            else:
+                value = row[column]
+                data[key] = None if value is None else convert(value)
+        return data
+
+    def to_list(self, rows):
+        return [self.to_dict(row) for row in rows]
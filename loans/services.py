@@ -1,7 +1,17 @@
 from decimal import Decimal
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.utils import timezone
-from datetime import datetime, date
-from .models import Customer, Loan
+from datetime import datetime, date, timedelta
+from . import emi
+from .cache import credit_score_cache
+from .models import Customer, CustomerCreditProfile, IdempotencyKey, Loan
+from .policy import get_active_policy
+from .scoring import score_histories, started_in_year
 
 
 class CreditScoreService:
@@ -14,59 +24,95 @@ class CreditScoreService:
         Returns a score out of 100
         """
         try:
-            # Get all loans for the customer
-            loans = Loan.objects.filter(customer=customer)
-            
-            if not loans.exists():
-                return 50  # Default score for new customers
-            
-            # Check if current debt exceeds approved limit
-            from django.utils import timezone
-            current_date = timezone.now().date()
-            current_debt = sum(float(loan.loan_amount) for loan in loans if loan.end_date >= current_date)
-            if current_debt > float(customer.approved_limit):
-                return 0
-            
-            # Calculate components
-            past_loans_paid_on_time = CreditScoreService._calculate_past_loans_score(loans)
-            number_of_loans = CreditScoreService._calculate_loan_count_score(loans)
-            current_year_activity = CreditScoreService._calculate_current_year_score(loans)
-            loan_volume = CreditScoreService._calculate_loan_volume_score(loans, customer)
-            
-            # Weighted average of components
-            credit_score = (
-                past_loans_paid_on_time * 0.4 +
-                number_of_loans * 0.2 +
-                current_year_activity * 0.2 +
-                loan_volume * 0.2
-            )
-            
-            return min(100, max(0, round(credit_score)))
+            history = CreditScoreService.get_loan_history(customer)
+            return CreditScoreService.score_from_history(history, customer.approved_limit)
             
         except Exception as e:
             print(f"Error calculating credit score: {e}")
             return 0
     
     @staticmethod
-    def _calculate_past_loans_score(loans):
-        """Calculate score based on past loans paid on time"""
-        if not loans.exists():
-            return 50
+    def get_credit_score(customer):
+        """Return the cached credit score, calculating it on a cache miss"""
+        return credit_score_cache.get_or_compute(
+            customer.customer_id,
+            lambda: CreditScoreService.calculate_credit_score(customer)
+        )
+    
+    @staticmethod
+    def get_loan_history(customer):
+        """
+        Collect every scoring component for a customer in a single
+        conditional-aggregation query
+        """
+        current_date = timezone.now().date()
+        return Loan.objects.filter(customer=customer).aggregate(
+            **CreditScoreService.history_aggregates(current_date)
+        )
+    
+    @staticmethod
+    def history_aggregates(current_date):
+        """Aggregate expressions for every scoring component"""
+        active = Q(end_date__gte=current_date)
+        return {
+            'loan_count': Count('loan_id'),
+            'total_tenure': Sum('tenure'),
+            'emis_paid_on_time': Sum('emis_paid_on_time'),
+            'total_volume': Sum('loan_amount'),
+            'active_debt': Sum('loan_amount', filter=active),
+            'active_emi_sum': Sum('monthly_repayment', filter=active),
+            'current_year_loans': Count('loan_id', filter=started_in_year(current_date.year)),
+            'last_loan_start_date': Max('start_date'),
+            'next_expiry_date': Min('end_date', filter=active),
+        }
+    
+    @staticmethod
+    def score_from_history(history, approved_limit):
+        """
+        Apply the scoring weights to aggregated loan history
+        """
+        if not history['loan_count']:
+            return 50  # Default score for new customers
         
-        total_emis = sum(loan.tenure for loan in loans)
-        emis_paid_on_time = sum(loan.emis_paid_on_time for loan in loans)
+        # Check if current debt exceeds approved limit
+        current_debt = float(history['active_debt'] or 0)
+        if current_debt > float(approved_limit):
+            return 0
+        
+        # Calculate components
+        past_loans_paid_on_time = CreditScoreService._calculate_past_loans_score(
+            history['total_tenure'], history['emis_paid_on_time']
+        )
+        number_of_loans = CreditScoreService._calculate_loan_count_score(history['loan_count'])
+        current_year_activity = CreditScoreService._calculate_current_year_score(
+            history['current_year_loans']
+        )
+        loan_volume = CreditScoreService._calculate_loan_volume_score(
+            history['total_volume'], approved_limit
+        )
         
-        if total_emis == 0:
+        # Weighted average of components
+        credit_score = (
+            past_loans_paid_on_time * 0.4 +
+            number_of_loans * 0.2 +
+            current_year_activity * 0.2 +
+            loan_volume * 0.2
+        )
+        
+        return min(100, max(0, round(credit_score)))
+    
+    @staticmethod
+    def _calculate_past_loans_score(total_emis, emis_paid_on_time):
+        """Calculate score based on past loans paid on time"""
+        if not total_emis:
             return 50
         
-        on_time_percentage = (float(emis_paid_on_time) / float(total_emis)) * 100
+        on_time_percentage = (float(emis_paid_on_time or 0) / float(total_emis)) * 100
         return min(100, on_time_percentage)
     
     @staticmethod
-    def _calculate_loan_count_score(loans):
+    def _calculate_loan_count_score(loan_count):
         """Calculate score based on number of loans taken"""
-        loan_count = loans.count()
-        
         if loan_count == 0:
             return 50
         elif loan_count == 1:
@@ -79,21 +125,18 @@ class CreditScoreService:
             return 100
     
     @staticmethod
-    def _calculate_current_year_score(loans):
+    def _calculate_current_year_score(current_year_loans):
         """Calculate score based on loan activity in current year"""
-        current_year = timezone.now().year
-        current_year_loans = loans.filter(start_date__year=current_year)
-        
-        if current_year_loans.exists():
+        if current_year_loans:
             return 100
         else:
             return 50
     
     @staticmethod
-    def _calculate_loan_volume_score(loans, customer):
+    def _calculate_loan_volume_score(total_loan_volume, approved_limit):
         """Calculate score based on loan approved volume"""
-        total_loan_volume = sum(float(loan.loan_amount) for loan in loans)
-        approved_limit = float(customer.approved_limit)
+        total_loan_volume = float(total_loan_volume or 0)
+        approved_limit = float(approved_limit)
         
         if approved_limit == 0:
             return 50
@@ -110,6 +153,334 @@ class CreditScoreService:
             return 40
 
 
+class CreditProfileService:
+    """
+    Service for maintaining per-customer running loan totals
+    Active debt and EMIs live on the customer row (current_debt and
+    current_emi_total); the remaining totals live in CustomerCreditProfile
+    """
+    
+    PROFILE_FIELDS = [
+        'total_tenure', 'emis_paid_on_time', 'loan_count', 'total_volume',
+        'last_loan_start_date', 'next_expiry_date', 'current_year_loans', 'current_year',
+    ]
+    CUSTOMER_FIELDS = ['current_debt', 'current_emi_total']
+    
+    @staticmethod
+    def get_profile(customer):
+        """
+        Return an up-to-date credit profile for a customer loaded with
+        select_related('credit_profile'), rebuilding it and the customer's
+        active totals if missing or stale
+        """
+        current_date = timezone.now().date()
+        try:
+            profile = customer.credit_profile
+        except CustomerCreditProfile.DoesNotExist:
+            profile = None
+        
+        if profile is None or profile.is_stale(current_date):
+            profile = CreditProfileService.refresh(customer.customer_id, create=True)
+            customer.refresh_from_db(fields=CreditProfileService.CUSTOMER_FIELDS)
+        return profile
+    
+    @staticmethod
+    def get_profiles(customers):
+        """
+        Bulk variant of get_profile: returns {customer_id: profile}, rebuilding
+        missing or stale profiles with one grouped query and one upsert
+        """
+        current_date = timezone.now().date()
+        profiles = {}
+        stale = []
+        for customer in customers:
+            try:
+                profile = customer.credit_profile
+            except CustomerCreditProfile.DoesNotExist:
+                profile = None
+            if profile is None or profile.is_stale(current_date):
+                stale.append(customer)
+            else:
+                profiles[customer.customer_id] = profile
+        
+        if stale:
+            with transaction.atomic():
+                # Locked like refresh_many, and the active totals re-read under the lock
+                locked = {
+                    customer.customer_id: customer
+                    for customer in CreditProfileService._lock_customers(
+                        [customer.customer_id for customer in stale]
+                    )
+                }
+                stale = [customer for customer in stale if customer.customer_id in locked]
+                for customer in stale:
+                    for field in CreditProfileService.CUSTOMER_FIELDS:
+                        setattr(customer, field, getattr(locked[customer.customer_id], field))
+                profiles.update(CreditProfileService._rebuild_customers(stale))
+        return profiles
+    
+    @staticmethod
+    def record_new_loan(loan):
+        """Add a newly created loan to its customer's running totals"""
+        current_date = timezone.now().date()
+        loan_amount = Decimal(str(loan.loan_amount))
+        start_date = Value(loan.start_date, output_field=models.DateField())
+        is_active = loan.end_date >= current_date
+        updates = {
+            'loan_count': F('loan_count') + 1,
+            'total_tenure': F('total_tenure') + int(loan.tenure),
+            'emis_paid_on_time': F('emis_paid_on_time') + int(loan.emis_paid_on_time),
+            'total_volume': F('total_volume') + loan_amount,
+            'last_loan_start_date': Greatest(Coalesce('last_loan_start_date', start_date), start_date),
+        }
+        if loan.start_date.year == current_date.year:
+            # A profile counted for another year is stale and rebuilt on its next read
+            updates['current_year_loans'] = F('current_year_loans') + 1
+        if is_active:
+            end_date = Value(loan.end_date, output_field=models.DateField())
+            updates['next_expiry_date'] = Least(Coalesce('next_expiry_date', end_date), end_date)
+        
+        updated = CustomerCreditProfile.objects.filter(customer_id=loan.customer_id).update(**updates)
+        if not updated:
+            CreditProfileService.refresh(loan.customer_id, create=True)
+        elif is_active:
+            Customer.objects.filter(customer_id=loan.customer_id).update(
+                current_debt=F('current_debt') + loan_amount,
+                current_emi_total=F('current_emi_total') + Decimal(str(loan.monthly_repayment)),
+            )
+    
+    @staticmethod
+    def refresh(customer_id, create=False):
+        """
+        Recompute one customer's profile and active totals from the loans table
+        The customer row is locked before the loans are read, so a loan
+        created concurrently is either counted here or adds its deltas after
+        """
+        with transaction.atomic():
+            CreditProfileService._lock_customers([customer_id])
+            values = CreditProfileService._compute(
+                Loan.objects.filter(customer_id=customer_id)
+            ).get(customer_id, CreditProfileService._empty_totals())
+            Customer.objects.filter(customer_id=customer_id).update(
+                **{field: values.pop(field) for field in CreditProfileService.CUSTOMER_FIELDS}
+            )
+            if create:
+                profile, _ = CustomerCreditProfile.objects.update_or_create(
+                    customer_id=customer_id, defaults=values
+                )
+                return profile
+            CustomerCreditProfile.objects.filter(customer_id=customer_id).update(**values)
+            return None
+    
+    @staticmethod
+    def refresh_many(customer_ids):
+        """
+        Recompute profiles and active totals for many customers after bulk loan writes
+        Customer rows are locked in id order first, so concurrent ingestion
+        workers touching the same customer recompute one after the other
+        """
+        with transaction.atomic():
+            customers = CreditProfileService._lock_customers(customer_ids)
+            if customers:
+                CreditProfileService._rebuild_customers(customers)
+    
+    @staticmethod
+    def settle_matured_loans(chunk_size=1000):
+        """
+        Take loans whose end date has passed off their customers' active
+        totals. Only customers whose next_expiry_date is behind today are
+        touched; returns the number of customers settled
+        """
+        current_date = timezone.now().date()
+        customer_ids = list(
+            CustomerCreditProfile.objects.filter(next_expiry_date__lt=current_date)
+            .order_by('customer_id').values_list('customer_id', flat=True)
+        )
+        for start in range(0, len(customer_ids), chunk_size):
+            with transaction.atomic():
+                # Same lock mode and order as refresh_many, so overlapping ingestion cannot deadlock
+                customers = CreditProfileService._lock_customers(customer_ids[start:start + chunk_size])
+                CreditProfileService._rebuild_customers(customers)
+        return len(customer_ids)
+    
+    @staticmethod
+    def rebuild(apply=True):
+        """
+        Recompute every profile and customer active total from the loans table
+        Returns a list of (customer_id, {field: (stored, expected)}) drift entries
+        """
+        expected = CreditProfileService._compute(Loan.objects.all())
+        stored = {
+            profile.customer_id: profile
+            for profile in CustomerCreditProfile.objects.all()
+        }
+        
+        drift = []
+        to_create = []
+        to_update = []
+        customers_to_update = []
+        for customer in Customer.objects.only('customer_id', *CreditProfileService.CUSTOMER_FIELDS):
+            customer_id = customer.customer_id
+            values = expected.get(customer_id, CreditProfileService._empty_totals())
+            changes = {}
+            for field in CreditProfileService.CUSTOMER_FIELDS:
+                value = values.pop(field)
+                if getattr(customer, field) != value:
+                    changes[field] = (getattr(customer, field), value)
+                    setattr(customer, field, value)
+            if changes:
+                customers_to_update.append(customer)
+            
+            profile = stored.get(customer_id)
+            if profile is None:
+                changes['profile'] = (None, 'missing')
+                to_create.append(CustomerCreditProfile(customer_id=customer_id, **values))
+            else:
+                profile_changes = {
+                    field: (getattr(profile, field), value)
+                    for field, value in values.items()
+                    if getattr(profile, field) != value
+                }
+                if profile_changes:
+                    changes.update(profile_changes)
+                    for field, value in values.items():
+                        setattr(profile, field, value)
+                    to_update.append(profile)
+            if changes:
+                drift.append((customer_id, changes))
+        
+        if apply:
+            with transaction.atomic():
+                CustomerCreditProfile.objects.bulk_create(to_create, batch_size=1000)
+                CustomerCreditProfile.objects.bulk_update(
+                    to_update, CreditProfileService.PROFILE_FIELDS, batch_size=1000
+                )
+                Customer.objects.bulk_update(
+                    customers_to_update, CreditProfileService.CUSTOMER_FIELDS, batch_size=1000
+                )
+        return drift
+    
+    @staticmethod
+    def _lock_customers(customer_ids):
+        """
+        Lock customer rows for a profile rebuild; every rebuild locks in id
+        order so they cannot deadlock. Call inside transaction.atomic()
+        """
+        return list(
+            Customer.objects.select_for_update(no_key=True)
+            .filter(customer_id__in=list(customer_ids))
+            .order_by('customer_id')
+            .only('customer_id', *CreditProfileService.CUSTOMER_FIELDS)
+        )
+    
+    @staticmethod
+    def _rebuild_customers(customers):
+        """
+        Recompute profiles and active totals for a list of customers with one
+        grouped query, one profile upsert and one set-based update of the
+        customers whose active totals changed. The customer instances are updated in place; returns {customer_id: profile}
+        """
+        totals = CreditProfileService._compute(
+            Loan.objects.filter(customer_id__in=[customer.customer_id for customer in customers])
+        )
+        profiles = []
+        changed = []
+        for customer in customers:
+            values = totals.get(customer.customer_id, CreditProfileService._empty_totals())
+            active_totals = {field: values.pop(field) for field in CreditProfileService.CUSTOMER_FIELDS}
+            if any(getattr(customer, field) != value for field, value in active_totals.items()):
+                for field, value in active_totals.items():
+                    setattr(customer, field, value)
+                changed.append(customer)
+            profiles.append(CustomerCreditProfile(customer=customer, **values))
+        
+        CustomerCreditProfile.objects.bulk_create(
+            profiles,
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=CreditProfileService.PROFILE_FIELDS,
+        )
+        if changed:
+            Customer.objects.filter(
+                customer_id__in=[customer.customer_id for customer in changed]
+            ).update(**CreditProfileService.active_totals_expressions())
+        return {profile.customer_id: profile for profile in profiles}
+    
+    @staticmethod
+    def active_totals_expressions():
+        """
+        Update expressions recomputing current_debt and current_emi_total from
+        the active loans inside the database
+        """
+        active_loans = Loan.objects.filter(
+            customer_id=OuterRef('customer_id'), end_date__gte=timezone.now().date()
+        ).order_by().values('customer_id')
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        zero = Value(Decimal('0.00'), output_field=money)
+        return {
+            field: Coalesce(
+                Subquery(active_loans.annotate(total=Sum(source)).values('total'), output_field=money),
+                zero,
+            )
+            for field, source in (('current_debt', 'loan_amount'), ('current_emi_total', 'monthly_repayment'))
+        }
+    
+    @staticmethod
+    def _compute(loans):
+        """Grouped profile and customer active totals keyed by customer_id"""
+        current_date = timezone.now().date()
+        aggregates = CreditScoreService.history_aggregates(current_date)
+        aggregates['current_debt'] = aggregates.pop('active_debt')
+        aggregates['current_emi_total'] = aggregates.pop('active_emi_sum')
+        fields = [
+            field for field in CreditProfileService.PROFILE_FIELDS + CreditProfileService.CUSTOMER_FIELDS
+            if field in aggregates
+        ]
+        rows = loans.values('customer_id').order_by().annotate(
+            **{field: aggregates[field] for field in fields}
+        )
+        totals = {}
+        for row in rows:
+            values = CreditProfileService._empty_totals(current_date)
+            for field in fields:
+                if row[field] is not None:
+                    values[field] = row[field]
+            for field in ('current_debt', 'current_emi_total', 'total_volume'):
+                values[field] = Decimal(values[field]).quantize(Decimal('0.01'))
+            totals[row['customer_id']] = values
+        return totals
+    
+    @staticmethod
+    def _empty_totals(current_date=None):
+        current_date = current_date or timezone.now().date()
+        return {
+            'current_debt': Decimal('0.00'),
+            'current_emi_total': Decimal('0.00'),
+            'total_tenure': 0,
+            'emis_paid_on_time': 0,
+            'loan_count': 0,
+            'total_volume': Decimal('0.00'),
+            'last_loan_start_date': None,
+            'next_expiry_date': None,
+            'current_year_loans': 0,
+            'current_year': current_date.year,
+        }
+
+
+class EligibilityContext:
+    """Customer, loan history totals and credit score for one eligibility decision"""
+    
+    def __init__(self, customer, history, credit_score):
+        self.customer = customer
+        self.history = history
+        self.credit_score = credit_score
+    
+    @property
+    def current_emis(self):
+        """Sum of EMIs on the customer's active loans, kept on the customer row"""
+        return self.customer.current_emi_total
+
+
 class LoanEligibilityService:
     """Service for checking loan eligibility and calculating terms"""
     
@@ -119,38 +490,53 @@ class LoanEligibilityService:
         Check loan eligibility and return appropriate response
         """
         try:
-            customer = Customer.objects.get(customer_id=customer_id)
-            
-            # Calculate credit score
-            credit_score = CreditScoreService.calculate_credit_score(customer)
-            
-            # Check if current EMIs exceed 50% of monthly salary
-            current_emis = LoanEligibilityService._calculate_current_emis(customer)
-            if current_emis > float(customer.monthly_salary) * 0.5:
-                return LoanEligibilityService._create_eligibility_response(
-                    customer_id, False, interest_rate, interest_rate, 
-                    tenure, 0, "Current EMIs exceed 50% of monthly salary"
-                )
-            
-            # Determine approval and interest rate based on credit score
-            approval, corrected_interest_rate = LoanEligibilityService._determine_approval(
-                credit_score, interest_rate
+            context = LoanEligibilityService.load_context(customer_id)
+            return LoanEligibilityService._evaluate_context(
+                context, loan_amount, interest_rate, tenure
             )
             
-            if not approval:
-                return LoanEligibilityService._create_eligibility_response(
-                    customer_id, False, interest_rate, corrected_interest_rate,
-                    tenure, 0, "Loan not approved based on credit score"
-                )
-            
-            # Calculate monthly installment
-            monthly_installment = LoanEligibilityService._calculate_monthly_installment(
-                loan_amount, corrected_interest_rate, tenure
+        except Customer.DoesNotExist:
+            return LoanEligibilityService._create_eligibility_response(
+                customer_id, False, interest_rate, interest_rate,
+                tenure, 0, "Customer not found"
             )
-            
+        except Exception as e:
             return LoanEligibilityService._create_eligibility_response(
-                customer_id, True, interest_rate, corrected_interest_rate,
-                tenure, monthly_installment, "Loan approved"
+                customer_id, False, interest_rate, interest_rate,
+                tenure, 0, f"Error processing request: {str(e)}"
+            )
+    
+    @staticmethod
+    def load_context(customer_id, lock=False):
+        """
+        Load the customer, credit profile and score needed to decide on an
+        application. With lock=True the customer row is locked with
+        select_for_update first, so the profile read afterwards sees every
+        loan committed by competing transactions; the caller must be
+        inside transaction.atomic()
+        """
+        if lock:
+            customer = Customer.objects.select_for_update().get(customer_id=customer_id)
+        else:
+            customer = Customer.objects.select_related('credit_profile').get(customer_id=customer_id)
+        profile = CreditProfileService.get_profile(customer)
+        history = profile.as_history(timezone.now().date(), customer)
+        
+        # A locked load decides on a loan, so it does not trust a recently confirmed local score
+        credit_score = credit_score_cache.get_or_compute(
+            customer.customer_id,
+            lambda: CreditScoreService.score_from_history(history, customer.approved_limit),
+            fresh=lock,
+        )
+        return EligibilityContext(customer, history, credit_score)
+    
+    @staticmethod
+    async def acheck_eligibility(customer_id, loan_amount, interest_rate, tenure):
+        """Async check_eligibility, for ASGI views"""
+        try:
+            context = await LoanEligibilityService.aload_context(customer_id)
+            return LoanEligibilityService._evaluate_context(
+                context, loan_amount, interest_rate, tenure
             )
             
         except Customer.DoesNotExist:
@@ -165,53 +551,152 @@ class LoanEligibilityService:
             )
     
     @staticmethod
-    def _calculate_current_emis(customer):
-        """Calculate total current EMIs for customer"""
-        from django.utils import timezone
-        current_date = timezone.now().date()
-        active_loans = Loan.objects.filter(customer=customer, end_date__gte=current_date)
-        return sum(float(loan.monthly_repayment) for loan in active_loans)
+    async def aload_context(customer_id):
+        """
+        Async load_context without locking: the customer and its profile come
+        from one aget; a missing or stale profile is rebuilt in a thread
+        """
+        customer = await Customer.objects.select_related('credit_profile').aget(customer_id=customer_id)
+        try:
+            profile = customer.credit_profile
+        except CustomerCreditProfile.DoesNotExist:
+            profile = None
+        if profile is None or profile.is_stale(timezone.now().date()):
+            profile = await sync_to_async(CreditProfileService.get_profile)(customer)
+        history = profile.as_history(timezone.now().date(), customer)
+        
+        credit_score = await credit_score_cache.aget_or_compute(
+            customer.customer_id,
+            lambda: CreditScoreService.score_from_history(history, customer.approved_limit)
+        )
+        return EligibilityContext(customer, history, credit_score)
+    
+    @staticmethod
+    def check_eligibility_batch(applications):
+        """
+        Check eligibility for many applications at once
+        Customers and their credit profiles are loaded in a constant number
+        of queries and scored together
+        Returns one response per application, in order
+        """
+        customer_ids = {application['customer_id'] for application in applications}
+        try:
+            customers = Customer.objects.select_related('credit_profile').in_bulk(customer_ids)
+            profiles = CreditProfileService.get_profiles(customers.values())
+            
+            current_date = timezone.now().date()
+            histories = {
+                customer_id: profile.as_history(current_date, customers[customer_id])
+                for customer_id, profile in profiles.items()
+            }
+            scores = dict(zip(
+                histories,
+                score_histories(
+                    [(history, customers[customer_id].approved_limit)
+                     for customer_id, history in histories.items()]
+                )
+            ))
+        except Exception as e:
+            return [
+                LoanEligibilityService._create_eligibility_response(
+                    application['customer_id'], False, application['interest_rate'],
+                    application['interest_rate'], application['tenure'], 0,
+                    f"Error processing request: {str(e)}"
+                )
+                for application in applications
+            ]
+        
+        results = []
+        for application in applications:
+            customer_id = application['customer_id']
+            interest_rate = application['interest_rate']
+            tenure = application['tenure']
+            customer = customers.get(customer_id)
+            if customer is None:
+                results.append(LoanEligibilityService._create_eligibility_response(
+                    customer_id, False, interest_rate, interest_rate,
+                    tenure, 0, "Customer not found"
+                ))
+                continue
+            
+            try:
+                results.append(LoanEligibilityService._evaluate(
+                    customer_id, application['loan_amount'], interest_rate, tenure,
+                    customer.monthly_salary, int(scores[customer_id]),
+                    customer.current_emi_total
+                ))
+            except Exception as e:
+                results.append(LoanEligibilityService._create_eligibility_response(
+                    customer_id, False, interest_rate, interest_rate,
+                    tenure, 0, f"Error processing request: {str(e)}"
+                ))
+        return results
+    
+    @staticmethod
+    def _evaluate_context(context, loan_amount, interest_rate, tenure):
+        """Apply the eligibility rules using a loaded EligibilityContext"""
+        return LoanEligibilityService._evaluate(
+            context.customer.customer_id, loan_amount, interest_rate, tenure,
+            context.customer.monthly_salary, context.credit_score, context.current_emis
+        )
+    
+    @staticmethod
+    def _evaluate(customer_id, loan_amount, interest_rate, tenure,
+                  monthly_salary, credit_score, current_emis):
+        """Apply the EMI and credit score rules to one application"""
+        approval, corrected_interest_rate, message = LoanEligibilityService._decide(
+            interest_rate, monthly_salary, credit_score, current_emis
+        )
+        if not approval:
+            return LoanEligibilityService._create_eligibility_response(
+                customer_id, False, interest_rate, corrected_interest_rate,
+                tenure, 0, message
+            )
+        
+        # Calculate monthly installment
+        monthly_installment = LoanEligibilityService._calculate_monthly_installment(
+            loan_amount, corrected_interest_rate, tenure
+        )
+        
+        return LoanEligibilityService._create_eligibility_response(
+            customer_id, True, interest_rate, corrected_interest_rate,
+            tenure, monthly_installment, message
+        )
+    
+    @staticmethod
+    def _decide(interest_rate, monthly_salary, credit_score, current_emis):
+        """
+        Decide approval independently of amount and tenure
+        Returns (approval, corrected_interest_rate, message)
+        """
+        # Check if current EMIs exceed the policy share (50%) of monthly salary
+        policy = get_active_policy()
+        if policy.emi_limit_exceeded(current_emis, monthly_salary):
+            return False, interest_rate, (
+                f"Current EMIs exceed {policy.max_emi_ratio * 100:g}% of monthly salary"
+            )
+        
+        # Determine approval and interest rate based on credit score
+        approval, corrected_interest_rate = LoanEligibilityService._determine_approval(
+            credit_score, interest_rate
+        )
+        
+        if not approval:
+            return False, corrected_interest_rate, "Loan not approved based on credit score"
+        return True, corrected_interest_rate, "Loan approved"
     
     @staticmethod
     def _determine_approval(credit_score, requested_interest_rate):
         """
         Determine loan approval and corrected interest rate based on credit score
+        using the score bands and rate floors of the active credit policy
         """
-        if credit_score > 50:
-            # Approve with any interest rate
-            return True, requested_interest_rate
-        elif 30 < credit_score <= 50:
-            # Approve only if interest rate > 12%
-            if requested_interest_rate > 12:
-                return True, requested_interest_rate
-            else:
-                return True, 12.0
-        elif 10 < credit_score <= 30:
-            # Approve only if interest rate > 16%
-            if requested_interest_rate > 16:
-                return True, requested_interest_rate
-            else:
-                return True, 16.0
-        else:
-            # Don't approve any loans
-            return False, requested_interest_rate
+        return get_active_policy().decide(credit_score, requested_interest_rate)
     
     @staticmethod
     def _calculate_monthly_installment(loan_amount, interest_rate, tenure):
         """Calculate monthly installment using compound interest formula"""
-        if interest_rate <= 0 or tenure <= 0:
-            return 0
-        
-        # Convert annual interest rate to monthly
-        monthly_rate = float(interest_rate) / 100 / 12
-        
-        # Calculate EMI using compound interest formula
-        principal = float(loan_amount)
-        if monthly_rate == 0:
-            return principal / tenure
-        
-        emi = principal * (monthly_rate * (1 + monthly_rate) ** tenure) / ((1 + monthly_rate) ** tenure - 1)
-        return round(emi, 2)
+        return emi.monthly_installment(loan_amount, interest_rate, tenure)
     
     @staticmethod
     def _create_eligibility_response(customer_id, approval, interest_rate, 
@@ -228,6 +713,69 @@ class LoanEligibilityService:
         }
 
 
+class LoanOfferService:
+    """Service for building loan offer grids over every tenure"""
+    
+    TENURES = np.arange(1, emi.MAX_TENURE + 1)
+    
+    @staticmethod
+    def build_offers(customer_id, loan_amount, interest_rate):
+        """
+        Quote a loan amount over every tenure from 1 to 60 months and solve
+        for the largest amount per tenure that stays within the approved
+        limit and the customer's EMI headroom
+        """
+        context = LoanEligibilityService.load_context(customer_id)
+        customer = context.customer
+        approval, corrected_interest_rate, message = LoanEligibilityService._decide(
+            interest_rate, customer.monthly_salary, context.credit_score, context.current_emis
+        )
+        
+        current_emis = float(context.current_emis)
+        emi_headroom = max(
+            0.0, float(customer.monthly_salary) * get_active_policy().max_emi_ratio - current_emis
+        )
+        available_limit = max(0.0, float(customer.approved_limit) - float(customer.current_debt))
+        
+        installments = emi.installments(
+            float(loan_amount), float(corrected_interest_rate), LoanOfferService.TENURES
+        )
+        # Round down to the paise so the quoted amount never overshoots the limit
+        max_amounts = np.minimum(
+            emi.max_principals(emi_headroom, float(corrected_interest_rate), LoanOfferService.TENURES),
+            np.floor(available_limit * 100) / 100
+        )
+        if not approval:
+            max_amounts = np.zeros_like(max_amounts)
+        
+        offers = [
+            {
+                'tenure': int(tenure),
+                'approval': approval,
+                'corrected_interest_rate': corrected_interest_rate,
+                'monthly_installment': float(installment) if approval else 0,
+                'within_emi_headroom': bool(approval and installment <= emi_headroom),
+                'max_loan_amount': float(max_amount),
+            }
+            for tenure, installment, max_amount in zip(
+                LoanOfferService.TENURES, installments, max_amounts
+            )
+        ]
+        return {
+            'customer_id': customer_id,
+            'credit_score': context.credit_score,
+            'approval': approval,
+            'interest_rate': interest_rate,
+            'corrected_interest_rate': corrected_interest_rate,
+            'loan_amount': loan_amount,
+            'current_emis': round(current_emis, 2),
+            'emi_headroom': round(emi_headroom, 2),
+            'available_limit': round(available_limit, 2),
+            'message': message,
+            'offers': offers,
+        }
+
+
 class LoanCreationService:
     """Service for creating loans"""
     
@@ -237,38 +785,25 @@ class LoanCreationService:
         Create a new loan if eligible
         """
         try:
-            # Check eligibility first
-            eligibility = LoanEligibilityService.check_eligibility(
-                customer_id, loan_amount, interest_rate, tenure
-            )
-            
-            if not eligibility['approval']:
-                return {
-                    'loan_id': None,
-                    'customer_id': customer_id,
-                    'loan_approved': False,
-                    'message': eligibility['message'],
-                    'monthly_installment': 0
-                }
-            
-            # Create the loan
-            customer = Customer.objects.get(customer_id=customer_id)
-            
-            # Calculate start and end dates
-            start_date = timezone.now().date()
-            end_date = start_date.replace(year=start_date.year + (tenure // 12))
-            if tenure % 12 > 0:
-                end_date = end_date.replace(month=end_date.month + (tenure % 12))
-            
-            loan = Loan.objects.create(
-                customer=customer,
-                loan_amount=loan_amount,
-                tenure=tenure,
-                interest_rate=eligibility['corrected_interest_rate'],
-                monthly_repayment=eligibility['monthly_installment'],
-                start_date=start_date,
-                end_date=end_date
-            )
+            with transaction.atomic():
+                # Lock the customer so concurrent creations see each other's EMIs
+                context = LoanEligibilityService.load_context(customer_id, lock=True)
+                eligibility = LoanEligibilityService._evaluate_context(
+                    context, loan_amount, interest_rate, tenure
+                )
+                
+                if not eligibility['approval']:
+                    return {
+                        'loan_id': None,
+                        'customer_id': customer_id,
+                        'loan_approved': False,
+                        'message': eligibility['message'],
+                        'monthly_installment': 0
+                    }
+                
+                loan = LoanCreationService._insert_loan(
+                    context.customer, loan_amount, tenure, eligibility
+                )
             
             return {
                 'loan_id': loan.loan_id,
@@ -293,4 +828,158 @@ class LoanCreationService:
                 'loan_approved': False,
                 'message': f'Error creating loan: {str(e)}',
                 'monthly_installment': 0
-            } 
\ No newline at end of file
+            }
+    
+    @staticmethod
+    def _insert_loan(customer, loan_amount, tenure, eligibility):
+        """Insert an approved loan for a customer"""
+        # Calculate start and end dates
+        start_date = timezone.now().date()
+        end_date = start_date.replace(year=start_date.year + (tenure // 12))
+        if tenure % 12 > 0:
+            end_date = end_date.replace(month=end_date.month + (tenure % 12))
+        
+        return Loan.objects.create(
+            customer=customer,
+            loan_amount=loan_amount,
+            tenure=tenure,
+            interest_rate=eligibility['corrected_interest_rate'],
+            monthly_repayment=eligibility['monthly_installment'],
+            start_date=start_date,
+            end_date=end_date
+        )
+
+
+class CustomerRegistrationService:
+    """Service for registering customers in bulk"""
+
+    # Attempts before a batch that keeps losing phone numbers to concurrent registrations gives up
+    MAX_ATTEMPTS = 3
+
+    @staticmethod
+    def register_batch(applications):
+        """
+        Register validated CustomerRegistrationSerializer payloads with one
+        phone lookup and one bulk insert
+        Returns one entry per application in order: the created Customer, or
+        a dict of field errors for a phone number that is already registered
+        or repeated earlier in the batch
+        """
+        results = [None] * len(applications)
+        first_seen = {}
+        for index, data in enumerate(applications):
+            if data['phone_number'] in first_seen:
+                results[index] = {'phone_number': ['Phone number appears earlier in the batch']}
+            else:
+                first_seen[data['phone_number']] = index
+
+        for attempt in range(CustomerRegistrationService.MAX_ATTEMPTS):
+            registered = set(
+                Customer.objects.filter(phone_number__in=list(first_seen)).values_list('phone_number', flat=True)
+            )
+            for phone_number in registered:
+                results[first_seen.pop(phone_number)] = {'phone_number': ['Phone number already registered']}
+            if not first_seen:
+                break
+
+            indexes = list(first_seen.values())
+            customers = CustomerRegistrationService._build_customers([applications[i] for i in indexes])
+            try:
+                with transaction.atomic():
+                    Customer.objects.bulk_create(customers)
+            except IntegrityError:
+                # A phone number was registered concurrently; look them up again
+                if attempt == CustomerRegistrationService.MAX_ATTEMPTS - 1:
+                    raise
+                continue
+            for index, customer in zip(indexes, customers):
+                results[index] = customer
+            break
+        return results
+
+    @staticmethod
+    def _build_customers(applications):
+        """Unsaved customers with approved limits computed for the whole batch"""
+        salaries = np.array([float(data['monthly_income']) for data in applications], dtype=np.float64)
+        # 36 * monthly_salary rounded to the nearest lakh, as Customer.calculate_approved_limit
+        limits = (np.round(salaries * 36 / 100000) * 100000).astype(np.int64).tolist()
+        return [
+            Customer(
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                age=data['age'],
+                phone_number=data['phone_number'],
+                monthly_salary=data['monthly_income'],
+                approved_limit=limit,
+            )
+            for data, limit in zip(applications, limits)
+        ]
+
+
+class IdempotencyService:
+    """
+    Claims and stores Idempotency-Key responses
+    A key is claimed by inserting its row, so of several concurrent requests
+    with the same key exactly one wins the unique constraint and runs
+    """
+
+    @staticmethod
+    def claim(endpoint, key, request_hash):
+        """
+        Claim a key for a request; returns (record, owned)
+        An expired key, or one whose first request has held it past
+        IDEMPOTENCY_LOCK_TIMEOUT without finishing, is taken over. When
+        owned is False the record holds either the stored response or a
+        request still in progress
+        """
+        now = timezone.now()
+        claimed = {
+            'request_hash': request_hash,
+            'status_code': None,
+            'content_type': '',
+            'content': None,
+            'locked_at': now,
+            'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+        }
+        records = IdempotencyKey.objects.filter(endpoint=endpoint, key=key)
+        record = records.first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(endpoint=endpoint, key=key, **claimed), True
+            except IntegrityError:
+                # Lost the race to a concurrent request with the same key
+                record = records.first()
+            if record is None:
+                return IdempotencyService.claim(endpoint, key, request_hash)
+        stale = record.status_code is None and (
+            record.locked_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        )
+        if record.expires_at > now and not stale:
+            return record, False
+        # locked_at doubles as a version: only one competing takeover matches it
+        taken = IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).update(**claimed)
+        if taken:
+            for field, value in claimed.items():
+                setattr(record, field, value)
+            return record, True
+        return IdempotencyKey.objects.get(pk=record.pk), False
+
+    @staticmethod
+    def complete(record, status_code, content_type, content):
+        """Store the response of a claimed key"""
+        record.status_code = status_code
+        record.content_type = content_type
+        record.content = content
+        record.save(update_fields=['status_code', 'content_type', 'content'])
+
+    @staticmethod
+    def release(record):
+        """Drop a claim whose request failed, so a retry runs it again"""
+        IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at, status_code=None).delete()
+
+    @staticmethod
+    def purge_expired():
+        """Delete expired keys; returns how many were removed"""
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
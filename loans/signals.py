@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import credit_score_cache, loan_response_cache
+from .models import Customer, Loan
+from .services import CreditProfileService
+
+SCORE_INPUT_FIELDS = {'approved_limit', 'monthly_salary'}
+# Customer fields shown in loan detail responses
+LOAN_DETAIL_FIELDS = {'first_name', 'last_name', 'phone_number', 'age'}
+
+
+@receiver(post_save, sender=Loan)
+def update_credit_profile_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep the customer's credit profile and cached score in step with loan writes"""
+    if raw:
+        return
+    previous_customer_id = instance.stored_customer_id
+    if created:
+        CreditProfileService.record_new_loan(instance)
+    elif previous_customer_id is not None and previous_customer_id != instance.customer_id:
+        # Reassigned: take the loan off the old customer and onto the new one,
+        # in id order like every other profile rebuild
+        for customer_id in sorted((previous_customer_id, instance.customer_id)):
+            CreditProfileService.refresh(customer_id, create=True)
+        credit_score_cache.invalidate_on_commit(previous_customer_id)
+        # Cached view-loan bodies are versioned under the old customer
+        loan_response_cache.invalidate_on_commit(previous_customer_id)
+    else:
+        CreditProfileService.refresh(instance.customer_id)
+    credit_score_cache.invalidate_on_commit(instance.customer_id)
+    loan_response_cache.invalidate_on_commit(instance.customer_id)
+
+
+@receiver(post_delete, sender=Loan)
+def update_credit_profile_on_delete(sender, instance, **kwargs):
+    """Remove a deleted loan from the customer's credit profile"""
+    # The row deleted belonged to the stored customer, even if reassigned in memory
+    customer_id = instance.stored_customer_id or instance.customer_id
+    CreditProfileService.refresh(customer_id)
+    credit_score_cache.invalidate_on_commit(customer_id)
+    loan_response_cache.invalidate_on_commit(customer_id)
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_credit_score_on_customer_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Scores depend on the customer's approved limit and salary"""
+    if raw:
+        return
+    if update_fields is not None and not SCORE_INPUT_FIELDS & set(update_fields):
+        return
+    credit_score_cache.invalidate_on_commit(instance.customer_id)
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_loan_responses_on_customer_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Loan detail responses embed the customer's name, phone number and age"""
+    if raw:
+        return
+    if update_fields is not None and not LOAN_DETAIL_FIELDS & set(update_fields):
+        return
+    loan_response_cache.invalidate_on_commit(instance.customer_id)
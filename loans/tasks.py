@@ -1,50 +1,45 @@
-import pandas as pd
-from celery import shared_task
+import time
+from celery import chord, shared_task
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, date
-from .models import Customer, Loan
+from .ingestion import CustomerIngestor, IngestionProgress, LoanIngestor, count_rows, row_ranges
+from .scoring import BulkCreditScorer
+from .services import CreditProfileService, IdempotencyService
 
 
 @shared_task
-def ingest_customer_data():
+def ingest_customer_data(path=None, chunk_size=None, use_copy=False, force=False, resume=False):
     """
-    Background task to ingest customer data from Excel file
+    Background task to ingest customer data from an Excel or CSV file
+    use_copy selects the PostgreSQL COPY fast-load path; an unchanged file
+    is skipped unless force is set. resume continues the last unfinished
+    run of the same file from its last committed chunk
     """
     try:
-        # Read customer data from Excel
-        df = pd.read_excel('customer_data.xlsx')
+        # Stream customer rows in chunks, writing only new and changed rows
+        ingestor = CustomerIngestor(chunk_size)
+        path = path or settings.CUSTOMER_DATA_PATH
+        counts = ingestor.load(path, use_copy, force, resume)
         
-        customers_created = 0
-        customers_updated = 0
-        
-        for _, row in df.iterrows():
-            customer_data = {
-                'customer_id': int(row['Customer ID']),
-                'first_name': str(row['First Name']),
-                'last_name': str(row['Last Name']),
-                'phone_number': int(row['Phone Number']),
-                'monthly_salary': float(row['Monthly Salary']),
-                'approved_limit': float(row['Approved Limit']),
-                'current_debt': 0.0,  # Default since not in original data
-                'age': int(row['Age']),
-            }
-            
-            # Try to get existing customer or create new one
-            customer, created = Customer.objects.update_or_create(
-                customer_id=customer_data['customer_id'],
-                defaults=customer_data
+        if counts['file_skipped']:
+            message = 'Customer file unchanged since the last ingestion; skipped'
+        else:
+            message = (
+                f"Customer data ingested successfully. Created: {counts['created']}, "
+                f"Updated: {counts['updated']}, Skipped: {counts['skipped']}"
             )
-            
-            if created:
-                customers_created += 1
-            else:
-                customers_updated += 1
-        
         return {
             'status': 'success',
-            'message': f'Customer data ingested successfully. Created: {customers_created}, Updated: {customers_updated}',
-            'customers_created': customers_created,
-            'customers_updated': customers_updated
+            'message': message,
+            'customers_created': counts['created'],
+            'customers_updated': counts['updated'],
+            'customers_skipped': counts['skipped'],
+            'customers_rejected': counts['rejected'],
+            'file_skipped': counts['file_skipped'],
+            'run_id': counts['run_id'],
+            'rows_per_second': counts['rows_per_second'],
+            'error_file': counts['error_file']
         }
         
     except Exception as e:
@@ -55,61 +50,37 @@ def ingest_customer_data():
 
 
 @shared_task
-def ingest_loan_data():
+def ingest_loan_data(path=None, chunk_size=None, use_copy=False, force=False, resume=False):
     """
-    Background task to ingest loan data from Excel file
+    Background task to ingest loan data from an Excel or CSV file
+    use_copy selects the PostgreSQL COPY fast-load path; an unchanged file
+    is skipped unless force is set. resume continues the last unfinished
+    run of the same file from its last committed chunk
     """
     try:
-        # Read loan data from Excel
-        df = pd.read_excel('loan_data.xlsx')
-        
-        loans_created = 0
-        loans_updated = 0
-        
-        for _, row in df.iterrows():
-            try:
-                # Get customer
-                customer = Customer.objects.get(customer_id=int(row['Customer ID']))
-                
-                # Parse dates
-                start_date = pd.to_datetime(row['Date of Approval']).date()
-                end_date = pd.to_datetime(row['End Date']).date()
-                
-                loan_data = {
-                    'loan_id': int(row['Loan ID']),
-                    'customer': customer,
-                    'loan_amount': float(row['Loan Amount']),
-                    'tenure': int(row['Tenure']),
-                    'interest_rate': float(row['Interest Rate']),
-                    'monthly_repayment': float(row['Monthly payment']),
-                    'emis_paid_on_time': int(row['EMIs paid on Time']),
-                    'start_date': start_date,
-                    'end_date': end_date,
-                }
-                
-                # Try to get existing loan or create new one
-                loan, created = Loan.objects.update_or_create(
-                    loan_id=loan_data['loan_id'],
-                    defaults=loan_data
-                )
-                
-                if created:
-                    loans_created += 1
-                else:
-                    loans_updated += 1
-                    
-            except Customer.DoesNotExist:
-                print(f"Customer {row['Customer ID']} not found for loan {row['Loan ID']}")
-                continue
-            except Exception as e:
-                print(f"Error processing loan {row['Loan ID']}: {str(e)}")
-                continue
+        # Stream loan rows in chunks, writing only new and changed rows
+        ingestor = LoanIngestor(chunk_size)
+        path = path or settings.LOAN_DATA_PATH
+        counts = ingestor.load(path, use_copy, force, resume)
         
+        if counts['file_skipped']:
+            message = 'Loan file unchanged since the last ingestion; skipped'
+        else:
+            message = (
+                f"Loan data ingested successfully. Created: {counts['created']}, "
+                f"Updated: {counts['updated']}, Skipped: {counts['skipped']}"
+            )
         return {
             'status': 'success',
-            'message': f'Loan data ingested successfully. Created: {loans_created}, Updated: {loans_updated}',
-            'loans_created': loans_created,
-            'loans_updated': loans_updated
+            'message': message,
+            'loans_created': counts['created'],
+            'loans_updated': counts['updated'],
+            'loans_skipped': counts['skipped'],
+            'loans_rejected': counts['rejected'],
+            'file_skipped': counts['file_skipped'],
+            'run_id': counts['run_id'],
+            'rows_per_second': counts['rows_per_second'],
+            'error_file': counts['error_file']
         }
         
     except Exception as e:
@@ -120,17 +91,17 @@ def ingest_loan_data():
 
 
 @shared_task
-def ingest_all_data():
+def ingest_all_data(customer_path=None, loan_path=None, chunk_size=None, use_copy=False, force=False, resume=False):
     """
     Background task to ingest both customer and loan data
     """
     try:
         # Ingest customer data first
-        customer_result = ingest_customer_data()
+        customer_result = ingest_customer_data(customer_path, chunk_size, use_copy, force, resume)
         # customer_result = customer_result.get()
         
         # Ingest loan data
-        loan_result = ingest_loan_data()
+        loan_result = ingest_loan_data(loan_path, chunk_size, use_copy, force, resume)
         # loan_result = loan_result.get()
         
         return {
@@ -144,4 +115,212 @@ def ingest_all_data():
         return {
             'status': 'error',
             'message': f'Error ingesting data: {str(e)}'
-        } 
\ No newline at end of file
+        }
+
+
+INGESTORS = {
+    'customers': CustomerIngestor,
+    'loans': LoanIngestor,
+}
+
+
+@shared_task(bind=True)
+def ingest_file_range(self, kind, path, start=0, stop=None, chunk_size=None, use_copy=False, rows_expected=0):
+    """
+    Ingest one range of rows of a customer or loan file
+    Rows done, rows per second and ETA are published as PROGRESS metadata
+    """
+    try:
+        report = None
+        # Eager runs have no result backend entry to update
+        if not self.request.is_eager and self.request.id:
+            report = lambda meta: self.update_state(
+                state='PROGRESS', meta={'kind': kind, 'start': start, 'stop': stop, **meta}
+            )
+        progress = IngestionProgress(rows_expected, report)
+        ingestor = INGESTORS[kind](chunk_size)
+        if use_copy:
+            counts = ingestor.copy_file(path, start, stop, progress)
+        else:
+            counts = ingestor.ingest_file(path, start, stop, progress)
+        
+        return {
+            'status': 'success',
+            'kind': kind,
+            'start': start,
+            'stop': stop,
+            **counts,
+            **progress.snapshot()
+        }
+        
+    except Exception as e:
+        return {
+            'status': 'error',
+            'kind': kind,
+            'start': start,
+            'stop': stop,
+            'message': f'Error ingesting {kind} rows from {start}: {str(e)}'
+        }
+
+
+def _range_tasks(kind, path, range_size, chunk_size, use_copy):
+    """One ingest_file_range signature per row range of the file"""
+    total_rows = count_rows(path)
+    return [
+        ingest_file_range.s(
+            kind, path, start, stop, chunk_size, use_copy,
+            rows_expected=max((total_rows if stop is None else stop) - start, 0)
+        )
+        for start, stop in row_ranges(total_rows, range_size)
+    ]
+
+
+def _summarize_ranges(kind, results, started):
+    """Add up the per-range results of one phase into ingest_*_data's result shape"""
+    counts = {'created': 0, 'updated': 0, 'skipped': 0, 'rejected': 0}
+    rows_done = 0
+    errors = []
+    for result in results:
+        if result['status'] != 'success':
+            errors.append(result['message'])
+            continue
+        for key in counts:
+            counts[key] += result[key]
+        rows_done += result['rows_done']
+    elapsed = time.time() - started
+    label = kind[:-1].capitalize()
+    summary = {
+        'status': 'error' if errors else 'success',
+        'message': (
+            f"{label} data ingested {'with errors' if errors else 'successfully'}. "
+            f"Created: {counts['created']}, Updated: {counts['updated']}, Skipped: {counts['skipped']}"
+        ),
+        f'{kind}_created': counts['created'],
+        f'{kind}_updated': counts['updated'],
+        f'{kind}_skipped': counts['skipped'],
+        f'{kind}_rejected': counts['rejected'],
+        'ranges': len(results),
+        'rows_done': rows_done,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(rows_done / elapsed, 1) if elapsed > 0 else None,
+    }
+    if errors:
+        summary['errors'] = errors
+    return summary
+
+
+@shared_task(bind=True)
+def ingest_all_data_parallel(self, customer_path=None, loan_path=None, range_size=None, chunk_size=None, use_copy=False):
+    """
+    Background task to ingest customer and loan data across workers
+    Each file is split into row ranges run as a chord; loans start only
+    after every customer range has finished
+    """
+    try:
+        customer_path = customer_path or settings.CUSTOMER_DATA_PATH
+        loan_path = loan_path or settings.LOAN_DATA_PATH
+        range_size = range_size or settings.INGESTION_RANGE_SIZE
+        workflow = chord(
+            _range_tasks('customers', customer_path, range_size, chunk_size, use_copy),
+            ingest_loan_ranges.s(loan_path, range_size, chunk_size, use_copy, time.time()),
+        )
+        
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f'Error ingesting data: {str(e)}'
+        }
+    
+    # Runs the chord in place of this task (inline when eager)
+    return self.replace(workflow)
+
+
+@shared_task(bind=True)
+def ingest_loan_ranges(self, customer_results, loan_path, range_size, chunk_size, use_copy, started):
+    """
+    Chord callback for the customer ranges: summarizes them and fans the
+    loan file out the same way
+    """
+    customer_result = _summarize_ranges('customers', customer_results, started)
+    try:
+        workflow = chord(
+            _range_tasks('loans', loan_path, range_size, chunk_size, use_copy),
+            finish_ingestion.s(customer_result, time.time()),
+        )
+        
+    except Exception as e:
+        return {
+            'status': 'error',
+            'customer_result': customer_result,
+            'message': f'Error ingesting loan data: {str(e)}'
+        }
+    
+    return self.replace(workflow)
+
+
+@shared_task
+def finish_ingestion(loan_results, customer_result, started):
+    """
+    Chord callback for the loan ranges, returning the same shape as ingest_all_data
+    """
+    loan_result = _summarize_ranges('loans', loan_results, started)
+    succeeded = customer_result['status'] == loan_result['status'] == 'success'
+    return {
+        'status': 'success' if succeeded else 'error',
+        'customer_result': customer_result,
+        'loan_result': loan_result,
+        'message': 'All data ingested successfully' if succeeded else 'Data ingested with errors'
+    }
+
+
+@shared_task
+def rescore_all_customers(read_chunk_size=50000, write_chunk_size=1000):
+    """
+    Background task to recompute and store the credit score of every customer
+    """
+    try:
+        scorer = BulkCreditScorer(
+            read_chunk_size=read_chunk_size,
+            write_chunk_size=write_chunk_size
+        )
+        return scorer.run()
+        
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f'Error rescoring customers: {str(e)}'
+        }
+
+
+@shared_task
+def settle_matured_loans():
+    """
+    Scheduled task that takes loans past their end date off each customer's
+    current_debt and current_emi_total
+    """
+    try:
+        customers_settled = CreditProfileService.settle_matured_loans()
+        return {
+            'status': 'success',
+            'customers_settled': customers_settled,
+            'message': f'Settled matured loans for {customers_settled} customers'
+        }
+        
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f'Error settling matured loans: {str(e)}'
+        }
+
+
+@shared_task
+def purge_idempotency_keys():
+    """
+    Scheduled task that deletes expired Idempotency-Key responses
+    """
+    deleted = IdempotencyService.purge_expired()
+    return {
+        'status': 'success',
+        'deleted': deleted,
+        'message': f'Purged {deleted} expired idempotency keys'
+    }
@@ -0,0 +1,1453 @@
+import csv
+import hashlib
+import json
+import random
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+
+import orjson
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from django.urls import reverse
+from django.utils import timezone
+
+from . import emi
+from .backtest import PolicyBacktest
+from .dataset import DatasetGenerator
+from .cache import CreditScoreCache, credit_score_cache, loan_response_cache
+from .ingestion import CustomerIngestor, LoanIngestor, count_rows, read_batches, row_ranges
+from .models import Customer, CustomerCreditProfile, IdempotencyKey, IngestionCheckpoint, IngestionRun, Loan
+from .policy import DEFAULT_POLICY, CreditPolicy
+from .renderers import dumps
+from .scoring import BulkCreditScorer
+from .serializers import CustomerLoanSerializer, LoanDetailSerializer, RowSerializer
+from .services import (
+    CreditProfileService, CreditScoreService, CustomerRegistrationService, IdempotencyService,
+    LoanCreationService, LoanEligibilityService
+)
+from .tasks import ingest_all_data, ingest_all_data_parallel, purge_idempotency_keys
+from .views import ConditionalRequest
+
+
+def make_customer(**overrides):
+    data = {
+        'first_name': 'Test',
+        'last_name': 'Customer',
+        'age': 30,
+        'phone_number': 9000000000 + Customer.objects.count(),
+        'monthly_salary': Decimal('50000'),
+        'approved_limit': Decimal('1800000'),
+    }
+    data.update(overrides)
+    return Customer.objects.create(**data)
+
+
+def make_loan(customer, start_offset_days=-30, **overrides):
+    start_date = timezone.now().date() + timedelta(days=start_offset_days)
+    data = {
+        'customer': customer,
+        'loan_amount': Decimal('100000'),
+        'tenure': 12,
+        'interest_rate': Decimal('10.50'),
+        'monthly_repayment': Decimal('8815.00'),
+        'emis_paid_on_time': 6,
+        'start_date': start_date,
+        'end_date': start_date + timedelta(days=365),
+    }
+    data.update(overrides)
+    return Loan.objects.create(**data)
+
+
+class CreditScoreServiceTests(TestCase):
+    """Tests for the aggregated credit score calculation"""
+
+    def test_new_customer_gets_default_score(self):
+        customer = make_customer()
+        self.assertEqual(CreditScoreService.calculate_credit_score(customer), 50)
+
+    def test_active_debt_over_limit_scores_zero(self):
+        customer = make_customer(approved_limit=Decimal('100000'))
+        make_loan(customer, loan_amount=Decimal('150000'))
+        self.assertEqual(CreditScoreService.calculate_credit_score(customer), 0)
+
+    def test_weighted_components(self):
+        customer = make_customer()
+        for _ in range(3):
+            make_loan(customer, start_offset_days=-800, emis_paid_on_time=12)
+        # past 100, count 90, no current-year loans 50, volume ~17% -> 100
+        self.assertEqual(CreditScoreService.calculate_credit_score(customer), 88)
+
+    def test_current_year_loans_respect_year_boundaries(self):
+        customer = make_customer()
+        today = timezone.now().date()
+        for start in (date(today.year - 1, 12, 31), date(today.year, 1, 1), date(today.year, 12, 31),
+                      date(today.year + 1, 1, 1)):
+            make_loan(customer, start_offset_days=(start - today).days)
+        self.assertEqual(CreditScoreService.get_loan_history(customer)['current_year_loans'], 2)
+        totals = BulkCreditScorer(current_date=today).load_loan_totals()
+        self.assertEqual(totals.loc[customer.customer_id, 'current_year_loans'], 2)
+
+    def test_score_uses_single_query(self):
+        customer = make_customer()
+        for offset in (-10, -400, -900, -1200):
+            make_loan(customer, start_offset_days=offset)
+        with self.assertNumQueries(1):
+            CreditScoreService.calculate_credit_score(customer)
+
+
+class CreditProfileTests(TestCase):
+    """Tests for the incrementally maintained credit profile"""
+
+    def assertProfileInSync(self):
+        self.assertEqual(CreditProfileService.rebuild(apply=False), [])
+
+    def test_profile_tracks_loan_writes(self):
+        customer = make_customer()
+        loan = make_loan(customer)
+        make_loan(customer, start_offset_days=-800)
+        profile = CustomerCreditProfile.objects.get(customer=customer)
+        self.assertEqual(profile.loan_count, 2)
+        self.assertEqual(Customer.objects.get(pk=customer.pk).current_debt, Decimal('100000'))
+        self.assertEqual(profile.total_volume, Decimal('200000'))
+        self.assertProfileInSync()
+
+        loan.emis_paid_on_time = 12
+        loan.save()
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=customer).emis_paid_on_time, 18)
+
+        loan.delete()
+        profile = CustomerCreditProfile.objects.get(customer=customer)
+        self.assertEqual(profile.loan_count, 1)
+        self.assertEqual(Customer.objects.get(pk=customer.pk).current_debt, Decimal('0'))
+        self.assertProfileInSync()
+
+    def test_reassigned_loan_moves_between_profiles(self):
+        first = make_customer()
+        second = make_customer()
+        loan = make_loan(first)
+        credit_score_cache.get_or_compute(first.customer_id, lambda: 70)
+        credit_score_cache.get_or_compute(second.customer_id, lambda: 60)
+
+        loan = Loan.objects.get(pk=loan.pk)
+        loan.customer = second
+        loan.save()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.current_debt, Decimal('0'))
+        self.assertEqual(first.credit_profile.loan_count, 0)
+        self.assertEqual(second.current_debt, Decimal('100000'))
+        self.assertEqual(second.credit_profile.loan_count, 1)
+        self.assertEqual(credit_score_cache.get_or_compute(first.customer_id, lambda: 10), 10)
+        self.assertEqual(credit_score_cache.get_or_compute(second.customer_id, lambda: 20), 20)
+        self.assertProfileInSync()
+
+        # Saving again under the same customer leaves the old one alone
+        loan.emis_paid_on_time = 12
+        loan.save()
+        loan.customer = first
+        loan.delete()
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=second).loan_count, 0)
+        self.assertProfileInSync()
+
+    def test_current_year_loans_survive_a_future_dated_loan(self):
+        customer = make_customer()
+        today = timezone.now().date()
+        make_loan(customer, start_offset_days=(date(today.year, 1, 1) - today).days)
+        make_loan(customer, start_offset_days=(date(today.year + 1, 1, 1) - today).days)
+        profile = CustomerCreditProfile.objects.get(customer=customer)
+        self.assertEqual(profile.current_year_loans, 1)
+        self.assertEqual(
+            profile.as_history(today)['current_year_loans'],
+            CreditScoreService.get_loan_history(customer)['current_year_loans'],
+        )
+        self.assertProfileInSync()
+
+        # A drifted count is reported, and the year rolling over makes the profile stale
+        CustomerCreditProfile.objects.filter(customer=customer).update(current_year_loans=0)
+        self.assertEqual(
+            CreditProfileService.rebuild(apply=False),
+            [(customer.customer_id, {'current_year_loans': (0, 1)})],
+        )
+        self.assertFalse(profile.is_stale(today))
+        self.assertTrue(profile.is_stale(date(today.year + 1, 1, 2)))
+
+    def test_eligibility_reads_only_the_customer_row(self):
+        customer = make_customer()
+        make_loan(customer)
+        make_loan(customer, start_offset_days=-800)
+        with self.assertNumQueries(1):
+            result = LoanEligibilityService.check_eligibility(
+                customer.customer_id, 100000, 10.5, 12
+            )
+        self.assertTrue(result['approval'])
+
+    def test_active_totals_are_kept_on_the_customer_row(self):
+        customer = make_customer()
+        make_loan(customer)
+        make_loan(customer, start_offset_days=-200, loan_amount=Decimal('50000'), monthly_repayment=Decimal('4407.50'))
+        make_loan(customer, start_offset_days=-800)
+        customer.refresh_from_db()
+        self.assertEqual(customer.current_debt, Decimal('150000'))
+        self.assertEqual(customer.current_emi_total, Decimal('13222.50'))
+
+    def test_settle_matured_loans_takes_off_ended_loans(self):
+        customer = make_customer()
+        make_loan(customer, start_offset_days=-300)
+        make_loan(customer, start_offset_days=-30)
+        later = timezone.now() + timedelta(days=100)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(CreditProfileService.settle_matured_loans(), 1)
+            self.assertEqual(CreditProfileService.settle_matured_loans(), 0)
+            self.assertProfileInSync()
+        customer.refresh_from_db()
+        self.assertEqual(customer.current_debt, Decimal('100000'))
+        self.assertEqual(customer.current_emi_total, Decimal('8815.00'))
+
+    def test_admin_cannot_edit_maintained_totals(self):
+        customer_admin = admin.site._registry[Customer]
+        readonly = customer_admin.get_readonly_fields(None)
+        for field in CreditProfileService.CUSTOMER_FIELDS:
+            self.assertIn(field, readonly)
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        customer = make_customer()
+        make_loan(customer)
+        CustomerCreditProfile.objects.filter(customer=customer).update(loan_count=7)
+
+        drift = CreditProfileService.rebuild()
+        self.assertEqual(drift, [(customer.customer_id, {'loan_count': (7, 1)})])
+        self.assertProfileInSync()
+
+
+class CreditScoreCacheTests(TestCase):
+    """Tests for the two-tier credit score cache"""
+
+    def setUp(self):
+        cache.clear()
+        credit_score_cache.clear_local()
+        self.customer = make_customer()
+        make_loan(self.customer, start_offset_days=-800, emis_paid_on_time=12)
+
+    def score(self):
+        return CreditScoreService.get_credit_score(self.customer)
+
+    def test_repeated_reads_hit_the_cache(self):
+        first = self.score()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.score(), first)
+        stats = credit_score_cache.stats()
+        self.assertEqual((stats['misses'], stats['local_hits']), (1, 1))
+
+    def test_shared_tier_serves_other_processes(self):
+        self.score()
+        credit_score_cache.clear_local()
+        with self.assertNumQueries(0):
+            self.score()
+        self.assertEqual(credit_score_cache.stats()['shared_hits'], 1)
+
+    def test_loan_write_invalidates(self):
+        before = self.score()
+        make_loan(self.customer, start_offset_days=-5)
+        self.assertNotEqual(self.score(), before)
+        self.assertEqual(credit_score_cache.stats()['misses'], 2)
+
+    def test_limit_change_invalidates(self):
+        self.assertEqual(self.score(), 84)
+        self.customer.approved_limit = Decimal('100000')
+        self.customer.save(update_fields=['approved_limit'])
+        # Full utilisation drops the volume component from 100 to 40
+        self.assertEqual(self.score(), 72)
+
+    def test_other_process_invalidation_is_seen_immediately_by_default(self):
+        local = CreditScoreCache()
+        local.get_or_compute(1, lambda: 10)
+        with mock.patch.object(CreditScoreCache, 'shared', new_callable=mock.PropertyMock) as shared:
+            shared.return_value = cache
+            self.assertEqual(local.get_or_compute(1, lambda: 20), 10)
+        shared.assert_called()
+        CreditScoreCache().invalidate(1)
+        self.assertEqual(local.get_or_compute(1, lambda: 20), 20)
+
+    def test_invalidation_during_compute_is_not_undone(self):
+        local = CreditScoreCache()
+
+        def compute_while_invalidated():
+            # The customer's loans change while the score is computed
+            local.invalidate(1)
+            return 10
+
+        self.assertEqual(local.get_or_compute(1, compute_while_invalidated), 10)
+        self.assertEqual(local.stats()['local_entries'], 0)
+        self.assertEqual(local.get_or_compute(1, lambda: 20), 20)
+        self.assertEqual(local.stats()['local_entries'], 1)
+        self.assertEqual(local._pending, {})
+
+    @override_settings(CREDIT_SCORE_CACHE_VERSION_TTL=5)
+    def test_local_hit_makes_no_shared_cache_call(self):
+        first = self.score()
+        with mock.patch.object(CreditScoreCache, 'shared', new_callable=mock.PropertyMock) as shared:
+            self.assertEqual(self.score(), first)
+        shared.assert_not_called()
+        self.assertEqual(credit_score_cache.stats()['local_hits'], 1)
+
+    def test_other_process_invalidation_is_seen_after_version_ttl(self):
+        local = CreditScoreCache(version_ttl=5)
+        local.get_or_compute(1, lambda: 10)
+        # Another process rotates the version in the shared cache
+        CreditScoreCache().invalidate(1)
+        self.assertEqual(local.get_or_compute(1, lambda: 20), 10)
+        self.assertEqual(local.get_or_compute(1, lambda: 20, fresh=True), 20)
+
+        CreditScoreCache().invalidate(1)
+        later = time.monotonic() + 6
+        with mock.patch('loans.cache.monotonic', return_value=later):
+            self.assertEqual(local.get_or_compute(1, lambda: 30), 30)
+
+    def test_lru_tier_is_bounded(self):
+        small = CreditScoreCache(lru_size=1)
+        small.get_or_compute(1, lambda: 10)
+        small.get_or_compute(2, lambda: 20)
+        self.assertEqual(small.stats()['local_entries'], 1)
+        self.assertEqual(small.stats()['evictions'], 1)
+
+    def test_entries_expire_at_day_boundary(self):
+        self.score()
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            self.score()
+        self.assertEqual(credit_score_cache.stats()['misses'], 2)
+
+
+class BulkCreditScorerTests(TestCase):
+    """Parity tests for the vectorized rescoring engine"""
+
+    def setUp(self):
+        rng = random.Random(42)
+        for index in range(60):
+            customer = make_customer(
+                approved_limit=Decimal(rng.choice([0, 100000, 500000, 1800000, 3600000])),
+            )
+            for _ in range(rng.choice([0, 1, 2, 3, 5, 8])):
+                tenure = rng.randint(1, 60)
+                make_loan(
+                    customer,
+                    start_offset_days=rng.randint(-2000, -1),
+                    loan_amount=Decimal(rng.randint(10000, 900000)) + Decimal('0.25'),
+                    tenure=tenure,
+                    emis_paid_on_time=rng.randint(0, tenure),
+                )
+
+    def test_scores_match_credit_score_service(self):
+        scores = BulkCreditScorer().score()
+        for customer in Customer.objects.all():
+            self.assertEqual(
+                scores[customer.customer_id],
+                CreditScoreService.calculate_credit_score(customer),
+                f'customer {customer.customer_id}',
+            )
+
+    def test_run_stores_scores(self):
+        result = BulkCreditScorer(read_chunk_size=7, write_chunk_size=16).run()
+        self.assertEqual(result['customers_scored'], 60)
+        for customer in Customer.objects.all():
+            self.assertEqual(customer.credit_score, CreditScoreService.calculate_credit_score(customer))
+
+
+class BatchEligibilityTests(TestCase):
+    """Tests for POST /api/check-eligibility/batch"""
+
+
+    def setUp(self):
+        self.customers = [make_customer() for _ in range(5)]
+        for customer in self.customers:
+            make_loan(customer)
+            make_loan(customer, start_offset_days=-800)
+
+    def payload(self, customer_id, **overrides):
+        data = {'customer_id': customer_id, 'loan_amount': 100000, 'interest_rate': 10.5, 'tenure': 12}
+        data.update(overrides)
+        return data
+
+    def test_matches_single_checks_in_constant_queries(self):
+        payload = [self.payload(customer.customer_id) for customer in self.customers]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('check_eligibility_batch'), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        for customer, result in zip(self.customers, response.json()):
+            single = self.client.post(reverse('check_eligibility'), self.payload(customer.customer_id),
+                                      content_type='application/json')
+            self.assertEqual(result, single.json())
+
+    def test_per_item_errors(self):
+        payload = [
+            self.payload(self.customers[0].customer_id),
+            self.payload(self.customers[0].customer_id, tenure=0),
+            self.payload(999999),
+        ]
+        response = self.client.post(reverse('check_eligibility_batch'), payload, content_type='application/json')
+        results = response.json()
+        self.assertTrue(results[0]['approval'])
+        self.assertIn('tenure', results[1]['errors'])
+        self.assertFalse(results[2]['approval'])
+
+    def test_missing_profiles_are_rebuilt_in_bulk(self):
+        CustomerCreditProfile.objects.all().delete()
+        payload = [self.payload(customer.customer_id) for customer in self.customers]
+        # Customers, then in a savepoint: lock, grouped totals and profile upsert
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('check_eligibility_batch'), payload, content_type='application/json')
+        self.assertTrue(all(result['approval'] for result in response.json()))
+        self.assertEqual(CreditProfileService.rebuild(apply=False), [])
+
+    @override_settings(ELIGIBILITY_BATCH_MAX_SIZE=2)
+    def test_rejects_oversized_batch(self):
+        payload = [self.payload(customer.customer_id) for customer in self.customers]
+        response = self.client.post(reverse('check_eligibility_batch'), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchRegistrationTests(TestCase):
+    """Tests for POST /register/batch"""
+
+    def payload(self, phone_number, monthly_income=50000):
+        return {'first_name': 'Ada', 'last_name': 'Lovelace', 'age': 36, 'monthly_income': monthly_income,
+                'phone_number': phone_number}
+
+    def register(self, payload):
+        return self.client.post(reverse('register_customer_batch'), payload, content_type='application/json')
+
+    def test_batch_matches_single_registrations(self):
+        # 12500 * 36 = 4.5 lakh exercises the rounding of exact halves
+        incomes = [12500, 41666.67, 50000, 99999.99, 250000]
+        payload = [self.payload(9100000000 + i, income) for i, income in enumerate(incomes)]
+        # phone lookup, savepoint, insert, release
+        with self.assertNumQueries(4):
+            response = self.register(payload)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(
+            [result['customer_id'] for result in results],
+            list(Customer.objects.order_by('phone_number').values_list('customer_id', flat=True))
+        )
+        for i, (income, result) in enumerate(zip(incomes, results)):
+            single = self.client.post(reverse('register_customer'), self.payload(9200000000 + i, income),
+                                      content_type='application/json').json()
+            for field in ('customer_id', 'phone_number'):
+                self.assertNotEqual(result.pop(field), single.pop(field))
+            self.assertEqual(result, single)
+
+    def test_reports_errors_per_item(self):
+        make_customer(phone_number=9100000001)
+        payload = [
+            self.payload(9100000000),
+            self.payload(9100000001),
+            self.payload(9100000000),
+            dict(self.payload(9100000002), age=17),
+        ]
+        results = self.register(payload).json()
+        self.assertIn('customer_id', results[0])
+        self.assertEqual(results[1], {'errors': {'phone_number': ['Phone number already registered']}})
+        self.assertEqual(results[2], {'errors': {'phone_number': ['Phone number appears earlier in the batch']}})
+        self.assertIn('age', results[3]['errors'])
+        self.assertEqual(Customer.objects.filter(phone_number__gte=9100000000).count(), 2)
+
+    def test_phone_registered_concurrently_is_reported(self):
+        build = CustomerRegistrationService._build_customers
+
+        def build_after_concurrent_registration(applications):
+            if not Customer.objects.filter(phone_number=9100000001).exists():
+                make_customer(phone_number=9100000001)
+            return build(applications)
+
+        with mock.patch.object(CustomerRegistrationService, '_build_customers',
+                               side_effect=build_after_concurrent_registration):
+            results = self.register([self.payload(9100000000), self.payload(9100000001)]).json()
+        self.assertIn('customer_id', results[0])
+        self.assertEqual(results[1], {'errors': {'phone_number': ['Phone number already registered']}})
+
+    @override_settings(REGISTRATION_BATCH_MAX_SIZE=1)
+    def test_rejects_oversized_batch(self):
+        response = self.register([self.payload(9100000000), self.payload(9100000001)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.register({}).status_code, 400)
+
+
+class LoanCreationTests(TestCase):
+    """Tests for the single-pass loan creation path"""
+
+    def test_creation_reuses_one_eligibility_context(self):
+        customer = make_customer()
+        make_loan(customer)
+        # savepoint, customer lock, profile read, insert, profile update,
+        # customer active totals update, release
+        with self.assertNumQueries(7):
+            result = LoanCreationService.create_loan(customer.customer_id, 100000, 10.5, 12)
+        self.assertTrue(result['loan_approved'])
+        self.assertEqual(Loan.objects.filter(customer=customer).count(), 2)
+
+    def test_emi_limit_applies_to_sequential_creations(self):
+        customer = make_customer(monthly_salary=Decimal('10000'))
+        first = LoanCreationService.create_loan(customer.customer_id, 100000, 14, 12)
+        second = LoanCreationService.create_loan(customer.customer_id, 100000, 14, 12)
+        self.assertTrue(first['loan_approved'])
+        self.assertFalse(second['loan_approved'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'row locking needs a real database')
+class ConcurrentLoanCreationTests(TransactionTestCase):
+    """Concurrent creations for one customer must respect the EMI limit"""
+
+    def test_concurrent_creations_respect_emi_limit(self):
+        customer = make_customer(monthly_salary=Decimal('10000'))
+        workers = 8
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def create():
+            try:
+                barrier.wait()
+                results.append(LoanCreationService.create_loan(customer.customer_id, 100000, 14, 12))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        approved = [result for result in results if result['loan_approved']]
+        self.assertEqual(len(results), workers)
+        self.assertEqual(len(approved), 1)
+        self.assertEqual(Loan.objects.filter(customer=customer).count(), 1)
+
+    def test_stale_profile_rebuild_keeps_a_concurrent_loan(self):
+        customer = make_customer()
+        make_loan(customer)
+        rebuilds = (
+            lambda reader: CreditProfileService.get_profile(reader),
+            lambda reader: CreditProfileService.get_profiles([reader]),
+        )
+        for rebuild in rebuilds:
+            # Stale, as every profile is on the first read of a year
+            CustomerCreditProfile.objects.filter(customer=customer).update(current_year=None)
+            created = threading.Event()
+            reading = threading.Event()
+
+            def create():
+                try:
+                    with transaction.atomic():
+                        # Holds the customer lock as create_loan does while record_new_loan adds its deltas
+                        Customer.objects.select_for_update().get(pk=customer.pk)
+                        make_loan(customer)
+                        created.set()
+                        reading.wait(5)
+                        time.sleep(0.2)
+                finally:
+                    connection.close()
+
+            thread = threading.Thread(target=create)
+            thread.start()
+            created.wait(5)
+            reader = Customer.objects.select_related('credit_profile').get(pk=customer.pk)
+            reading.set()
+            rebuild(reader)
+            thread.join()
+
+            customer.refresh_from_db()
+            loans = Loan.objects.filter(customer=customer)
+            self.assertEqual(customer.current_emi_total, sum(loan.monthly_repayment for loan in loans))
+            self.assertEqual(customer.credit_profile.loan_count, loans.count())
+            self.assertEqual(CreditProfileService.rebuild(apply=False), [])
+
+
+class IdempotencyKeyTests(TestCase):
+    """Idempotency-Key handling on create-loan and register"""
+
+    def setUp(self):
+        self.customer = make_customer()
+        self.loan_payload = {
+            'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+        }
+
+    def post(self, name, payload, key='key-1'):
+        return self.client.post(reverse(name), payload, content_type='application/json',
+                                headers={'Idempotency-Key': key})
+
+    def test_repeated_create_loan_replays_the_first_response(self):
+        first = self.post('create_loan', self.loan_payload)
+        self.assertEqual(first.status_code, 201)
+        with mock.patch.object(LoanCreationService, 'create_loan') as create_loan:
+            # the key lookup only
+            with self.assertNumQueries(1):
+                second = self.post('create_loan', self.loan_payload)
+        create_loan.assert_not_called()
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_repeated_register_replays_the_first_response(self):
+        payload = {'first_name': 'Ada', 'last_name': 'Lovelace', 'age': 36, 'monthly_income': 50000,
+                   'phone_number': 9123456789}
+        first = self.post('register_customer', payload)
+        second = self.post('register_customer', payload)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Customer.objects.filter(phone_number=9123456789).count(), 1)
+
+    def test_keys_are_scoped_per_endpoint_and_optional(self):
+        self.post('create_loan', self.loan_payload)
+        self.post('create_loan', self.loan_payload, key='key-2')
+        self.client.post(reverse('create_loan'), self.loan_payload, content_type='application/json')
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 3)
+
+    def test_reused_key_with_another_body_is_rejected(self):
+        self.post('create_loan', self.loan_payload)
+        response = self.post('create_loan', dict(self.loan_payload, loan_amount=200000))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_invalid_key_is_rejected(self):
+        response = self.post('create_loan', self.loan_payload, key='k' * 256)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Loan.objects.exists())
+
+    def test_request_in_progress_gets_a_conflict(self):
+        body = self.client._encode_json(self.loan_payload, 'application/json').encode()
+        request_hash = hashlib.sha256(body).hexdigest()
+        record, owned = IdempotencyService.claim('create-loan', 'key-1', request_hash)
+        self.assertTrue(owned)
+        response = self.post('create_loan', self.loan_payload)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Loan.objects.exists())
+
+    def test_stale_and_expired_claims_are_taken_over(self):
+        record, _ = IdempotencyService.claim('create-loan', 'key-1', 'hash')
+        IdempotencyKey.objects.filter(pk=record.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        record, owned = IdempotencyService.claim('create-loan', 'key-1', 'hash')
+        self.assertTrue(owned)
+
+        IdempotencyService.complete(record, 201, 'application/json', b'{}')
+        self.assertFalse(IdempotencyService.claim('create-loan', 'key-1', 'hash')[1])
+        IdempotencyKey.objects.filter(pk=record.pk).update(expires_at=timezone.now())
+        record, owned = IdempotencyService.claim('create-loan', 'key-1', 'other')
+        self.assertTrue(owned)
+        self.assertIsNone(record.status_code)
+
+    def test_server_errors_are_rolled_back_and_not_stored(self):
+        with mock.patch.object(LoanCreationService, 'create_loan', return_value={}):
+            response = self.post('create_loan', self.loan_payload)
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post('create_loan', self.loan_payload).status_code, 201)
+
+    def test_purge_removes_expired_keys(self):
+        self.post('create_loan', self.loan_payload)
+        self.post('create_loan', self.loan_payload, key='key-2')
+        IdempotencyKey.objects.filter(key='key-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(purge_idempotency_keys()['deleted'], 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'concurrent claims need a real database')
+class ConcurrentIdempotencyKeyTests(TransactionTestCase):
+    """Concurrent requests with one key must create exactly one loan"""
+
+    def test_concurrent_duplicates_run_once(self):
+        customer = make_customer()
+        payload = {'customer_id': customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12}
+        workers = 8
+        barrier = threading.Barrier(workers)
+        statuses = []
+
+        def create():
+            try:
+                client = Client()
+                barrier.wait()
+                response = client.post(reverse('create_loan'), payload, content_type='application/json',
+                                       headers={'Idempotency-Key': 'retry'})
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(statuses), workers)
+        self.assertEqual(set(statuses) - {201, 409}, set())
+        self.assertEqual(Loan.objects.filter(customer=customer).count(), 1)
+
+
+class LoanOfferTests(TestCase):
+    """Tests for POST /api/loan-offers"""
+
+    def setUp(self):
+        self.customer = make_customer(monthly_salary=Decimal('40000'), approved_limit=Decimal('1400000'))
+        make_loan(self.customer, monthly_repayment=Decimal('8815.00'))
+
+    def offers(self, **overrides):
+        payload = {'customer_id': self.customer.customer_id, 'loan_amount': 250000, 'interest_rate': 10.5}
+        payload.update(overrides)
+        return self.client.post(reverse('loan_offers'), payload, content_type='application/json')
+
+    def test_grid_matches_single_eligibility_checks(self):
+        with self.assertNumQueries(1):
+            response = self.offers()
+        body = response.json()
+        self.assertEqual(len(body['offers']), 60)
+        for offer in body['offers'][::7]:
+            single = LoanEligibilityService.check_eligibility(
+                self.customer.customer_id, Decimal('250000'), Decimal('10.5'), offer['tenure']
+            )
+            self.assertEqual(offer['approval'], single['approval'])
+            self.assertEqual(Decimal(offer['monthly_installment']), Decimal(str(single['monthly_installment'])))
+
+    def test_max_amounts_fit_headroom_and_limit(self):
+        body = self.offers().json()
+        self.assertEqual(Decimal(body['emi_headroom']), Decimal('11185.00'))
+        for offer in body['offers']:
+            max_amount = Decimal(offer['max_loan_amount'])
+            self.assertLessEqual(max_amount, Decimal(body['available_limit']))
+            installment = LoanEligibilityService._calculate_monthly_installment(
+                max_amount, Decimal(body['corrected_interest_rate']), offer['tenure']
+            )
+            self.assertLessEqual(installment, 11185.00 + 0.01)
+
+    def test_unknown_customer(self):
+        self.assertEqual(self.offers(customer_id=999999).status_code, 404)
+
+
+class EmiEngineTests(TestCase):
+    """Tests for the shared EMI engine"""
+
+    def test_installment_is_rounded_to_the_paise(self):
+        self.assertEqual(emi.monthly_installment(100000, Decimal('10.5'), 12), Decimal('8814.86'))
+        self.assertEqual(emi.monthly_installment(100000, 0, 12), Decimal('0.00'))
+
+    def test_model_and_services_share_the_engine(self):
+        customer = make_customer()
+        loan = make_loan(customer, monthly_repayment=0, interest_rate=Decimal('14.25'), tenure=36)
+        self.assertEqual(
+            loan.monthly_repayment,
+            LoanEligibilityService._calculate_monthly_installment(Decimal('100000'), Decimal('14.25'), 36),
+        )
+
+    def test_batch_matches_scalar(self):
+        rng = random.Random(7)
+        principals = [rng.randint(1000, 5000000) + rng.randint(0, 99) / 100 for _ in range(2000)]
+        rates = [rng.randint(100, 2500) / 100 for _ in principals]
+        tenures = [rng.randint(1, 60) for _ in principals]
+        batch = emi.installments(principals, rates, tenures)
+        for principal, rate, tenure, installment in zip(principals, rates, tenures, batch):
+            self.assertEqual(Decimal(str(installment)), emi.monthly_installment(principal, rate, tenure))
+
+    def test_batch_rounds_half_bps_rates_like_scalar(self):
+        rates = [12.125, 10.005, 0.145, 8.235, 14.995, 9.875, 11.115]
+        batch = emi.installments(100000, rates, 24)
+        for rate, installment in zip(rates, batch):
+            self.assertEqual(Decimal(str(installment)), emi.monthly_installment(100000, rate, 24))
+        self.assertEqual(Decimal(str(batch[0])), emi.monthly_installment(100000, Decimal('12.13'), 24))
+
+    def test_tenures_past_the_table(self):
+        # 100000 at 12% over 72 months, from the closed-form annuity formula
+        self.assertEqual(emi.monthly_installment(100000, Decimal('12'), 72), Decimal('1955.02'))
+        customer = make_customer()
+        loan = make_loan(customer, monthly_repayment=0, interest_rate=Decimal('12'), tenure=72)
+        self.assertEqual(loan.monthly_repayment, Decimal('1955.02'))
+
+        tenures = [59, 60, 61, 72, 120, 180, 72]
+        rates = [12, 12, 10.5, 12, 9.75, 14, 11]
+        batch = emi.installments(250000, rates, tenures)
+        for rate, tenure, installment in zip(rates, tenures, batch):
+            self.assertGreater(installment, 0)
+            self.assertEqual(Decimal(str(installment)), emi.monthly_installment(250000, rate, tenure))
+        principal = emi.max_principal(Decimal('1955.02'), Decimal('12'), 72)
+        self.assertLessEqual(emi.monthly_installment(principal, Decimal('12'), 72), Decimal('1955.02'))
+
+    def test_max_principal_fits_installment(self):
+        principal = emi.max_principal(Decimal('11185.00'), Decimal('12'), 24)
+        self.assertLessEqual(emi.monthly_installment(principal, Decimal('12'), 24), Decimal('11185.00'))
+        self.assertGreater(
+            emi.monthly_installment(principal + Decimal('1.00'), Decimal('12'), 24), Decimal('11185.00')
+        )
+
+
+class PolicyBacktestTests(TestCase):
+    """Tests for credit policies and the historical backtest"""
+
+    def setUp(self):
+        rng = random.Random(11)
+        for _ in range(25):
+            customer = make_customer(
+                monthly_salary=Decimal(rng.choice([20000, 50000, 90000])),
+                approved_limit=Decimal(rng.choice([300000, 1800000])),
+            )
+            for _ in range(rng.randint(1, 6)):
+                tenure = rng.randint(6, 48)
+                make_loan(
+                    customer,
+                    start_offset_days=rng.randint(-1500, -1),
+                    loan_amount=Decimal(rng.randint(20000, 400000)),
+                    interest_rate=Decimal(rng.choice(['8.00', '11.50', '14.00', '17.25'])),
+                    tenure=tenure,
+                    monthly_repayment=Decimal(rng.randint(1000, 20000)),
+                    emis_paid_on_time=rng.randint(0, tenure),
+                )
+
+    def test_default_policy_matches_legacy_bands(self):
+        policy = CreditPolicy.from_dict(DEFAULT_POLICY)
+        self.assertEqual(policy.decide(60, 8), (True, 8))
+        self.assertEqual(policy.decide(40, 8), (True, 12.0))
+        self.assertEqual(policy.decide(20, 18), (True, 18))
+        self.assertEqual(policy.decide(10, 20), (False, 20))
+        approved, corrected = policy.decide_arrays([60, 40, 20, 10], [8, 8, 18, 20])
+        self.assertEqual(approved.tolist(), [True, True, True, False])
+        self.assertEqual(corrected.tolist(), [8, 12, 18, 20])
+
+    def test_point_in_time_scores_match_credit_score_service(self):
+        backtest = PolicyBacktest(read_chunk_size=13)
+        loans = backtest.load_loans()
+        applications = backtest.build_applications(loans, backtest.load_customers())
+        for loan, score in zip(Loan.objects.select_related('customer').order_by('loan_id'),
+                               applications.set_index(loans['loan_id'])['credit_score'].sort_index()):
+            history = Loan.objects.filter(
+                customer=loan.customer, start_date__lt=loan.start_date
+            ).aggregate(**CreditScoreService.history_aggregates(loan.start_date))
+            expected = CreditScoreService.score_from_history(history, loan.customer.approved_limit)
+            self.assertEqual(score, expected, f'loan {loan.loan_id}')
+
+    def test_stricter_candidate_reduces_approvals(self):
+        baseline = CreditPolicy.from_dict(DEFAULT_POLICY)
+        candidate = CreditPolicy('strict', [{'min_score': 60, 'rate_floor': None},
+                                            {'min_score': 45, 'rate_floor': 18}], max_emi_ratio=0.4)
+        report = PolicyBacktest().run(candidate, baseline)
+        self.assertEqual(report['applications'], Loan.objects.count())
+        self.assertEqual(report['newly_approved'], 0)
+        self.assertLess(report['summary']['approval_rate']['change'], 0)
+        self.assertLessEqual(report['summary']['exposure']['change'], 0)
+
+
+class IngestionTests(TestCase):
+    """Tests for chunked bulk-upsert ingestion"""
+
+    def customer_frame(self, ids, salary=50000):
+        return pd.DataFrame({
+            'Customer ID': ids,
+            'First Name': 'Test',
+            'Last Name': 'Customer',
+            'Age': 30,
+            'Phone Number': [9100000000 + customer_id for customer_id in ids],
+            'Monthly Salary': salary,
+            'Approved Limit': 1800000,
+        })
+
+    def loan_frame(self, rows):
+        start = pd.Timestamp(timezone.now().date()) - pd.Timedelta(days=30)
+        return pd.DataFrame([
+            {
+                'Customer ID': customer_id,
+                'Loan ID': loan_id,
+                'Loan Amount': 100000,
+                'Tenure': 12,
+                'Interest Rate': 10.5,
+                'Monthly payment': float('nan'),
+                'EMIs paid on Time': 6,
+                'Date of Approval': start,
+                'End Date': start + pd.Timedelta(days=365),
+            }
+            for customer_id, loan_id in rows
+        ])
+
+    def test_customer_counts_across_chunks(self):
+        # The earlier of two rows with the same id is rejected
+        counts = CustomerIngestor(chunk_size=2).ingest(self.customer_frame([1, 2, 3, 3, 4]))
+        self.assertEqual(counts, {'created': 4, 'updated': 0, 'skipped': 0, 'rejected': 1})
+
+        counts = CustomerIngestor(chunk_size=2).ingest(self.customer_frame([3, 4, 5], salary=60000))
+        self.assertEqual(counts, {'created': 1, 'updated': 2, 'skipped': 0, 'rejected': 0})
+        self.assertEqual(Customer.objects.get(pk=4).monthly_salary, Decimal('60000'))
+        # Explicit ids must not collide with later auto-numbered customers
+        self.assertEqual(make_customer().customer_id, 6)
+
+    def test_loans_keep_profiles_and_active_totals_in_sync(self):
+        CustomerIngestor().ingest(self.customer_frame([1, 2]))
+        # Loan 11 comes back in a later chunk; the earlier row is rejected as a duplicate
+        counts = LoanIngestor(chunk_size=2).ingest(self.loan_frame([(1, 10), (1, 11), (2, 12), (99, 13), (1, 11)]))
+        self.assertEqual(counts, {'created': 3, 'updated': 0, 'skipped': 0, 'rejected': 2})
+
+        customer = Customer.objects.get(pk=1)
+        self.assertEqual(customer.current_debt, Decimal('200000'))
+        self.assertEqual(customer.current_emi_total, 2 * emi.monthly_installment(100000, 10.5, 12))
+        self.assertEqual(CreditProfileService.rebuild(apply=False), [])
+
+        # Moving a loan to another customer updates both customers
+        LoanIngestor().ingest(self.loan_frame([(2, 11)]))
+        self.assertEqual(Customer.objects.get(pk=1).current_debt, Decimal('100000'))
+        self.assertEqual(Customer.objects.get(pk=2).current_debt, Decimal('200000'))
+        self.assertEqual(CreditProfileService.rebuild(apply=False), [])
+
+    def test_streams_workbooks_and_csv_in_batches(self):
+        frame = self.customer_frame(list(range(1, 8)))
+        with tempfile.TemporaryDirectory() as directory:
+            xlsx_path = Path(directory) / 'customers.xlsx'
+            csv_path = Path(directory) / 'customers.csv'
+            frame.to_excel(xlsx_path, index=False)
+            frame.to_csv(csv_path, index=False)
+            for path in (xlsx_path, csv_path):
+                batches = list(read_batches(path, 3))
+                self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+                pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), frame)
+            with self.assertRaises(ValueError):
+                list(read_batches(Path(directory) / 'customers.json', 3))
+
+    def test_unchanged_files_and_rows_are_skipped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'customers.csv'
+            self.customer_frame([1, 2, 3]).to_csv(path, index=False)
+            counts = CustomerIngestor().load(path)
+            self.assertEqual(
+                (counts['created'], counts['updated'], counts['skipped'], counts['file_skipped']),
+                (3, 0, 0, False)
+            )
+            with self.assertNumQueries(1):
+                self.assertTrue(CustomerIngestor().load(path)['file_skipped'])
+
+            frame = self.customer_frame([1, 2, 3, 4])
+            frame.loc[frame['Customer ID'] == 2, 'Monthly Salary'] = 70000
+            frame.to_csv(path, index=False)
+            counts = CustomerIngestor().load(path)
+            self.assertEqual(
+                (counts['created'], counts['updated'], counts['skipped'], counts['file_skipped']),
+                (1, 1, 2, False)
+            )
+            self.assertEqual(Customer.objects.get(pk=2).monthly_salary, Decimal('70000'))
+            self.assertFalse(CustomerIngestor().load(path, force=True)['file_skipped'])
+
+            # A file with rejected rows is retried on the next run
+            loan_path = Path(directory) / 'loans.csv'
+            self.loan_frame([(1, 10), (5, 11)]).to_csv(loan_path, index=False)
+            self.assertEqual(LoanIngestor().load(loan_path)['rejected'], 1)
+            CustomerIngestor().ingest(self.customer_frame([5]))
+            counts = LoanIngestor().load(loan_path)
+            self.assertEqual((counts['created'], counts['skipped'], counts['file_skipped']), (1, 1, False))
+            self.assertTrue(LoanIngestor().load(loan_path)['file_skipped'])
+
+    def test_repeated_ids_are_found_across_the_whole_file(self):
+        CustomerIngestor().ingest(self.customer_frame([1, 2]))
+        # Loan 11 repeats two chunks and a range apart
+        frame = self.loan_frame([(1, 11), (1, 10), (2, 12), (2, 13), (2, 11)])
+        with tempfile.TemporaryDirectory() as directory, self.settings(INGESTION_ERROR_DIR=directory):
+            for name in ('loans.csv', 'loans.xlsx'):
+                path = Path(directory) / name
+                if name.endswith('.csv'):
+                    frame.to_csv(path, index=False)
+                else:
+                    frame.to_excel(path, index=False)
+                Loan.objects.all().delete()
+                IngestionCheckpoint.objects.all().delete()
+                with self.captureOnCommitCallbacks(execute=True):
+                    counts = LoanIngestor(chunk_size=2).load(path)
+                self.assertEqual((counts['created'], counts['updated'], counts['rejected']), (4, 0, 1))
+                with open(counts['error_file']) as error_file:
+                    self.assertEqual(
+                        [(row['row'], row['reason']) for row in csv.DictReader(error_file)], [('2', 'duplicate id')]
+                    )
+                self.assertEqual(Loan.objects.get(pk=11).customer_id, 2)
+                # Rejections no retry can fix do not hold the checkpoint back
+                self.assertTrue(LoanIngestor(chunk_size=2).load(path)['file_skipped'])
+
+                ranges = [LoanIngestor(chunk_size=2).ingest_file(path, start, stop) for start, stop in ((0, 2), (2, None))]
+                self.assertEqual([counts['rejected'] for counts in ranges], [1, 0])
+                self.assertEqual(LoanIngestor().copy_file(path)['rejected'], 1)
+
+    def test_validation_splits_valid_and_rejected_rows(self):
+        make_customer(phone_number=9100000050)
+        customers = self.customer_frame([1, 2, 3, 4, 5, 6, 7, 7]).astype({'Phone Number': object})
+        customers.loc[0, 'Age'] = 17
+        customers.loc[1, 'Monthly Salary'] = -1
+        customers.loc[2, 'Phone Number'] = 'n/a'
+        customers.loc[3, 'Phone Number'] = 9100000006
+        customers.loc[4, 'Phone Number'] = 9100000050
+        customers.loc[5, 'Approved Limit'] = float('nan')
+        valid, rejected = CustomerIngestor().validate(customers.set_axis(pd.RangeIndex(8)))
+        self.assertEqual(valid['customer_id'].tolist(), [6, 7])
+        self.assertEqual(valid.loc[5, 'approved_limit'], 1800000)
+        self.assertEqual(rejected['reason'].tolist(), [
+            'out of range', 'out of range', 'invalid value', 'duplicate phone', 'phone in use', 'duplicate id'
+        ])
+
+        loans = self.loan_frame([(6, 1), (6, 2), (6, 3), (6, 4), (8, 5), (7, 6), (7, 7)]).astype({'End Date': object})
+        loans.loc[0, 'Tenure'] = 61
+        loans.loc[6, 'Tenure'] = 120
+        loans.loc[1, 'Loan Amount'] = -100
+        loans.loc[2, 'End Date'] = 'someday'
+        loans = loans.drop(columns='Monthly payment')
+        loans['Monthly payment'] = [None, None, None, 'x', 5000, None, 1500]
+        CustomerIngestor().ingest(self.customer_frame([6, 7]))
+        ingestor = LoanIngestor()
+        ingestor.customer_index = pd.Index([6, 7])
+        valid, rejected = ingestor.validate(loans)
+        # Long historic loans are kept, with their EMI computed when it is missing
+        self.assertEqual(valid['loan_id'].tolist(), [1, 6, 7])
+        self.assertEqual(valid.loc[0, 'monthly_repayment'], float(emi.monthly_installment(100000, 10.5, 61)))
+        self.assertEqual(valid.loc[5, 'monthly_repayment'], float(emi.monthly_installment(100000, 10.5, 12)))
+        self.assertEqual(rejected['reason'].tolist(), [
+            'out of range', 'invalid value', 'invalid value', 'unknown customer'
+        ])
+
+        valid, rejected = LoanIngestor().validate(loans.drop(columns='Tenure'))
+        self.assertTrue(valid.empty)
+        self.assertEqual(set(rejected['reason']), {'missing column'})
+
+    def test_failed_runs_resume_from_the_last_committed_chunk(self):
+        CustomerIngestor().ingest(self.customer_frame([1, 2]))
+        frame = self.loan_frame([(1, 10), (99, 11), (2, 12), (1, 13), (2, 14)]).astype({'Tenure': object})
+        frame.loc[2, 'Tenure'] = 'twelve'
+        write_chunk = LoanIngestor.write_chunk
+        calls = []
+
+        def fail_on_third_chunk(ingestor, chunk):
+            calls.append(len(chunk))
+            if len(calls) == 3:
+                raise RuntimeError('worker lost')
+            return write_chunk(ingestor, chunk)
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(INGESTION_ERROR_DIR=directory):
+            path = Path(directory) / 'loans.csv'
+            frame.to_csv(path, index=False)
+            with mock.patch.object(LoanIngestor, 'write_chunk', fail_on_third_chunk):
+                with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                    LoanIngestor(chunk_size=2).load(path)
+            run = IngestionRun.objects.get()
+            self.assertEqual((run.status, run.rows_committed, run.message), (IngestionRun.FAILED, 4, 'worker lost'))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                counts = LoanIngestor(chunk_size=2).load(path, resume=True)
+            run.refresh_from_db()
+            self.assertEqual(IngestionRun.objects.count(), 1)
+            self.assertEqual((run.status, run.rows_committed), (IngestionRun.COMPLETED, 5))
+            self.assertEqual((counts['run_id'], counts['created'], counts['rejected']), (run.pk, 3, 2))
+            self.assertEqual(run.rejection_reasons, {'unknown customer': 1, 'invalid value': 1})
+            self.assertTrue({'read', 'build', 'write', 'refresh'} <= set(run.phase_seconds))
+            self.assertIsNotNone(run.rows_per_second)
+            with open(counts['error_file']) as error_file:
+                rejected = list(csv.DictReader(error_file))
+            self.assertEqual([(row['row'], row['reason']) for row in rejected], [
+                ('3', 'unknown customer'), ('4', 'invalid value')
+            ])
+            self.assertEqual(rejected[0]['loan_id'], '11')
+        self.assertEqual(Customer.objects.get(pk=2).current_debt, Decimal('100000'))
+        self.assertEqual(CreditProfileService.rebuild(apply=False), [])
+
+    def test_reads_row_ranges(self):
+        frame = self.customer_frame(list(range(1, 8)))
+        self.assertEqual(row_ranges(7, 3), [(0, 3), (3, 6), (6, None)])
+        self.assertEqual(row_ranges(0, 3), [(0, None)])
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('customers.xlsx', 'customers.csv'):
+                path = Path(directory) / name
+                if name.endswith('.csv'):
+                    frame.to_csv(path, index=False)
+                else:
+                    frame.to_excel(path, index=False)
+                self.assertEqual(count_rows(path), 7)
+                batches = list(read_batches(path, 2, start=2, stop=5))
+                self.assertEqual([len(batch) for batch in batches], [2, 1])
+                self.assertEqual(
+                    pd.concat(batches)['Customer ID'].tolist(), [3, 4, 5]
+                )
+                self.assertEqual(
+                    pd.concat(read_batches(path, 10, start=5))['Customer ID'].tolist(), [6, 7]
+                )
+
+    def test_parallel_ingestion_runs_eagerly(self):
+        with tempfile.TemporaryDirectory() as directory:
+            customer_path = Path(directory) / 'customers.csv'
+            loan_path = Path(directory) / 'loans.xlsx'
+            self.customer_frame([1, 2, 3, 4, 5]).to_csv(customer_path, index=False)
+            self.loan_frame([(1, 10), (2, 11), (2, 12), (99, 13), (5, 14)]).to_excel(loan_path, index=False)
+            result = ingest_all_data_parallel.apply(kwargs={
+                'customer_path': str(customer_path),
+                'loan_path': str(loan_path),
+                'range_size': 2,
+                'chunk_size': 1,
+            }).get()
+
+        self.assertEqual(result['status'], 'success')
+        customer_result = result['customer_result']
+        loan_result = result['loan_result']
+        self.assertEqual(customer_result['customers_created'], 5)
+        self.assertEqual(customer_result['ranges'], 3)
+        self.assertEqual(
+            (loan_result['loans_created'], loan_result['loans_rejected'], loan_result['rows_done']),
+            (4, 1, 5)
+        )
+        self.assertEqual(Customer.objects.get(pk=2).current_debt, Decimal('200000'))
+        self.assertEqual(sorted(CreditProfileService.rebuild(apply=False)), [
+            (3, {'profile': (None, 'missing')}), (4, {'profile': (None, 'missing')})
+        ])
+
+    def test_ingest_all_data_reads_the_given_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            customer_path = Path(directory) / 'customers.csv'
+            loan_path = Path(directory) / 'loans.xlsx'
+            self.customer_frame([1, 2]).to_csv(customer_path, index=False)
+            self.loan_frame([(1, 10), (2, 11), (2, 12)]).to_excel(loan_path, index=False)
+            result = ingest_all_data(str(customer_path), str(loan_path), chunk_size=2)
+        self.assertEqual(result['customer_result']['customers_created'], 2)
+        self.assertEqual(result['loan_result']['loans_created'], 3)
+        self.assertEqual(Customer.objects.get(pk=2).current_debt, Decimal('200000'))
+
+    def test_copy_merge_matches_bulk_upsert(self):
+        customers = self.customer_frame([1, 2, 2, 3])
+        loans = self.loan_frame([(1, 10), (1, 11), (2, 12), (99, 13), (1, 11)])
+        with tempfile.TemporaryDirectory() as directory:
+            customer_path = Path(directory) / 'customers.csv'
+            loan_path = Path(directory) / 'loans.csv'
+            customers.to_csv(customer_path, index=False)
+            loans.to_csv(loan_path, index=False)
+            customer_counts = CustomerIngestor().copy_file(customer_path)
+            loan_counts = LoanIngestor().copy_file(loan_path)
+            self.assertEqual(customer_counts, {'created': 3, 'updated': 0, 'skipped': 0, 'rejected': 1})
+            self.assertEqual(loan_counts, {'created': 3, 'updated': 0, 'skipped': 0, 'rejected': 2})
+            # A reload writes nothing
+            self.assertEqual(
+                LoanIngestor().copy_file(loan_path), {'created': 0, 'updated': 0, 'skipped': 3, 'rejected': 2}
+            )
+
+            with self.settings(INGESTION_ERROR_DIR=directory), self.captureOnCommitCallbacks(execute=True):
+                counts = LoanIngestor().load(loan_path, use_copy=True)
+            self.assertEqual(
+                IngestionRun.objects.get(pk=counts['run_id']).rejection_reasons,
+                {'duplicate id': 1, 'unknown customer': 1}
+            )
+            with open(counts['error_file']) as error_file:
+                self.assertEqual(
+                    [(row['row'], row['loan_id']) for row in csv.DictReader(error_file)],
+                    [('3', '11'), ('5', '13')]
+                )
+
+        self.assertEqual(Customer.objects.get(pk=1).current_debt, Decimal('200000'))
+        self.assertEqual(Loan.objects.get(pk=11).monthly_repayment, emi.monthly_installment(100000, 10.5, 12))
+        self.assertEqual(CreditProfileService.rebuild(apply=False), [(3, {'profile': (None, 'missing')})])
+        self.assertEqual(make_customer().customer_id, 4)
+
+
+class DatasetGeneratorTests(TestCase):
+    """Tests for the seeded synthetic dataset generator"""
+
+    def test_same_seed_gives_the_same_rows(self):
+        first = DatasetGenerator(50, 120, seed=7, block_rows=40)
+        second = DatasetGenerator(50, 120, seed=7, block_rows=40)
+        pd.testing.assert_frame_equal(
+            pd.concat(first.loan_frames()), pd.concat(second.loan_frames())
+        )
+        customers = pd.concat(first.customer_frames())
+        pd.testing.assert_frame_equal(customers, pd.concat(second.customer_frames()))
+        self.assertTrue(customers['Phone Number'].is_unique)
+        self.assertFalse(
+            pd.concat(first.loan_frames()).equals(pd.concat(DatasetGenerator(50, 120, seed=8, block_rows=40).loan_frames()))
+        )
+
+    def test_generated_rows_pass_ingestion(self):
+        generator = DatasetGenerator(50, 120, seed=3, block_rows=40)
+        customers, loans = generator.load(chunk_size=25)
+        self.assertEqual(customers['created'], 50)
+        self.assertEqual(loans['created'], 120)
+        self.assertEqual(customers['rejected'] + loans['rejected'], 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            customer_path = Path(directory) / 'customers.csv'
+            loan_path = Path(directory) / 'loans.csv'
+            self.assertEqual(generator.write(customer_path, loan_path), (50, 120))
+            self.assertEqual(count_rows(loan_path), 120)
+            # The written files describe the rows just loaded
+            self.assertEqual(
+                LoanIngestor().ingest_file(loan_path), {'created': 0, 'updated': 0, 'skipped': 120, 'rejected': 0}
+            )
+
+
+class CustomerLoanListTests(TestCase):
+    """Tests for the keyset-paginated and streamed customer loan listing"""
+
+    def setUp(self):
+        self.customer = make_customer()
+        self.loans = [make_loan(self.customer, emis_paid_on_time=index % 12) for index in range(25)]
+        make_loan(make_customer())
+        self.url = reverse('view_customer_loans', args=[self.customer.customer_id])
+
+    def test_pages_follow_loan_id_with_one_keyset_query_each(self):
+        seen = []
+        url = f'{self.url}?page_size=10'
+        while url:
+            # Validators, then the page
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(loan['loan_id'] for loan in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(seen, [loan.loan_id for loan in self.loans])
+
+        first = self.client.get(self.url).json()['results'][0]
+        self.assertEqual(first, {
+            'loan_id': self.loans[0].loan_id,
+            'loan_amount': '100000.00',
+            'interest_rate': '10.50',
+            'monthly_installment': '8815.00',
+            'repayments_left': 12,
+        })
+
+    def test_unknown_customer_is_not_found(self):
+        url = reverse('view_customer_loans', args=[999])
+        not_found = {'error': 'Error retrieving customer loans: No Customer matches the given query.'}
+        for params in ({}, {'stream': 'true'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), not_found)
+        empty = reverse('view_customer_loans', args=[make_customer().customer_id])
+        self.assertEqual(self.client.get(empty).json()['results'], [])
+        self.assertEqual(b''.join(self.client.get(empty, {'stream': 'true'}).streaming_content), b'[]')
+
+    def test_stream_returns_every_loan(self):
+        with mock.patch('loans.views.LOAN_STREAM_CHUNK_SIZE', 10):
+            response = self.client.get(self.url, {'stream': 'true'})
+            body = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        expected = self.client.get(self.url, {'page_size': 100}).json()['results']
+        self.assertEqual(json.loads(body), expected)
+
+
+class ReadPathRenderingTests(TestCase):
+    """Tests for the values()-row serializers and the orjson renderer"""
+
+    def test_row_serializers_match_model_serializers(self):
+        customer = make_customer(first_name='Zo\u2028e', last_name='Ng\u00fcyen')
+        loan = make_loan(customer, interest_rate=Decimal('9.5'), monthly_repayment=Decimal('8815.4'))
+        # Validators, then the loan joined with its customer
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('view_loan', args=[loan.loan_id]))
+        self.assertEqual(response.content, JSONRenderer().render(LoanDetailSerializer(loan).data))
+        self.assertEqual(response.json()['customer']['first_name'], 'Zo\u2028e')
+
+        rows = RowSerializer(CustomerLoanSerializer)
+        annotated = Loan.objects.filter(pk=loan.pk).annotate(
+            repayments_left=F('tenure') - F('emis_paid_on_time')
+        ).values(*rows.columns)
+        self.assertEqual(
+            dumps(rows.to_list(annotated)),
+            JSONRenderer().render(CustomerLoanSerializer([loan], many=True).data),
+        )
+        self.assertEqual(self.client.get(reverse('view_loan', args=[999])).status_code, 404)
+
+    def test_dumps_matches_json_renderer(self):
+        data = {
+            'amount': Decimal('12.50'),
+            'at': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'day': timezone.now().date(),
+            'text': 'line\u2028break\u2029 caf\u00e9',
+            'items': [1, 2.5, None, True],
+        }
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+
+class LoanConditionalGetTests(TestCase):
+    """Tests for ETag / Last-Modified handling and the shared loan response cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = make_customer()
+        self.loan = make_loan(self.customer)
+        self.detail_url = reverse('view_loan', args=[self.loan.loan_id])
+        self.list_url = reverse('view_customer_loans', args=[self.customer.customer_id])
+
+    def test_unchanged_resources_return_304(self):
+        for url in (self.detail_url, self.list_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.content, b'')
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        etag = self.client.get(self.detail_url)['ETag']
+        self.customer.first_name = 'Renamed'
+        self.customer.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['customer']['first_name'], 'Renamed')
+
+        etag = self.client.get(self.list_url)['ETag']
+        make_loan(self.customer)
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse('view_loan', args=[999])).status_code, 404)
+
+    @override_settings(LOAN_RESPONSE_CACHE_TIMEOUT=60)
+    def test_shared_cache_is_invalidated_by_loan_writes(self):
+        first = self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.list_url)
+            not_modified = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = LoanCreationService.create_loan(self.customer.customer_id, 100000, 14, 12)
+        loan_ids = [loan['loan_id'] for loan in self.client.get(self.list_url).json()['results']]
+        self.assertEqual(loan_ids, [self.loan.loan_id, created['loan_id']])
+
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url)
+        start = pd.Timestamp(self.loan.start_date)
+        with self.captureOnCommitCallbacks(execute=True):
+            LoanIngestor().ingest(pd.DataFrame([{
+                'Customer ID': self.customer.customer_id,
+                'Loan ID': self.loan.loan_id,
+                'Loan Amount': 200000,
+                'Tenure': 12,
+                'Interest Rate': 10.5,
+                'Monthly payment': 17630,
+                'EMIs paid on Time': 6,
+                'Date of Approval': start,
+                'End Date': start + pd.Timedelta(days=365),
+            }]))
+        self.assertEqual(self.client.get(self.detail_url).json()['loan_amount'], '200000.00')
+
+    @override_settings(LOAN_RESPONSE_CACHE_TIMEOUT=60)
+    def test_shared_cache_follows_loan_reassignment(self):
+        other = make_customer(first_name='Other')
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url)
+
+        loan = Loan.objects.get(pk=self.loan.pk)
+        loan.customer = other
+        with self.captureOnCommitCallbacks(execute=True):
+            loan.save()
+        customer = self.client.get(self.detail_url).json()['customer']
+        self.assertEqual(customer['id'], other.customer_id)
+        self.assertEqual(customer['first_name'], 'Other')
+
+    @override_settings(LOAN_RESPONSE_CACHE_TIMEOUT=60)
+    def test_write_during_render_leaves_the_entry_stale(self):
+        cacheable = ConditionalRequest.cacheable
+
+        def write_after_render(conditional, response):
+            # A loan write commits after the view's queries, before the render is stored
+            loan_response_cache.invalidate_many([self.customer.customer_id])
+            return cacheable(conditional, response)
+
+        for url in (self.detail_url, self.list_url):
+            # On the first fill, and again once the customer's version exists
+            for _ in range(2):
+                with mock.patch.object(ConditionalRequest, 'cacheable', write_after_render):
+                    self.client.get(url)
+                response, version = loan_response_cache.get(f'http://testserver{url}', self.customer.customer_id)
+                self.assertIsNone(response)
+                self.assertIsNotNone(version)
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+
+class AsyncViewTests(TestCase):
+    """Tests for the async eligibility and loan read views"""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = make_customer()
+        self.loans = [make_loan(self.customer) for _ in range(3)]
+
+    async def test_async_views_match_sync_views(self):
+        payload = {'customer_id': self.customer.customer_id, 'loan_amount': 50000, 'interest_rate': 11, 'tenure': 12}
+        sync_response = await sync_to_async(self.client.post)(
+            reverse('check_eligibility'), payload, content_type='application/json'
+        )
+        async_response = await self.async_client.post(
+            reverse('async_check_eligibility'), payload, content_type='application/json'
+        )
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.content, sync_response.content)
+
+        for name, args in (
+            ('view_loan', [self.loans[0].loan_id]),
+            ('view_customer_loans', [self.customer.customer_id]),
+        ):
+            sync_response = await sync_to_async(self.client.get)(reverse(name, args=args), {'page_size': 2})
+            async_response = await self.async_client.get(reverse(f'async_{name}', args=args), {'page_size': 2})
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(
+                async_response.content,
+                sync_response.content.replace(b'/view-loans/', b'/async/view-loans/'),
+            )
+            self.assertEqual(async_response['ETag'], sync_response['ETag'])
+            not_modified = await self.async_client.get(
+                reverse(f'async_{name}', args=args), {'page_size': 2}, headers={'If-None-Match': async_response['ETag']}
+            )
+            self.assertEqual(not_modified.status_code, 304)
+
+    @override_settings(LOAN_RESPONSE_CACHE_TIMEOUT=60)
+    async def test_async_write_during_render_leaves_the_entry_stale(self):
+        cacheable = ConditionalRequest.cacheable
+
+        def write_after_render(conditional, response):
+            loan_response_cache.invalidate_many([self.customer.customer_id])
+            return cacheable(conditional, response)
+
+        for name, args in (
+            ('async_view_loan', [self.loans[0].loan_id]),
+            ('async_view_customer_loans', [self.customer.customer_id]),
+        ):
+            url = reverse(name, args=args)
+            with mock.patch.object(ConditionalRequest, 'cacheable', write_after_render):
+                await self.async_client.get(url)
+            response, _ = await loan_response_cache.aget(f'http://testserver{url}', self.customer.customer_id)
+            self.assertIsNone(response)
+            await self.async_client.get(url)
+            response, _ = await loan_response_cache.aget(f'http://testserver{url}', self.customer.customer_id)
+            self.assertIsNotNone(response)
+
+    async def test_async_loan_stream_and_errors(self):
+        url = reverse('async_view_customer_loans', args=[self.customer.customer_id])
+        with mock.patch('loans.views.LOAN_STREAM_CHUNK_SIZE', 2):
+            response = await self.async_client.get(url, {'stream': 'true'})
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([loan['loan_id'] for loan in json.loads(body)], [loan.loan_id for loan in self.loans])
+
+        missing = reverse('async_view_customer_loans', args=[999])
+        not_found = {'error': 'Error retrieving customer loans: No Customer matches the given query.'}
+        for params in ({}, {'stream': 'true'}):
+            response = await self.async_client.get(missing, params)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(json.loads(response.content), not_found)
+        self.assertEqual((await self.async_client.get(reverse('async_view_loan', args=[999]))).status_code, 404)
+
+        eligibility = reverse('async_check_eligibility')
+        self.assertEqual((await self.async_client.get(eligibility)).status_code, 405)
+        invalid = await self.async_client.post(eligibility, 'not json', content_type='application/json')
+        self.assertEqual(invalid.status_code, 400)
+        unknown = await self.async_client.post(
+            eligibility, {'customer_id': 999, 'loan_amount': 1000, 'interest_rate': 10, 'tenure': 6},
+            content_type='application/json'
+        )
+        self.assertEqual(orjson.loads(unknown.content)['approval'], False)
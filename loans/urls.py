@@ -1,10 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASYNC_VIEWS serves the eligibility and loan read paths with their async views
+if settings.ASYNC_VIEWS:
+    check_eligibility, view_loan, view_customer_loans = (
+        views.acheck_eligibility, views.aview_loan, views.aview_customer_loans
+    )
+else:
+    check_eligibility, view_loan, view_customer_loans = (
+        views.check_eligibility, views.view_loan, views.view_customer_loans
+    )
+
 urlpatterns = [
     path('register', views.register_customer, name='register_customer'),
-    path('check-eligibility', views.check_eligibility, name='check_eligibility'),
+    path('register/batch', views.register_customer_batch, name='register_customer_batch'),
+    path('check-eligibility', check_eligibility, name='check_eligibility'),
+    path('check-eligibility/batch', views.check_eligibility_batch, name='check_eligibility_batch'),
+    path('loan-offers', views.loan_offers, name='loan_offers'),
     path('create-loan', views.create_loan, name='create_loan'),
-    path('view-loan/<int:loan_id>', views.view_loan, name='view_loan'),
-    path('view-loans/<int:customer_id>', views.view_customer_loans, name='view_customer_loans'),
-] 
\ No newline at end of file
+    path('view-loan/<int:loan_id>', view_loan, name='view_loan'),
+    path('view-loans/<int:customer_id>', view_customer_loans, name='view_customer_loans'),
+    path('credit-score-cache/stats', views.credit_score_cache_stats, name='credit_score_cache_stats'),
+    path('async/check-eligibility', views.acheck_eligibility, name='async_check_eligibility'),
+    path('async/view-loan/<int:loan_id>', views.aview_loan, name='async_view_loan'),
+    path('async/view-loans/<int:customer_id>', views.aview_customer_loans, name='async_view_customer_loans'),
+]
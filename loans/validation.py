@@ -0,0 +1,67 @@
+"""
+Column-wise validation of ingestion frames
+
+Columns are coerced whole with pandas (to_numeric / to_datetime with
+errors='coerce'), so a bad value becomes NaN instead of raising, and every
+check is a boolean mask over the frame. FrameValidation keeps the first
+reason each row fails, letting the ingestors split a batch into valid and
+rejected frames before anything is written.
+"""
+import numpy as np
+import pandas as pd
+
+
+def coerce_column(column, kind):
+    """
+    Coerce a raw column to 'int', 'decimal' (float64), 'date' (datetime64)
+    or 'str'. Values that cannot be coerced come back as NaN/NaT
+    """
+    if kind == 'int':
+        numbers = pd.to_numeric(column, errors='coerce')
+        return numbers.where(numbers % 1 == 0)
+    if kind == 'decimal':
+        numbers = pd.to_numeric(column, errors='coerce')
+        return numbers.where(np.isfinite(numbers))
+    if kind == 'date':
+        # One unit whatever the source, so row hashes do not depend on it
+        return pd.to_datetime(column, errors='coerce').dt.normalize().astype('datetime64[ns]')
+    if kind == 'str':
+        text = column.where(column.isna(), column.astype(str).str.strip())
+        return text.mask(text == '')
+    raise ValueError(f'Unknown column kind: {kind}')
+
+
+class FrameValidation:
+    """First rejection reason and detail of each row of a frame"""
+
+    def __init__(self, index):
+        self.reasons = pd.Series(None, index=index, dtype=object)
+        self.details = pd.Series(None, index=index, dtype=object)
+
+    @property
+    def accepted(self):
+        """Mask of the rows not rejected so far"""
+        return self.reasons.isna()
+
+    def reject(self, mask, reason, detail):
+        """Reject the rows of mask that are still accepted; mask may cover a subset of rows"""
+        mask = mask.reindex(self.reasons.index, fill_value=False).astype(bool) & self.accepted
+        self.reasons[mask] = reason
+        self.details[mask] = detail
+
+    def check_bounds(self, frame, bounds):
+        """Reject values outside inclusive (low, high) bounds; None leaves a side open"""
+        for field, (low, high) in bounds.items():
+            column = frame[field]
+            outside = pd.Series(False, index=frame.index)
+            if low is not None:
+                outside |= column < low
+            if high is not None:
+                outside |= column > high
+            if low is not None and high is not None:
+                detail = f'{field} must be between {low} and {high}'
+            elif low is not None:
+                detail = f'{field} must be at least {low}'
+            else:
+                detail = f'{field} must be at most {high}'
+            self.reject(outside, 'out of range', detail)
@@ -1,22 +1,219 @@
+import asyncio
+import hashlib
+from functools import wraps
+from itertools import chain, islice
+
 from rest_framework import status
+import orjson
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view
+from rest_framework.request import Request
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
-from .models import Customer, Loan
+from .models import Customer, IdempotencyKey, Loan
 from .serializers import (
     CustomerRegistrationSerializer,
     LoanEligibilitySerializer,
     LoanEligibilityResponseSerializer,
+    LoanOfferRequestSerializer,
+    LoanOfferResponseSerializer,
     LoanCreateSerializer,
     LoanCreateResponseSerializer,
     LoanDetailSerializer,
-    CustomerLoanSerializer
+    CustomerLoanSerializer,
+    RowSerializer
+)
+from .cache import credit_score_cache, loan_response_cache
+from .pagination import LoanCursorPagination
+from .renderers import dumps
+from .services import (
+    CustomerRegistrationService, IdempotencyService, LoanEligibilityService, LoanCreationService, LoanOfferService
 )
-from .services import LoanEligibilityService, LoanCreationService
 
 
+# Loans fetched and encoded per chunk of a streamed listing
+LOAN_STREAM_CHUNK_SIZE = 2000
+# Read endpoints build their responses from values() rows
+LOAN_DETAIL_ROWS = RowSerializer(LoanDetailSerializer)
+CUSTOMER_LOAN_ROWS = RowSerializer(CustomerLoanSerializer)
+
+
+class ConditionalRequest:
+    """
+    Validators of one loan read request, taken from its shared cache entry
+    or from a fresh validators result of (customer_id, etag, last_modified).
+    response is set when the request can be answered without the view: a
+    304, or the cached body
+    """
+
+    def __init__(self, request, cached, validated):
+        if cached is not None:
+            self.customer_id, etag, self.last_modified = cached['customer_id'], cached['etag'], cached['last_modified']
+        else:
+            self.customer_id, etag, self.last_modified = validated or (None, None, None)
+        self.etag = quote_etag(etag) if etag else None
+        self.timestamp = int(self.last_modified.timestamp()) if self.last_modified else None
+        self.response = get_conditional_response(request, etag=self.etag, last_modified=self.timestamp)
+        if self.response is None and cached is not None:
+            self.response = HttpResponse(cached['content'], content_type='application/json')
+
+    def cacheable(self, response):
+        return bool(self.etag) and response.status_code == 200 and not response.streaming
+
+    def finish(self, response):
+        if self.etag and response.status_code in (200, 304):
+            response.headers.setdefault('ETag', self.etag)
+            if self.timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(self.timestamp))
+        return response
+
+
+def conditional_loan_view(validators):
+    """
+    ETag / Last-Modified handling for a loan read view
+    validators(**kwargs) returns (customer_id, etag, last_modified) from one
+    query, or None when there is nothing to validate; for an async view it
+    must be async too. Unchanged resources get a 304 before the view runs,
+    and 200 responses are kept in the shared loan response cache when it is
+    enabled, so a cached request needs no query at all
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, **kwargs)
+                url = request.build_absolute_uri()
+                cached, version = await loan_response_cache.aget(url, kwargs.get('customer_id'))
+                validated = None
+                if cached is None:
+                    validated = await validators(**kwargs)
+                    if _needs_version(validated, version):
+                        version = await loan_response_cache.aversion(validated[0])
+                        validated = await validators(**kwargs)
+                conditional = ConditionalRequest(request, cached, validated)
+                if conditional.response is not None:
+                    return conditional.finish(conditional.response)
+                response = await view(request, **kwargs)
+                if conditional.cacheable(response):
+                    await loan_response_cache.aset(
+                        url, version, conditional.customer_id, conditional.etag, conditional.last_modified,
+                        response.content
+                    )
+                return conditional.finish(response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, **kwargs)
+            url = request.build_absolute_uri()
+            cached, version = loan_response_cache.get(url, kwargs.get('customer_id'))
+            validated = None
+            if cached is None:
+                validated = validators(**kwargs)
+                if _needs_version(validated, version):
+                    version = loan_response_cache.version(validated[0])
+                    validated = validators(**kwargs)
+            conditional = ConditionalRequest(request, cached, validated)
+            if conditional.response is not None:
+                return conditional.finish(conditional.response)
+            response = view(request, **kwargs)
+            if conditional.cacheable(response):
+                response.render()
+                loan_response_cache.set(
+                    url, version, conditional.customer_id, conditional.etag, conditional.last_modified,
+                    response.content
+                )
+            return conditional.finish(response)
+        return wrapper
+    return decorator
+
+
+def _needs_version(validated, version):
+    """
+    Whether the response cache version of the validated customer was not
+    read before the validators ran; it is then read and the validators run
+    again, so a write committed in between leaves the cached render stale
+    """
+    if validated is None or loan_response_cache.timeout <= 0:
+        return False
+    return version is None or version[0] != validated[0]
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status_code, content_type='application/json')
+
+
+def idempotent_view(endpoint):
+    """
+    Idempotency-Key handling for a POST view
+    The first request with a key claims it and runs the view in a
+    transaction that also stores the response; a repeat gets that response
+    back without running the view, a repeat with a different body a 422,
+    and one arriving while the first is still running a 409. 5xx responses
+    are rolled back and not stored, so a retry runs again
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None or request.method != 'POST':
+                return view(request, *args, **kwargs)
+            if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+                return _json_response(
+                    {'error': 'Idempotency-Key must be 1 to 255 characters'}, status.HTTP_400_BAD_REQUEST
+                )
+
+            request_hash = hashlib.sha256(request.body).hexdigest()
+            record, owned = IdempotencyService.claim(endpoint, key, request_hash)
+            if not owned:
+                return _idempotent_replay(record, request_hash)
+
+            try:
+                with transaction.atomic():
+                    response = view(request, *args, **kwargs)
+                    response.render()
+                    if response.status_code < 500:
+                        IdempotencyService.complete(
+                            record, response.status_code, response['Content-Type'], response.content
+                        )
+                    else:
+                        transaction.set_rollback(True)
+            except Exception:
+                IdempotencyService.release(record)
+                raise
+            if response.status_code >= 500:
+                IdempotencyService.release(record)
+            return response
+        return wrapper
+    return decorator
+
+
+def _idempotent_replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return _json_response(
+            {'error': 'Idempotency-Key was already used with a different request body'},
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.status_code is None:
+        response = _json_response(
+            {'error': 'A request with this Idempotency-Key is still in progress'}, status.HTTP_409_CONFLICT
+        )
+        response['Retry-After'] = '1'
+        return response
+    response = HttpResponse(bytes(record.content), status=record.status_code, content_type=record.content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@idempotent_view('register')
 @api_view(['POST'])
 def register_customer(request):
     """
@@ -38,6 +235,46 @@ def register_customer(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@idempotent_view('register-batch')
+@api_view(['POST'])
+def register_customer_batch(request):
+    """
+    Register a list of customers
+    POST /api/register/batch
+    """
+    if not isinstance(request.data, list):
+        return Response(
+            {'error': 'Expected a list of customer registrations'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    max_size = settings.REGISTRATION_BATCH_MAX_SIZE
+    if len(request.data) > max_size:
+        return Response(
+            {'error': f'Batch size exceeds the maximum of {max_size}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    results = [None] * len(request.data)
+    valid_indexes = []
+    applications = []
+    for index, item in enumerate(request.data):
+        serializer = CustomerRegistrationSerializer(data=item)
+        if serializer.is_valid():
+            valid_indexes.append(index)
+            applications.append(serializer.validated_data)
+        else:
+            results[index] = {'errors': serializer.errors}
+    
+    registrations = CustomerRegistrationService.register_batch(applications)
+    for index, registration in zip(valid_indexes, registrations):
+        if isinstance(registration, Customer):
+            results[index] = CustomerRegistrationSerializer(registration).data
+        else:
+            results[index] = {'errors': registration}
+    
+    return Response(results, status=status.HTTP_200_OK)
+
 @api_view(['POST'])
 def check_eligibility(request):
     """
@@ -65,6 +302,74 @@ def check_eligibility(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+def check_eligibility_batch(request):
+    """
+    Check loan eligibility for a list of applications
+    POST /api/check-eligibility/batch
+    """
+    if not isinstance(request.data, list):
+        return Response(
+            {'error': 'Expected a list of eligibility requests'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    max_size = settings.ELIGIBILITY_BATCH_MAX_SIZE
+    if len(request.data) > max_size:
+        return Response(
+            {'error': f'Batch size exceeds the maximum of {max_size}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    results = [None] * len(request.data)
+    valid_indexes = []
+    applications = []
+    for index, item in enumerate(request.data):
+        serializer = LoanEligibilitySerializer(data=item)
+        if serializer.is_valid():
+            valid_indexes.append(index)
+            applications.append(serializer.validated_data)
+        else:
+            results[index] = {'errors': serializer.errors}
+    
+    eligibility_results = LoanEligibilityService.check_eligibility_batch(applications)
+    for index, eligibility_result in zip(valid_indexes, eligibility_results):
+        response_serializer = LoanEligibilityResponseSerializer(data=eligibility_result)
+        if response_serializer.is_valid():
+            results[index] = response_serializer.data
+        else:
+            results[index] = {'errors': {'non_field_errors': ['Error serializing response']}}
+    
+    return Response(results, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def loan_offers(request):
+    """
+    Quote a loan amount over every tenure and the maximum eligible amounts
+    POST /api/loan-offers
+    """
+    serializer = LoanOfferRequestSerializer(data=request.data)
+    if serializer.is_valid():
+        data = serializer.validated_data
+        try:
+            offers = LoanOfferService.build_offers(
+                data['customer_id'],
+                data['loan_amount'],
+                data['interest_rate']
+            )
+        except Customer.DoesNotExist:
+            return Response(
+                {'error': 'Customer not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        response_serializer = LoanOfferResponseSerializer(offers)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@idempotent_view('create-loan')
 @api_view(['POST'])
 def create_loan(request):
     """
@@ -92,37 +397,248 @@ def create_loan(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _loan_validator_query(loan_id):
+    return Loan.objects.filter(loan_id=loan_id).values_list('customer_id', 'updated_at', 'customer__updated_at')
+
+
+def _loan_validator_result(loan_id, row):
+    """The loan's customer, and validators built from the loan's and the customer's last change"""
+    if row is None:
+        return None
+    customer_id, loan_updated, customer_updated = row
+    etag = f'loan-{loan_id}-{loan_updated.timestamp():.6f}-{customer_updated.timestamp():.6f}'
+    return customer_id, etag, max(loan_updated, customer_updated)
+
+
+def _loan_validators(loan_id):
+    return _loan_validator_result(loan_id, _loan_validator_query(loan_id).first())
+
+
+async def _aloan_validators(loan_id):
+    return _loan_validator_result(loan_id, await _loan_validator_query(loan_id).afirst())
+
+
+def _customer_loans_aggregates():
+    return {'count': Count('loan_id'), 'last': Max('updated_at')}
+
+
+def _customer_loans_validator_result(customer_id, loans):
+    """Validators built from the number of loans and the latest loan change of a customer"""
+    if not loans['count']:
+        return None
+    etag = f"loans-{customer_id}-{loans['count']}-{loans['last'].timestamp():.6f}"
+    return customer_id, etag, loans['last']
+
+
+def _customer_loans_validators(customer_id):
+    loans = Loan.objects.filter(customer_id=customer_id).aggregate(**_customer_loans_aggregates())
+    return _customer_loans_validator_result(customer_id, loans)
+
+
+async def _acustomer_loans_validators(customer_id):
+    loans = await Loan.objects.filter(customer_id=customer_id).aaggregate(**_customer_loans_aggregates())
+    return _customer_loans_validator_result(customer_id, loans)
+
+
+@conditional_loan_view(_loan_validators)
 @api_view(['GET'])
 def view_loan(request, loan_id):
     """
     View loan details by loan ID
     GET /api/view-loan/{loan_id}
     """
-    try:
-        loan = get_object_or_404(Loan, loan_id=loan_id)
-        serializer = LoanDetailSerializer(loan)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Exception as e:
+    # One query joining the customer, read as a plain row
+    row = Loan.objects.filter(loan_id=loan_id).values(*LOAN_DETAIL_ROWS.columns).first()
+    if row is None:
         return Response(
-            {'error': f'Error retrieving loan: {str(e)}'}, 
+            {'error': 'Error retrieving loan: No Loan matches the given query.'},
             status=status.HTTP_404_NOT_FOUND
         )
+    return Response(LOAN_DETAIL_ROWS.to_dict(row), status=status.HTTP_200_OK)
 
 
+@conditional_loan_view(_customer_loans_validators)
 @api_view(['GET'])
 def view_customer_loans(request, customer_id):
     """
-    View all loans for a customer
-    GET /api/view-loans/{customer_id}
+    View the loans of a customer, keyset-paginated on loan_id
+    GET /api/view-loans/{customer_id}?cursor=...&page_size=...
+    GET /api/view-loans/{customer_id}?stream=true returns every loan as one streamed JSON list
     """
-    try:
-        # Check if customer exists
-        customer = get_object_or_404(Customer, customer_id=customer_id)
-        loans = Loan.objects.filter(customer=customer)
-        serializer = CustomerLoanSerializer(loans, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Exception as e:
+    loans = _customer_loan_rows(customer_id)
+    
+    if _wants_stream(request.query_params):
+        rows = loans.order_by('loan_id').iterator(chunk_size=LOAN_STREAM_CHUNK_SIZE)
+        first_chunk = list(islice(rows, LOAN_STREAM_CHUNK_SIZE))
+        if not first_chunk and not Customer.objects.filter(customer_id=customer_id).exists():
+            return Response(
+                {'error': 'Error retrieving customer loans: No Customer matches the given query.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return StreamingHttpResponse(
+            _stream_loans(chain(first_chunk, rows)), content_type='application/json'
+        )
+    
+    paginator = LoanCursorPagination()
+    page = paginator.paginate_queryset(loans, request)
+    # The customer is only looked up when there is nothing to show
+    if not page and not Customer.objects.filter(customer_id=customer_id).exists():
         return Response(
-            {'error': f'Error retrieving customer loans: {str(e)}'}, 
+            {'error': 'Error retrieving customer loans: No Customer matches the given query.'},
             status=status.HTTP_404_NOT_FOUND
-        ) 
\ No newline at end of file
+        )
+    return paginator.get_paginated_response(CUSTOMER_LOAN_ROWS.to_list(page))
+
+
+def _customer_loan_rows(customer_id):
+    return Loan.objects.filter(customer_id=customer_id).annotate(
+        repayments_left=F('tenure') - F('emis_paid_on_time')
+    ).values(*CUSTOMER_LOAN_ROWS.columns)
+
+
+def _wants_stream(query_params):
+    return query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def _stream_loans(rows):
+    """Encode loan rows as a JSON list, one chunk at a time, matching the renderer's output"""
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(islice(rows, LOAN_STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield separator + dumps(CUSTOMER_LOAN_ROWS.to_list(chunk))[1:-1]
+        separator = b','
+    yield b']'
+
+
+@api_view(['GET'])
+def credit_score_cache_stats(request):
+    """
+    Credit score cache counters for this worker process
+    GET /api/credit-score-cache/stats
+    """
+    return Response(credit_score_cache.stats(), status=status.HTTP_200_OK)
+
+
+# Async views
+#
+# DRF 3.14 cannot run async views, so these are plain Django async views
+# with the same request validation, response shapes and JSON encoding as
+# the DRF views above. They are routed under async/, and replace the
+# standard paths when ASYNC_VIEWS is set (see the ASGI deployment notes)
+
+def async_api_view(methods):
+    """Async counterpart of @api_view: CSRF exemption and 405 for other methods"""
+    allowed = set(methods) | ({'HEAD', 'OPTIONS'} if 'GET' in methods else {'OPTIONS'})
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = _json_response(
+                    {'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED
+                )
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+            return await view(request, *args, **kwargs)
+        # csrf_exempt() wraps views in a sync function before Django 5.0
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+@async_api_view(['POST'])
+async def acheck_eligibility(request):
+    """
+    Check loan eligibility for a customer
+    POST /api/async/check-eligibility
+    """
+    try:
+        payload = orjson.loads(request.body)
+    except orjson.JSONDecodeError as e:
+        return _json_response({'detail': f'JSON parse error - {e}'}, status.HTTP_400_BAD_REQUEST)
+    serializer = LoanEligibilitySerializer(data=payload)
+    if not serializer.is_valid():
+        return _json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    eligibility_result = await LoanEligibilityService.acheck_eligibility(
+        data['customer_id'],
+        data['loan_amount'],
+        data['interest_rate'],
+        data['tenure']
+    )
+    response_serializer = LoanEligibilityResponseSerializer(data=eligibility_result)
+    if response_serializer.is_valid():
+        return _json_response(response_serializer.data)
+    return _json_response({'error': 'Error serializing response'}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@conditional_loan_view(_aloan_validators)
+@async_api_view(['GET'])
+async def aview_loan(request, loan_id):
+    """
+    View loan details by loan ID
+    GET /api/async/view-loan/{loan_id}
+    """
+    row = await Loan.objects.filter(loan_id=loan_id).values(*LOAN_DETAIL_ROWS.columns).afirst()
+    if row is None:
+        return _json_response(
+            {'error': 'Error retrieving loan: No Loan matches the given query.'}, status.HTTP_404_NOT_FOUND
+        )
+    return _json_response(LOAN_DETAIL_ROWS.to_dict(row))
+
+
+@conditional_loan_view(_acustomer_loans_validators)
+@async_api_view(['GET'])
+async def aview_customer_loans(request, customer_id):
+    """
+    View the loans of a customer, keyset-paginated on loan_id
+    GET /api/async/view-loans/{customer_id}?cursor=...&page_size=...&stream=true
+    """
+    loans = _customer_loan_rows(customer_id)
+    
+    if _wants_stream(request.GET):
+        chunks = _achunks(loans.order_by('loan_id').aiterator(chunk_size=LOAN_STREAM_CHUNK_SIZE))
+        first_chunk = await anext(chunks, None)
+        if first_chunk is None and not await Customer.objects.filter(customer_id=customer_id).aexists():
+            return _json_response(
+                {'error': 'Error retrieving customer loans: No Customer matches the given query.'},
+                status.HTTP_404_NOT_FOUND
+            )
+        return StreamingHttpResponse(_astream_loans(first_chunk, chunks), content_type='application/json')
+    
+    paginator = LoanCursorPagination()
+    # DRF pagination is synchronous; its page query goes through
+    # sync_to_async, as the async ORM methods do
+    page = await sync_to_async(paginator.paginate_queryset)(loans, Request(request))
+    if not page and not await Customer.objects.filter(customer_id=customer_id).aexists():
+        return _json_response(
+            {'error': 'Error retrieving customer loans: No Customer matches the given query.'},
+            status.HTTP_404_NOT_FOUND
+        )
+    return _json_response(paginator.get_paginated_response(CUSTOMER_LOAN_ROWS.to_list(page)).data)
+
+
+async def _achunks(rows):
+    """Group an async row iterator into lists of LOAN_STREAM_CHUNK_SIZE"""
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == LOAN_STREAM_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _astream_loans(first_chunk, chunks):
+    """Async _stream_loans over chunks already grouped by _achunks"""
+    yield b'['
+    if first_chunk is not None:
+        yield dumps(CUSTOMER_LOAN_ROWS.to_list(first_chunk))[1:-1]
+        async for chunk in chunks:
+            yield b',' + dumps(CUSTOMER_LOAN_ROWS.to_list(chunk))[1:-1]
+    yield b']'